@@ -1,25 +1,40 @@
 # stdlib
 import importlib
 import asyncio
+import signal
 from logging import getLogger
-from typing import TypedDict
+from typing import Optional, TypedDict
 
 # 3rd-party
 from discord.ext import commands
 
 # 1st-party
 from .client import bot
-from config import TOKEN
-from .logs import activate as activate_logging
+from config import TOKEN, PUBLIC_KEY, LAG_THRESHOLD
+from . import cluster, webhook
+from .lag import watchdog
+from .jobs import queue
+from .logs import activate as activate_logging, flush as flush_logs
+from .shutdown import log_restart, shutdown
+from .sandbox import sandbox
+from .standby import leadership, preload
+from .state import state
 from .status import SetStatus
 from .watcher import stop_on_change
+from .controller.channel_activity import activity
 from .controller.role_assignment import load_guilds
 
 MODULES: dict[str, tuple[str, str]] = {
     'Miscellaneous Commands': ('cmd.misc', 'misc'),
     'Message Sending': ('cmd.message_sending', 'msg'),
     'Self Roles': ('cmd.self_role', 'self_role'),
-    'Setup & Teardown': ('cmd.setup_teardown', 'setup')
+    'Setup & Teardown': ('cmd.setup_teardown', 'setup'),
+    'Statistics': ('cmd.stats', 'stats'),
+    'Enrollment': ('cmd.enrollment', 'enrollment'),
+    'Jobs': ('cmd.jobs', 'jobs'),
+    'Fan-out': ('cmd.fanout', 'fanout'),
+    'Snapshots': ('cmd.snapshot', 'snapshot'),
+    'Channel Activity': ('cmd.channel_activity', 'activity'),
 }
 
 logger = getLogger(__name__)
@@ -40,38 +55,114 @@ class Globs(TypedDict, total=False):
 
 globs: Globs = {}
 
-async def run():
-    """Run the bot."""
+async def prepare(watch: bool = True):
+    """Set up everything that doesn't need a connection.
+
+    If ``watch`` is True, stop the bot when its code changes.
+    """
     globs['logger'] = activate_logging() # NOTE: Do this first
+    watchdog.start(LAG_THRESHOLD)
     for name, (fname, cmdname) in MODULES.items():
         await import_cog(bot, name, fname)
     globs['status'] = SetStatus(bot)
-    globs['wakeup'] = asyncio.create_task(stop_on_change(bot, 'ECEBot'))
+    if watch:
+        globs['wakeup'] = asyncio.create_task(stop_on_change(bot, 'ECEBot'))
+
+async def run():
+    """Run the bot."""
+    await prepare()
     await bot.login(TOKEN)
     globs['status'].start()
-    asyncio.create_task(load_guilds(bot))
+    await load_guilds(bot)
     await bot.connect()
 
-async def cleanup_tasks():
-    for task in asyncio.all_tasks():
-        try:
-            # note that this cancels the task on timeout
-            await asyncio.wait_for(task, 3.0)
-        except asyncio.TimeoutError:
-            pass
-        except asyncio.CancelledError:
-            return
+async def run_standby():
+    """Run the bot as one of two processes on this host, of which only
+    the leader connects to the gateway. The other stands by, with as much
+    loaded as possible without a connection, to take over if it stops.
+
+    Code changes aren't watched for, since both processes would stop at once;
+    restart the standby, then the leader, which hands over to it.
+    """
+    await prepare(watch=False)
+    await bot.login(TOKEN)
+    await load_guilds(bot)
+    await preload()
+    await leadership.wait()
+    leadership.lead(bot)
+    globs['status'].start()
+    await bot.connect()
+
+async def run_http(host: Optional[str], port: int):
+    """Run the bot without a gateway connection,
+    serving interactions over HTTP instead.
+    """
+    if PUBLIC_KEY is None:
+        raise RuntimeError('PUBLIC_KEY must be set to serve interactions')
+    await prepare()
+    await bot.login(TOKEN)
+    await load_guilds(bot)
+    await log_restart()
+    # there's no on_ready to resume jobs in
+    await queue.resume(bot, lambda guild_id: webhook.load_guild(bot, guild_id))
+    await webhook.serve(bot, PUBLIC_KEY, host, port)
+
+async def run_worker(index: int, shard_ids: list[int], shard_count: int,
+                     stub: bool = False):
+    """Run the bot as one worker of a cluster, owning some shards.
+
+    If ``stub`` is True, run against a stub gateway instead of Discord.
+    """
+    bot.shard_ids = shard_ids
+    bot.shard_count = shard_count
+    # the supervisor terminates workers when it stops
+    asyncio.get_running_loop().add_signal_handler(
+        signal.SIGTERM, lambda: asyncio.create_task(bot.close()))
+    cluster.client = cluster.ClusterClient(bot, index)
+    await cluster.client.connect()
+    bot.sync_owner = await cluster.client.claim_sync()
+    if not stub:
+        await run()
+        return
+    await prepare()
+    if bot.sync_owner:
+        logger.info('Worker %s would sync commands', index)
+        bot.sync_owner = False # no token to sync with
+    await load_guilds(bot)
+    await cluster.stub_gateway(bot)
+
+async def run_cluster(workers: int, stub: bool = False):
+    """Run the bot as a cluster of worker processes."""
+    globs['logger'] = activate_logging()
+    await cluster.Supervisor(workers, stub).run()
 
 async def done():
-    """Cleanup and shutdown the bot."""
-    try:
-        if 'wakeup' in globs:
-            globs['wakeup'].cancel()
-        if 'status' in globs:
-            globs['status'].cancel()
-        if 'logger' in globs:
-            globs['logger'].cancel()
-    except RuntimeError as exc:
-        print(exc)
-    await bot.close()
-    await cleanup_tasks()
+    """Cleanup and shutdown the bot, within one overall deadline."""
+    shutdown.start()
+    # stop starting new work
+    for name in ('wakeup', 'status'):
+        if name in globs:
+            globs[name].cancel()
+    watchdog.cancel()
+    leadership.step_down(shutdown.remaining())
+    # jobs resume where they left off after a restart
+    for task in queue.running.values():
+        task.cancel()
+    if 'status' in globs: # the bot was started, not just a cluster supervisor
+        # drains in-flight interactions, then disconnects
+        await shutdown.step('client', bot.close())
+        await shutdown.step('activity', activity.flush())
+    # the state's flusher is left to commit its batch, by state.close()
+    await shutdown.drain('task(s)', asyncio.all_tasks() - {
+        asyncio.current_task(), globs.get('logger'), state.flusher},
+        cancel=True)
+    sandbox.close(kill=True)
+    if 'status' in globs:
+        await shutdown.step('record', shutdown.record(), final=True)
+    await shutdown.step('state', state.close(), final=True)
+    # after the sessions to resume are saved
+    leadership.release()
+    logger.info('Shut down in %.2fs', shutdown.elapsed())
+    if 'logger' in globs:
+        await shutdown.step('logs', flush_logs(), final=True)
+        globs['logger'].cancel()
@@ -1,3 +1,4 @@
+import argparse
 import asyncio
 import os
 import sys
@@ -5,11 +6,44 @@ from pathlib import Path
 # parent directory of ECEBot
 os.chdir(Path(__file__).resolve().parent.parent)
 sys.path.append(os.getcwd())
-from ECEBot import done, run
+from ECEBot import done, run, run_cluster, run_http, run_standby, run_worker
+from config import UVLOOP
+
+parser = argparse.ArgumentParser(prog='ECEBot', description=(
+    'A bot to manage course channels & role assignment.'))
+parser.add_argument('--cluster', type=int, metavar='N', help=(
+    'Run N worker processes, each owning a range of shards.'))
+parser.add_argument('--stub-gateway', action='store_true', help=(
+    'With --cluster, run workers against a stub gateway, for local testing.'))
+parser.add_argument('--standby', action='store_true', help=(
+    'Run as one of two processes on this host, one connected to the gateway '
+    'and the other ready to take over if it stops.'))
+parser.add_argument('--http', metavar='[HOST:]PORT', help=(
+    'Serve interactions over HTTP on this address '
+    'instead of connecting to the gateway.'))
+# used by the cluster supervisor to start workers
+parser.add_argument('--worker', type=int, help=argparse.SUPPRESS)
+parser.add_argument('--shards', help=argparse.SUPPRESS)
+parser.add_argument('--shard-count', type=int, help=argparse.SUPPRESS)
+args = parser.parse_args()
+if args.stub_gateway and args.cluster is None and args.worker is None:
+    parser.error('--stub-gateway requires --cluster')
 
 async def main():
     try:
-        await run()
+        if args.cluster is not None:
+            await run_cluster(args.cluster, args.stub_gateway)
+        elif args.http is not None:
+            host, _, port = args.http.rpartition(':')
+            await run_http(host or None, int(port))
+        elif args.standby:
+            await run_standby()
+        elif args.worker is not None:
+            await run_worker(args.worker,
+                             [int(i) for i in args.shards.split(',') if i],
+                             args.shard_count, args.stub_gateway)
+        else:
+            await run()
     except KeyboardInterrupt:
         pass
     except asyncio.CancelledError:
@@ -17,6 +51,13 @@ async def main():
     finally:
         await done()
 
+if UVLOOP:
+    try:
+        import uvloop
+    except ImportError:
+        parser.exit(1, 'UVLOOP requires uvloop: pip install uvloop\n')
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+
 try:
     asyncio.run(main())
 except KeyboardInterrupt:
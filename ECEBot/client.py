@@ -1,15 +1,23 @@
 # stdlib
 import time
+import asyncio
 from functools import partial
 from logging import getLogger
+from typing import Any, Optional
 
 # 3rd-party
+import yarl
 import discord
 from discord import app_commands
 from discord.ext import commands
+from discord.gateway import DiscordWebSocket
+from discord.shard import Shard
 
 # 1st-party
 import config
+from .sessions import SavedSession, load_resumed_guilds, load_sessions, \
+    ready_when_resumed, save_sessions
+from .shutdown import interaction_tasks, log_restart, shutdown
 from .utils import error_embed
 
 SIGNALLED_EXCS = (
@@ -22,8 +30,40 @@ UNLOGGED_EXCS = (
     app_commands.CommandNotFound,
 )
 
+# gateway events that none of the cogs use,
+# which are not parsed at all in lean mode
+UNUSED_EVENTS = (
+    'MESSAGE_CREATE', 'MESSAGE_UPDATE', 'MESSAGE_DELETE',
+    'MESSAGE_DELETE_BULK', 'MESSAGE_REACTION_ADD', 'MESSAGE_REACTION_REMOVE',
+    'MESSAGE_REACTION_REMOVE_ALL', 'MESSAGE_REACTION_REMOVE_EMOJI',
+    'TYPING_START', 'PRESENCE_UPDATE', 'VOICE_STATE_UPDATE',
+    'THREAD_CREATE', 'THREAD_UPDATE', 'THREAD_DELETE', 'THREAD_LIST_SYNC',
+    'THREAD_MEMBER_UPDATE', 'THREAD_MEMBERS_UPDATE',
+    'STAGE_INSTANCE_CREATE', 'STAGE_INSTANCE_UPDATE', 'STAGE_INSTANCE_DELETE',
+    'GUILD_EMOJIS_UPDATE', 'GUILD_STICKERS_UPDATE',
+    'INVITE_CREATE', 'INVITE_DELETE', 'WEBHOOKS_UPDATE',
+    'INTEGRATION_CREATE', 'INTEGRATION_UPDATE', 'INTEGRATION_DELETE',
+    'GUILD_INTEGRATIONS_UPDATE',
+)
+
 logger = getLogger(__name__)
 
+def client_options(lean: bool) -> dict[str, Any]:
+    """Get the intents and cache options to construct the bot with."""
+    if not lean:
+        intents = discord.Intents.default()
+        # privileged, so only requested if needed
+        intents.members = config.ENROLLMENT_COUNTS
+        return {'intents': intents}
+    return {
+        # roles and channels are all the cogs look at
+        'intents': discord.Intents(guilds=True),
+        'max_messages': None,
+        # the bot's own member is always cached
+        'member_cache_flags': discord.MemberCacheFlags.none(),
+        'chunk_guilds_at_startup': False,
+    }
+
 class ECETree(app_commands.CommandTree):
     async def on_error(
         self, ctx: discord.Interaction, exc: Exception
@@ -53,16 +93,35 @@ class ECETree(app_commands.CommandTree):
                     ctx.command.qualified_name if ctx.command else '(none)')
         return True
 
-class ECEBot(commands.Bot):
-    def __init__(self) -> None:
+class ECEBot(commands.AutoShardedBot):
+
+    # whether this process is responsible for syncing commands
+    sync_owner: bool = True
+    # shard ID -> saved session it is resuming
+    resuming: dict[int, SavedSession] = {}
+    # when connecting started and how, until the first interaction
+    connecting: Optional[tuple[float, str]] = None
+
+    def __init__(self, *, lean: Optional[bool] = None) -> None:
+        if lean is None:
+            lean = config.LEAN_MODE
         super().__init__(
             command_prefix='/',
             help_command=None,
-            intents=discord.Intents.default(),
-            tree_cls=ECETree
+            tree_cls=ECETree,
+            # None asks Discord for the recommended shard count
+            shard_count=(None if config.SHARD_COUNT == 'auto'
+                         else config.SHARD_COUNT),
+            **client_options(lean)
         )
+        if lean:
+            for event in UNUSED_EVENTS:
+                self._connection.parsers.pop(event, None)
 
     async def setup_hook(self) -> None:
+        if not self.sync_owner:
+            logger.debug('Another worker syncs commands')
+            return
         if config.DEBUG_GUILD:
             debug_guild = discord.Object(config.DEBUG_GUILD)
             self.tree.copy_global_to(guild=debug_guild)
@@ -83,7 +142,59 @@ class ECEBot(commands.Bot):
             logger.debug('Commands are up-to-date (%s < %s)',
                          freshness_str, now_str)
 
+    async def launch_shards(self) -> None:
+        self.resuming = await load_sessions(self)
+        self.connecting = (time.monotonic(),
+                           'resuming' if self.resuming else 'identifying')
+        if self.resuming:
+            logger.info('Resuming %s shard session(s)', len(self.resuming))
+            await load_resumed_guilds(self, self.resuming)
+            asyncio.create_task(ready_when_resumed(self, set(self.resuming)))
+        await super().launch_shards()
+
+    async def launch_shard(self, gateway: yarl.URL, shard_id: int, *,
+                           initial: bool = False) -> None:
+        session = self.resuming.pop(shard_id, None)
+        if session is None:
+            await super().launch_shard(gateway, shard_id, initial=initial)
+            return
+        try:
+            ws = await asyncio.wait_for(DiscordWebSocket.from_client(
+                self, initial=initial, gateway=yarl.URL(session.resume_url),
+                shard_id=shard_id, session=session.session_id,
+                sequence=session.sequence, resume=True,
+            ), timeout=self.shard_connect_timeout)
+        except Exception:
+            logger.exception('Failed to resume shard %s, identifying',
+                             shard_id)
+            await super().launch_shard(gateway, shard_id, initial=initial)
+            return
+        # as AutoShardedClient.launch_shard does after identifying
+        self._AutoShardedClient__shards[shard_id] = shard = Shard(
+            ws, self, self._AutoShardedClient__queue.put_nowait)
+        shard.launch()
+
+    async def close(self) -> None:
+        if not self.is_closed():
+            shutdown.start()
+            # let in-flight interactions respond before closing the HTTP session
+            await shutdown.drain('in-flight interaction(s)',
+                                 interaction_tasks())
+            await shutdown.step('save sessions', save_sessions(self))
+        await super().close()
+
+    async def on_interaction(self, ctx: discord.Interaction) -> None:
+        if self.connecting is not None:
+            started, how = self.connecting
+            self.connecting = None
+            logger.info('First interaction %.2fs after %s',
+                        time.monotonic() - started, how)
+
     async def on_ready(self) -> None:
-        logger.info('Ready!')
+        logger.info('Ready! (%s shard(s))', self.shard_count)
+        await log_restart()
+
+    async def on_shard_ready(self, shard_id: int) -> None:
+        logger.info('Shard %s ready', shard_id)
 
 bot = ECEBot()
@@ -0,0 +1,243 @@
+# stdlib
+import os
+import sys
+import json
+import time
+import asyncio
+from logging import getLogger
+from typing import Any, Awaitable, Callable, Optional
+
+# 3rd-party
+import discord
+from discord.ext import commands
+
+# 1st-party
+from config import SHARD_COUNT, TOKEN
+
+logger = getLogger(__name__)
+
+SOCKET_FILENAME = 'cluster.sock'
+# the package directory, which is run to start a worker
+MAIN_PATH = os.path.dirname(os.path.abspath(__file__))
+# restart backoff for workers that keep crashing
+MIN_BACKOFF = 1.0
+MAX_BACKOFF = 60.0
+# a worker that ran this long before exiting is not crash-looping
+STABLE_UPTIME = 60.0
+# fake guilds created per shard by the stub gateway
+STUB_GUILDS_PER_SHARD = 3
+
+Message = dict[str, Any]
+Handler = Callable[[Message], Awaitable[None]]
+
+HANDLERS: dict[str, list[Handler]] = {}
+
+def subscribe(topic: str) -> Callable[[Handler], Handler]:
+    """Register a handler for messages published by other workers."""
+    def decorator(handler: Handler) -> Handler:
+        HANDLERS.setdefault(topic, []).append(handler)
+        return handler
+    return decorator
+
+def shard_ranges(shard_count: int, workers: int) -> list[list[int]]:
+    """Split shard IDs into contiguous ranges, one per worker."""
+    return [list(range(shard_count * i // workers,
+                       shard_count * (i + 1) // workers))
+            for i in range(workers)]
+
+async def send(writer: asyncio.StreamWriter, msg: Message) -> None:
+    writer.write(json.dumps(msg).encode('utf8') + b'\n')
+    await writer.drain()
+
+class Supervisor:
+    """Spawn worker processes that each own a range of shards,
+    restart them when they exit, and relay messages between them.
+    """
+
+    def __init__(self, workers: int, stub: bool = False) -> None:
+        self.workers = workers
+        self.stub = stub
+        self.procs: dict[int, asyncio.subprocess.Process] = {}
+        self.writers: dict[int, asyncio.StreamWriter] = {}
+
+    async def shard_count(self) -> int:
+        if SHARD_COUNT != 'auto':
+            return SHARD_COUNT
+        if self.stub:
+            return self.workers
+        http = discord.http.HTTPClient(asyncio.get_running_loop())
+        try:
+            await http.static_login(TOKEN)
+            data = await http.request(
+                discord.http.Route('GET', '/gateway/bot'))
+        finally:
+            await http.close()
+        return data['shards']
+
+    async def run(self) -> None:
+        shard_count = await self.shard_count()
+        workers = min(self.workers, shard_count)
+        if workers < self.workers:
+            logger.warning('Only %s shard(s), running %s worker(s)',
+                           shard_count, workers)
+        if os.path.exists(SOCKET_FILENAME):
+            os.remove(SOCKET_FILENAME) # left over from a crash
+        server = await asyncio.start_unix_server(self.handle, SOCKET_FILENAME)
+        watcher = asyncio.create_task(self.watch_catalog())
+        try:
+            await asyncio.gather(*(
+                self.supervise(index, shard_ids, shard_count)
+                for index, shard_ids in enumerate(
+                    shard_ranges(shard_count, workers))))
+        finally:
+            watcher.cancel()
+            server.close()
+            for proc in self.procs.values():
+                if proc.returncode is None:
+                    proc.terminate()
+            await asyncio.gather(*(proc.wait() for proc in self.procs.values()))
+            os.remove(SOCKET_FILENAME)
+
+    async def supervise(self, index: int, shard_ids: list[int],
+                        shard_count: int) -> None:
+        backoff = MIN_BACKOFF
+        while 1:
+            started = time.monotonic()
+            args = ['--worker', str(index), '--shard-count', str(shard_count),
+                    '--shards', ','.join(map(str, shard_ids))]
+            if self.stub:
+                args.append('--stub-gateway')
+            self.procs[index] = proc = await asyncio.create_subprocess_exec(
+                sys.executable, MAIN_PATH, *args)
+            logger.info('Started worker %s (pid %s) for shard(s) %s',
+                        index, proc.pid, shard_ids)
+            code = await proc.wait()
+            if time.monotonic() - started >= STABLE_UPTIME:
+                # probably a restart on file change; come back immediately
+                backoff = MIN_BACKOFF
+                delay = 0.0
+            else:
+                delay = backoff
+                backoff = min(backoff * 2, MAX_BACKOFF)
+            logger.warning('Worker %s exited with code %s, restarting in %.0fs',
+                           index, code, delay)
+            await asyncio.sleep(delay)
+
+    async def handle(self, reader: asyncio.StreamReader,
+                     writer: asyncio.StreamWriter) -> None:
+        index: Optional[int] = None
+        try:
+            while line := await reader.readline():
+                msg: Message = json.loads(line)
+                if msg['op'] == 'hello':
+                    index = msg['worker']
+                    self.writers[index] = writer
+                elif msg['op'] == 'claim_sync':
+                    # exactly one worker syncs commands
+                    await send(writer, {'op': 'reply', 'granted': index == 0})
+                elif msg['op'] == 'publish':
+                    await self.broadcast(msg, exclude=index)
+        finally:
+            if index is not None and self.writers.get(index) is writer:
+                del self.writers[index]
+            writer.close()
+
+    async def broadcast(self, msg: Message,
+                        exclude: Optional[int] = None) -> None:
+        await asyncio.gather(*(
+            send(writer, msg) for index, writer in list(self.writers.items())
+            if index != exclude
+        ), return_exceptions=True)
+
+    async def watch_catalog(self) -> None:
+        """Tell workers to reload course catalogs when any change."""
+        from .controller.course_creation import catalog_mtime
+        mtime = catalog_mtime()
+        while 1:
+            await asyncio.sleep(1)
+            newmtime = catalog_mtime()
+            if newmtime > mtime:
+                mtime = newmtime
+                logger.info('Course catalog(s) modified, reloading')
+                await self.broadcast({'op': 'publish',
+                                      'topic': 'reload_catalog', 'data': {}})
+
+class ClusterClient:
+    """A worker's connection to the supervisor."""
+
+    def __init__(self, bot: commands.Bot, index: int) -> None:
+        self.bot = bot
+        self.index = index
+        self.replies: asyncio.Queue[Message] = asyncio.Queue()
+
+    async def connect(self) -> None:
+        self.reader, self.writer = await asyncio.open_unix_connection(
+            SOCKET_FILENAME)
+        await send(self.writer, {'op': 'hello', 'worker': self.index})
+        self.task = asyncio.create_task(self.listen())
+
+    async def listen(self) -> None:
+        while line := await self.reader.readline():
+            msg: Message = json.loads(line)
+            if msg['op'] == 'reply':
+                self.replies.put_nowait(msg)
+            elif msg['op'] == 'publish':
+                for handler in HANDLERS.get(msg['topic'], []):
+                    asyncio.create_task(handler(msg['data']))
+        logger.error('Lost connection to supervisor, closing client')
+        await self.bot.close()
+
+    async def claim_sync(self) -> bool:
+        """Ask whether this worker should sync application commands."""
+        await send(self.writer, {'op': 'claim_sync'})
+        return (await self.replies.get())['granted']
+
+    async def publish(self, topic: str, data: Message) -> None:
+        await send(self.writer, {'op': 'publish', 'topic': topic, 'data': data})
+
+client: Optional[ClusterClient] = None
+
+async def publish(topic: str, **data: Any) -> None:
+    """Tell other workers about a change, if running in a cluster."""
+    if client is not None:
+        await client.publish(topic, data)
+
+def stub_guild(guild_id: int, bot_id: int) -> Message:
+    return {
+        'id': str(guild_id), 'name': f'Stub Guild {guild_id}',
+        'owner_id': str(bot_id), 'member_count': 1, 'features': [],
+        'emojis': [], 'stickers': [], 'channels': [],
+        'roles': [{'id': str(guild_id), 'name': '@everyone',
+                   'permissions': '0', 'position': 0, 'color': 0,
+                   'hoist': False, 'managed': False, 'mentionable': False}],
+        'members': [{'user': {'id': str(bot_id), 'username': 'ECEBot',
+                              'discriminator': '0', 'avatar': None,
+                              'bot': True},
+                     'roles': [], 'joined_at': '2022-09-01T00:00:00+00:00',
+                     'deaf': False, 'mute': False, 'flags': 0}],
+    }
+
+async def stub_gateway(bot: commands.AutoShardedBot) -> None:
+    """Stand in for the gateway in local tests.
+
+    Populates the cache with a few fake guilds on each of the bot's shards,
+    marks the bot ready, and idles until it is closed.
+    """
+    await bot._async_setup_hook()
+    state = bot._connection
+    state.shard_count = bot.shard_count
+    state.shard_ids = bot.shard_ids
+    bot_id = 1
+    state.user = discord.ClientUser(state=state, data={
+        'id': str(bot_id), 'username': 'ECEBot', 'discriminator': '0',
+        'avatar': None, 'bot': True})
+    for shard_id in bot.shard_ids or ():
+        for i in range(STUB_GUILDS_PER_SHARD):
+            # guilds belong to shard (guild_id >> 22) % shard_count
+            guild_id = (shard_id + i * bot.shard_count) << 22 | 1
+            state.parsers['GUILD_CREATE'](stub_guild(guild_id, bot_id))
+    bot._ready.set()
+    bot.dispatch('ready')
+    logger.info('Stub gateway ready with %s guild(s)', len(bot.guilds))
+    while not bot.is_closed():
+        await asyncio.sleep(1)
@@ -0,0 +1,22 @@
+# 3rd-party
+import discord
+from discord.ext import commands
+
+# 1st-party
+from ..controller.channel_activity import activity
+from ..controller.course_creation import course_of_channel, get_catalog
+
+class ChannelActivity(commands.Cog):
+
+    @commands.Cog.listener()
+    async def on_message(self, message: discord.Message) -> None:
+        """Count messages in course channels as activity in them."""
+        if message.guild is None or message.author.bot:
+            return
+        catalog = await get_catalog(message.guild.id)
+        course = course_of_channel(message.channel, catalog)
+        if course is not None:
+            activity.touch(message.guild.id, course)
+
+async def setup(bot: commands.Bot) -> None:
+    await bot.add_cog(ChannelActivity())
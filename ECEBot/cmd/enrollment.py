@@ -0,0 +1,207 @@
+# stdlib
+import io
+from logging import getLogger
+from typing import Any, Optional
+
+# 3rd-party
+import discord
+from discord.ext import commands
+from discord import app_commands
+
+# 1st-party
+from ..controller.course_creation import get_catalog
+from ..controller.enrollment import enroll_members, enrollment, \
+    parse_enrollment, read_csv, set_up_courses
+from ..controller.rollover import roll_over, rollover_steps
+from ..jobs import UNFINISHED, job_kind, queue
+from ..state import state
+from ..utils import error_embed
+from .setup_teardown import enqueue
+
+logger = getLogger(__name__)
+
+# guild state key for an import's totals so far, by interaction ID
+IMPORT_KEY = 'import_enrollment:%s'
+# courses to set up, and members to enroll, in each step of an import job
+COURSES_PER_STEP = 10
+MEMBERS_PER_STEP = 50
+
+ImportStep = tuple[str, str, Any]
+
+def import_report(summary: str, problems: list[str]
+                  ) -> tuple[str, Optional[discord.File]]:
+    """Get the content, and file if too long, to report an import with."""
+    report = '\n'.join(problems)
+    if not problems:
+        return summary + '.', None
+    if len(summary) + len(report) <= 1900:
+        return f'{summary}:\n```\n{report}\n```', None
+    return f'{summary}:', discord.File(io.BytesIO(report.encode('utf8')),
+                                       filename='problems.txt')
+
+@job_kind('rollover')
+async def rollover_step(guild: discord.Guild, member_ids: list[int]) -> None:
+    await roll_over(guild, member_ids)
+
+@job_kind('import_enrollment')
+async def import_enrollment_step(guild: discord.Guild,
+                                 step: ImportStep) -> None:
+    stage, key, arg = step
+    totals = await state.get(guild.id, key, {'enrolled': 0, 'problems': []})
+    if stage == 'courses':
+        problems = await set_up_courses(
+            guild, await get_catalog(guild.id), arg)
+    elif stage == 'members':
+        enrolled, problems = await enroll_members(
+            guild, {user_id: courses for user_id, courses in arg})
+        totals['enrolled'] += enrolled
+    else: # report, in the channel the import was started from
+        channel_id, filename = arg
+        content, file = import_report(
+            f'Enrolled {totals["enrolled"]} member(s) from {filename}, '
+            f'with {len(totals["problems"])} problem(s)', totals['problems'])
+        channel = guild.get_channel(channel_id)
+        try:
+            if not isinstance(channel, discord.abc.Messageable):
+                raise discord.ClientException('channel not found')
+            await channel.send(content, file=file or discord.utils.MISSING)
+        except (discord.HTTPException, discord.ClientException) as exc:
+            logger.warning('Could not report import in guild ID %s: %s\n%s',
+                           guild.id, exc, content)
+        await state.delete(guild.id, key)
+        return
+    # a step run again after a restart reports the same problems
+    totals['problems'] = list(dict.fromkeys(totals['problems'] + problems))
+    await state.set(guild.id, key, totals)
+
+class Enrollment(commands.Cog):
+
+    rollover = app_commands.Group(
+        name='rollover',
+        description='Clear course roles at the end of a semester',
+        guild_only=True,
+        default_permissions=discord.Permissions.none(),
+    )
+
+    def __init__(self, bot: commands.Bot) -> None:
+        self.bot = bot
+
+    @commands.Cog.listener()
+    async def on_member_update(self, before: discord.Member,
+                               after: discord.Member) -> None:
+        enrollment.update(after.guild.id, before._roles, after._roles)
+
+    @commands.Cog.listener()
+    async def on_member_join(self, member: discord.Member) -> None:
+        enrollment.update(member.guild.id, (), member._roles)
+
+    @commands.Cog.listener()
+    async def on_member_remove(self, member: discord.Member) -> None:
+        enrollment.update(member.guild.id, member._roles, ())
+
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild: discord.Guild) -> None:
+        enrollment.forget(guild.id)
+
+    @app_commands.command(name='enrollment')
+    @app_commands.guild_only()
+    @app_commands.default_permissions()
+    async def enrollment_(self, ctx: discord.Interaction) -> None:
+        """View how many members have each course role."""
+        assert ctx.guild is not None
+        if not self.bot.intents.members:
+            await ctx.response.send_message(embed=error_embed(
+                'Counting enrollment needs the members intent; '
+                'set ENROLLMENT_COUNTS in the config.'), ephemeral=True)
+            return
+        guild = self.bot.get_guild(ctx.guild.id) or ctx.guild
+        await ctx.response.defer(ephemeral=True)
+        counts = await enrollment.get(guild)
+        catalog = await get_catalog(guild.id)
+        roles = {role.name: role.id for role in guild.roles}
+
+        lines: list[str] = []
+        for category, levels in catalog.courses.items():
+            lines.append(f'Area {category}' if isinstance(category, int)
+                         else catalog.minors_certs[category])
+            for level in sorted(levels):
+                for course in levels[level]:
+                    if course in roles:
+                        lines.append(f'  {course:<10} {counts[roles[course]]:>6}')
+        table = '\n'.join(lines)
+        if len(table) <= 1900:
+            await ctx.edit_original_response(content=f'```\n{table}\n```')
+        else:
+            await ctx.edit_original_response(
+                content='Enrollment by course:',
+                attachments=[discord.File(io.BytesIO(table.encode('utf8')),
+                                          filename='enrollment.txt')])
+
+    @app_commands.command(name='import_enrollment')
+    @app_commands.guild_only()
+    @app_commands.default_permissions()
+    @app_commands.describe(file='A CSV file of rows of a user ID '
+                           'followed by one or more course codes.')
+    async def import_enrollment_(self, ctx: discord.Interaction,
+                                 file: discord.Attachment) -> None:
+        """Give course roles to the members listed in a CSV file.
+
+        Runs as a job, which reports in this channel when it's done.
+        """
+        assert ctx.guild is not None
+        guild = self.bot.get_guild(ctx.guild.id) or ctx.guild
+        await ctx.response.defer(ephemeral=True)
+        catalog = await get_catalog(guild.id)
+        wanted, problems = await parse_enrollment(catalog, read_csv(file.url))
+        if not wanted:
+            content, report = import_report(
+                f'Enrolled 0 members from {file.filename}, '
+                f'with {len(problems)} problem(s)', problems)
+            await ctx.edit_original_response(
+                content=content, attachments=[report] if report else [])
+            return
+        key = IMPORT_KEY % ctx.id
+        await state.set(guild.id, key, {'enrolled': 0, 'problems': problems})
+        courses = sorted(set().union(*wanted.values()))
+        members = sorted(wanted.items())
+        steps: list[ImportStep] = [
+            ('courses', key, courses[i:i+COURSES_PER_STEP])
+            for i in range(0, len(courses), COURSES_PER_STEP)]
+        steps.extend(('members', key, members[i:i+MEMBERS_PER_STEP])
+                     for i in range(0, len(members), MEMBERS_PER_STEP))
+        steps.append(('report', key, (ctx.channel_id, file.filename)))
+        await enqueue(ctx, 'import_enrollment',
+                      f'Import enrollment from {file.filename}', steps,
+                      'It will report back in this channel when it\'s done.')
+
+    @rollover.command()
+    async def start(self, ctx: discord.Interaction) -> None:
+        """Take every course role away from every member.
+
+        The course roles and channels themselves are left alone.
+        Runs as a job, which `/jobs cancel` stops.
+        """
+        assert ctx.guild is not None
+        guild = self.bot.get_guild(ctx.guild.id)
+        if guild is None or not self.bot.intents.members:
+            await ctx.response.send_message(embed=error_embed(
+                'Rolling over needs the members intent; '
+                'set ENROLLMENT_COUNTS in the config.'), ephemeral=True)
+            return
+        for job in await queue.recent(guild.id):
+            if job.kind == 'rollover' and job.status in UNFINISHED:
+                await ctx.response.send_message(embed=error_embed(
+                    f'A rollover is already running as job #{job.id}.'),
+                    ephemeral=True)
+                return
+        await ctx.response.defer(ephemeral=True)
+        steps = await rollover_steps(guild)
+        if not steps:
+            await ctx.edit_original_response(
+                content='No members have course roles.')
+            return
+        await enqueue(ctx, 'rollover', 'Take course roles from every member',
+                      steps)
+
+async def setup(bot: commands.Bot) -> None:
+    await bot.add_cog(Enrollment(bot))
@@ -0,0 +1,160 @@
+# stdlib
+import re
+from collections import Counter
+from logging import getLogger
+from typing import Optional
+
+# 3rd-party
+import discord
+from discord.ext import commands
+from discord import app_commands
+
+# 1st-party
+from .. import cluster
+from .setup_teardown import SETUP_CHANNELS, SETUP_ROLES, missing_roles, \
+    setup_channels_steps, setup_roles_steps
+from ..controller.course_creation import get_catalog
+from ..jobs import DONE, FAILED, UNFINISHED, queue
+from ..state import GLOBAL_STATE, state
+from ..utils import error_embed
+
+logger = getLogger(__name__)
+
+# bot-wide state key for the guild and job IDs of the last fan-out
+FANOUT_KEY = 'fanout'
+# Discord's limit on the length of an embed description
+DESCRIPTION_LIMIT = 4096
+
+async def check_owner(ctx: discord.Interaction) -> bool:
+    """Check that the bot owner is running a command, saying so if not."""
+    if await ctx.client.is_owner(ctx.user): # type: ignore
+        return True
+    await ctx.response.send_message(embed=error_embed(
+        'Only the bot owner can do that.'), ephemeral=True)
+    return False
+
+def parse_guilds(bot: commands.Bot,
+                 value: str) -> tuple[list[discord.Guild], list[str]]:
+    """Get the guilds named by a list of IDs, or all for "all",
+    and the IDs that don't name one.
+    """
+    if value.strip().lower() == 'all':
+        return sorted(bot.guilds, key=lambda guild: guild.id), []
+    guilds: dict[int, discord.Guild] = {}
+    unknown: list[str] = []
+    for word in filter(None, re.split(r'[\s,]+', value)):
+        guild = bot.get_guild(int(word)) if word.isdigit() else None
+        if guild is None:
+            unknown.append(word)
+        else:
+            guilds[guild.id] = guild
+    return list(guilds.values()), unknown
+
+class Fanout(commands.Cog):
+
+    fanout = app_commands.Group(
+        name='fanout',
+        description='Run setup in several servers at once (bot owner only)',
+        guild_only=True,
+        default_permissions=discord.Permissions.none(),
+    )
+
+    def __init__(self, bot: commands.Bot) -> None:
+        self.bot = bot
+
+    @fanout.command(name='setup')
+    @app_commands.describe(
+        what='What to set up.',
+        guilds='Server IDs, separated by spaces or commas, '
+        'or "all" for every server.')
+    @app_commands.choices(what=[
+        app_commands.Choice(name='roles', value='roles'),
+        app_commands.Choice(name='channels', value='channels'),
+        app_commands.Choice(name='roles and channels', value='both'),
+    ])
+    async def setup_(self, ctx: discord.Interaction,
+                     what: str, guilds: str = 'all') -> None:
+        """Queue setup jobs in several servers, which run concurrently."""
+        if not await check_owner(ctx):
+            return
+        targets, unknown = parse_guilds(self.bot, guilds)
+        await ctx.response.defer(ephemeral=True)
+        queued: list[tuple[int, int]] = []
+        # in a cluster, each worker only knows its own guilds
+        skipped = [f'{word}: not a server of this bot'
+                   + (' worker' if cluster.client is not None else '')
+                   for word in unknown]
+        for guild in targets:
+            catalog = await get_catalog(guild.id)
+            if what == 'channels' and missing_roles(guild, catalog):
+                skipped.append(f'{guild.name} ({guild.id}): missing roles, '
+                               'set up roles and channels instead')
+                continue
+            if what in {'roles', 'both'}:
+                queued.append((guild.id, await queue.enqueue(
+                    guild.id, 'setup_roles', SETUP_ROLES,
+                    setup_roles_steps(catalog))))
+            if what in {'channels', 'both'}:
+                # queued behind the roles, which run first
+                queued.append((guild.id, await queue.enqueue(
+                    guild.id, 'setup_channels', SETUP_CHANNELS,
+                    setup_channels_steps(catalog))))
+        if queued:
+            await state.set(GLOBAL_STATE, FANOUT_KEY, queued)
+        logger.info('Fanned out setup of %s to %s guild(s), skipping %s',
+                    what, len(targets), len(skipped))
+        embed = await self.report(queued)
+        if skipped:
+            embed.add_field(name='Skipped', inline=False,
+                            value='\n'.join(skipped)[:1024])
+        embed.set_footer(text='Use /fanout status to check on progress.')
+        await ctx.edit_original_response(embed=embed)
+
+    @fanout.command()
+    async def status(self, ctx: discord.Interaction) -> None:
+        """Check on the jobs queued by the last /fanout setup."""
+        if not await check_owner(ctx):
+            return
+        queued = await state.get(GLOBAL_STATE, FANOUT_KEY)
+        if not queued:
+            await ctx.response.send_message('No fan-outs.', ephemeral=True)
+            return
+        await ctx.response.send_message(
+            embed=await self.report(queued), ephemeral=True)
+
+    async def report(self, queued: list[tuple[int, int]]) -> discord.Embed:
+        """Summarize the progress of fanned-out jobs, one line per guild."""
+        jobs = await queue.get_many([job_id for _, job_id in queued])
+        lines: dict[int, list[str]] = {}
+        for guild_id, job_id in queued:
+            job = jobs.get(job_id)
+            if job is None:
+                continue
+            lines.setdefault(guild_id, []).append(
+                f'#{job.id} {job.kind.removeprefix("setup_")} {job.status} '
+                f'{job.done}/{len(job.steps)}'
+                + (f' ({job.error})' if job.error else ''))
+        description = '\n'.join(
+            f'{self.guild_name(guild_id)}: ' + ', '.join(guild_lines)
+            for guild_id, guild_lines in lines.items())
+        if len(description) > DESCRIPTION_LIMIT:
+            description = description[:DESCRIPTION_LIMIT - 1] \
+                + '\N{HORIZONTAL ELLIPSIS}'
+        statuses = Counter(job.status for job in jobs.values())
+        embed = discord.Embed(
+            title=f'Setup in {len(lines)} server(s)', description=description)
+        embed.add_field(name='Unfinished', value=str(
+            sum(statuses[status] for status in UNFINISHED)))
+        embed.add_field(name='Done', value=str(statuses[DONE]))
+        embed.add_field(name='Failed', value=str(statuses[FAILED]))
+        done = sum(job.done for job in jobs.values())
+        total = sum(len(job.steps) for job in jobs.values())
+        embed.add_field(name='Steps', value=f'{done}/{total}')
+        return embed
+
+    def guild_name(self, guild_id: int) -> str:
+        guild: Optional[discord.Guild] = self.bot.get_guild(guild_id)
+        return f'{guild.name} ({guild_id})' if guild else str(guild_id)
+
+async def setup(bot: commands.Bot) -> None:
+    await bot.add_cog(Fanout(bot))
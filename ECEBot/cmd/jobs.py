@@ -0,0 +1,80 @@
+# 3rd-party
+import discord
+from discord.ext import commands
+from discord import app_commands
+
+# 1st-party
+from ..jobs import queue, Job
+from ..utils import error_embed
+
+def job_line(job: Job) -> str:
+    return (f'#{job.id:<5} {job.status:<9} {job.done:>4}/{len(job.steps):<4} '
+            f'{job.description}')
+
+class Jobs(commands.Cog):
+
+    jobs = app_commands.Group(
+        name='jobs',
+        description='View and manage queued admin jobs',
+        guild_only=True,
+        default_permissions=discord.Permissions.none(),
+    )
+
+    def __init__(self, bot: commands.Bot) -> None:
+        self.bot = bot
+        queue.bot = bot
+
+    @commands.Cog.listener()
+    async def on_ready(self) -> None:
+        await queue.resume(self.bot)
+
+    @jobs.command(name='list')
+    async def list_(self, ctx: discord.Interaction) -> None:
+        """List the most recent jobs in this server."""
+        assert ctx.guild_id is not None
+        jobs = await queue.recent(ctx.guild_id)
+        if not jobs:
+            await ctx.response.send_message('No jobs.', ephemeral=True)
+            return
+        await ctx.response.send_message(
+            '```\n' + '\n'.join(map(job_line, jobs)) + '\n```',
+            ephemeral=True)
+
+    @jobs.command()
+    @app_commands.describe(job_id='The job to inspect.')
+    async def inspect(self, ctx: discord.Interaction, job_id: int) -> None:
+        """View the details of a job."""
+        job = await queue.get(job_id)
+        if job is None or job.guild_id != ctx.guild_id:
+            await ctx.response.send_message(embed=error_embed(
+                f'No such job: #{job_id}'), ephemeral=True)
+            return
+        embed = discord.Embed(title=f'Job #{job.id}',
+                              description=job.description)
+        embed.add_field(name='Status', value=job.status)
+        embed.add_field(name='Progress',
+                        value=f'{job.done}/{len(job.steps)} steps')
+        embed.add_field(name='Queued', value=f'<t:{int(job.created)}:R>')
+        embed.add_field(name='Updated', value=f'<t:{int(job.updated)}:R>')
+        if job.done < len(job.steps):
+            embed.add_field(name='Next step',
+                            value=f'`{job.steps[job.done]}`', inline=False)
+        if job.error:
+            embed.add_field(name='Error', value=job.error[:1024], inline=False)
+        await ctx.response.send_message(embed=embed, ephemeral=True)
+
+    @jobs.command()
+    @app_commands.describe(job_id='The job to cancel.')
+    async def cancel(self, ctx: discord.Interaction, job_id: int) -> None:
+        """Cancel a job. A step already in progress is finished first."""
+        job = await queue.get(job_id)
+        if job is None or job.guild_id != ctx.guild_id \
+                or not await queue.cancel(job_id):
+            await ctx.response.send_message(embed=error_embed(
+                f'No unfinished job #{job_id}'), ephemeral=True)
+            return
+        await ctx.response.send_message(f'Cancelled job #{job_id}.',
+                                        ephemeral=True)
+
+async def setup(bot: commands.Bot) -> None:
+    await bot.add_cog(Jobs(bot))
@@ -1,13 +1,13 @@
-# stdlib
-import json
-
 # 3rd-party
 import discord
 from discord.ext import commands
 from discord import app_commands
 
 # 1st-party
-from ..controller.role_assignment import CategoryView, MESSAGE_FILENAME
+from ..controller.course_creation import get_catalog
+from ..controller.role_assignment import CategoryView
+from ..cluster import publish, subscribe
+from ..state import state
 
 class MessageModal(discord.ui.Modal):
 
@@ -25,15 +25,12 @@ class MessageModal(discord.ui.Modal):
         self.add_item(self.body)
 
     async def on_submit(self, ctx: discord.Interaction, /) -> None:
-        message = await self.channel.send(self.body.value, view=CategoryView())
-        try:
-            with open(MESSAGE_FILENAME, 'r', encoding='utf8') as f:
-                data: dict[str, int] = json.load(f)
-        except FileNotFoundError:
-            data = {}
-        data[str(self.channel.id)] = message.id
-        with open(MESSAGE_FILENAME, 'w', encoding='utf8') as f:
-            json.dump(data, f)
+        catalog = await get_catalog(self.channel.guild.id)
+        message = await self.channel.send(
+            self.body.value, view=CategoryView(catalog))
+        await state.register_selector(
+            self.channel.guild.id, self.channel.id, message.id)
+        await publish('selector', message_id=message.id)
         await ctx.response.send_message('Done.', ephemeral=True)
 
 class MessageSending(commands.Cog):
@@ -49,3 +46,8 @@ class MessageSending(commands.Cog):
 
 async def setup(bot: commands.Bot) -> None:
     await bot.add_cog(MessageSending())
+
+    @subscribe('selector')
+    async def register_selector(data: dict[str, int]) -> None:
+        # sent by another worker
+        bot.add_view(CategoryView(), message_id=data['message_id'])
@@ -8,7 +8,8 @@ from discord import app_commands
 
 # 1st-party
 from ..controller.role_assignment import REMOVED_MESSAGE, GIVEN_MESSAGE
-from ..controller.course_creation import COURSES, course_amc, add_course
+from ..controller.course_creation import add_course, get_catalog
+from ..controller.enrollment import enrollment
 from ..utils import error_embed
 
 logger = getLogger(__name__)
@@ -49,12 +50,10 @@ async def course_complete(
     assert isinstance(ctx.user, discord.Member)
     value = value.upper() # for convenience
 
+    catalog = await get_catalog(ctx.guild.id)
     choices: list[str] = []
-    courses = [course for levels in COURSES.values()
-               for courses in levels.values() for course in courses]
-    for course in courses:
-        if course in choices:
-            continue
+    # each course once, in catalog order
+    for course in catalog.course_amcs:
         if value == '' or indexes_of(value, course): # empty list is no match
             choices.append(course)
         if len(choices) == 25:
@@ -78,28 +77,31 @@ class SelfRole(commands.Cog):
         assert isinstance(ctx.user, discord.Member)
 
         role = discord.utils.get(ctx.guild.roles, name=course)
-        if role is None:
-            # maybe create the role and channel for the course on demand
-            courses = {course for levels in COURSES.values()
-                       for courses in levels.values() for course in courses}
-            if course not in courses:
-                # don't create roles/channels for nonexistent courses
-                await ctx.response.send_message(embed=error_embed(
-                    f'No such course: {course!r}'
-                ), ephemeral=True)
-                return
+        catalog = await get_catalog(ctx.guild.id)
+        if course in catalog.course_amcs:
             await ctx.response.defer(ephemeral=True)
-            role, _ = await add_course(ctx.guild, course_amc(course), course, True)
+            # maybe create the role and channels for the course on demand,
+            # including channels evicted while it was idle
+            role, _ = await add_course(
+                ctx.guild, catalog.course_amc(course), course, True)
+        elif role is None:
+            # don't create roles/channels for nonexistent courses
+            await ctx.response.send_message(embed=error_embed(
+                f'No such course: {course!r}'
+            ), ephemeral=True)
+            return
         else:
             await ctx.response.defer(ephemeral=True)
         # toggle the role
         if role in ctx.user.roles:
             await ctx.user.remove_roles(role, reason='Requested by user')
+            enrollment.record(ctx.user, role, False)
             logger.info(REMOVED_MESSAGE, course, role.id, ctx.user, ctx.user.id)
             await ctx.edit_original_response(
                 content=f'Successfully removed your {course!r} role.')
         else:
             await ctx.user.add_roles(role, reason='Requested by user')
+            enrollment.record(ctx.user, role, True)
             logger.info(GIVEN_MESSAGE, course, role.id, ctx.user, ctx.user.id)
             await ctx.edit_original_response(
                 content=f'Successfully gave you the {course!r} role.')
@@ -1,6 +1,7 @@
 # stdlib
 import re
 from logging import getLogger
+from typing import Optional
 
 # 3rd-party
 import discord
@@ -8,28 +9,101 @@ from discord.ext import commands
 from discord import app_commands
 
 # 1st-party
-from ..controller.role_assignment import COURSES
-from ..controller.course_creation import add_course, course_amc
+from ..controller.course_creation import Catalog, add_course, amc_name, \
+    get_catalog, sort_roles
 from ..cmd.self_role import course_complete
-from ..logs import capture_logs
+from ..jobs import job_kind, queue
+from ..sandbox import REGEX_TIMEOUT, RegexTimeout, sandbox
 from ..utils import error_embed
 
 logger = getLogger(__name__)
 
-def tail(logs: list[str], format: str) -> str:
-    """Cut down logs to the most recent ones that fit in one message."""
-    filtered_logs = [line for line in logs
-                     if 'found' not in line.casefold()
-                     and 'already' not in line.casefold()]
-    if filtered_logs:
-        logs = filtered_logs
-    msg = format.format('')
-    for i in range(1, len(logs) + 1):
-        new_msg = format.format('\n'.join(logs[-i:]))
-        if len(new_msg) > 2000:
-            return msg
-        msg = new_msg
-    return msg
+# descriptions of setup jobs
+SETUP_ROLES = 'Set up area and course roles'
+SETUP_CHANNELS = 'Set up area categories and course channels'
+
+async def enqueue(ctx: discord.Interaction, kind: str,
+                  description: str, steps: list, note: str = '') -> None:
+    """Queue a job for the interaction's guild and say so,
+    followed by ``note`` if given.
+    """
+    assert ctx.guild is not None
+    job_id = await queue.enqueue(ctx.guild.id, kind, description, steps)
+    content = (f'Queued as job #{job_id} ({len(steps)} steps). '
+               f'Use `/jobs inspect {job_id}` to check on it.')
+    if note:
+        content += ' ' + note
+    if ctx.response.is_done(): # deferred
+        await ctx.edit_original_response(content=content)
+    else:
+        await ctx.response.send_message(content, ephemeral=True)
+
+@job_kind('setup_channels')
+async def setup_channels_step(guild: discord.Guild,
+                              step: tuple[int, str]) -> None:
+    area, course = step
+    # including channels from before their area overflowed
+    await add_course(guild, area, course, False, move=True)
+
+@job_kind('setup_roles')
+async def setup_roles_step(guild: discord.Guild, name: Optional[str]) -> None:
+    if name is None:
+        await sort_roles(guild, await get_catalog(guild.id))
+        return
+    if discord.utils.get(guild.roles, name=name) is not None:
+        logger.debug('%r role already exists', name)
+        return
+    logger.debug('Creating missing %r role', name)
+    role = await guild.create_role(
+        name=name, permissions=discord.Permissions.none(),
+        hoist=False, mentionable=False)
+    guild._add_role(role)
+
+@job_kind('teardown_roles')
+async def teardown_roles_step(guild: discord.Guild,
+                              step: tuple[int, str]) -> None:
+    role_id, name = step
+    role = guild.get_role(role_id)
+    if role is None:
+        return # already deleted
+    logger.debug('Deleting role %r', name)
+    await role.delete()
+    if guild.get_role(role_id) is not None: # not yet removed by the gateway
+        guild._remove_role(role_id)
+
+def setup_roles_steps(catalog: Catalog) -> list[Optional[str]]:
+    """Get the steps of a setup_roles job: the names of the roles,
+    then None to put them in order.
+    """
+    names: list[Optional[str]] = [amc_name(area) for area in catalog.areas]
+    names.extend(sorted(catalog.area_courses()))
+    names.append(None)
+    return names
+
+def missing_roles(guild: discord.Guild, catalog: Catalog) -> set[str]:
+    """Get the names of the roles that /setup roles would create."""
+    return set(filter(None, setup_roles_steps(catalog))) \
+        - {role.name for role in guild.roles}
+
+def setup_channels_steps(catalog: Catalog) -> list[tuple[int, str]]:
+    """Get the steps of a setup_channels job: each area course
+    with the first area it's listed in, in code order within areas.
+    """
+    steps: list[tuple[int, str]] = []
+    created_courses: set[str] = set()
+    for area, levels in catalog.courses.items():
+        if not isinstance(area, int):
+            continue # don't create minor/cert channels by default
+        courses = [course for level in levels.values()
+                   for course in level]
+        # concatenating levels puts things out of order
+        courses.sort()
+        for course in courses:
+            if course in created_courses:
+                continue # skip already created courses
+            steps.append((area, course))
+            created_courses.add(course)
+    return steps
 
 class Setup(app_commands.Group):
 
@@ -45,90 +119,24 @@ class Setup(app_commands.Group):
     async def channels(self, ctx: discord.Interaction) -> None:
         """Set up area categories and course channels."""
         assert ctx.guild is not None
-        missing: set[str] = set()
-
-        area_roles: dict[int, discord.Role] = {}
-        for area in range(1, 9):
-            name = f'Area {area}'
-            role = discord.utils.get(ctx.guild.roles, name=name)
-            if role is None:
-                missing.add(name)
-            else:
-                area_roles[area] = role
-
-        course_roles: dict[str, discord.Role] = {}
-        courses = {course for area, levels in COURSES.items()
-                   if isinstance(area, int)
-                   for level in levels.values() for course in level}
-        for course in courses:
-            if course in course_roles:
-                continue
-            role = discord.utils.get(ctx.guild.roles, name=course)
-            if role is None:
-                missing.add(course)
-            else:
-                course_roles[course] = role
-
+        catalog = await get_catalog(ctx.guild.id)
+        missing = missing_roles(ctx.guild, catalog)
         if missing:
             await ctx.response.send_message(embed=error_embed(
                 'Missing the following roles: ```\n'
                 + '\n'.join(sorted(missing)) + '\n```'))
             return
 
-        await ctx.response.defer(ephemeral=True)
-
-        with capture_logs(logger) as logs:
-            created_courses: set[str] = set()
-            for area, levels in COURSES.items():
-                if not isinstance(area, int):
-                    continue # don't create minor/cert channels by default
-                courses = [course for level in levels.values()
-                           for course in level]
-                # concatenating levels puts things out of order
-                courses.sort()
-                for course in courses:
-                    if course in created_courses:
-                        continue # skip already created courses
-                    await add_course(ctx.guild, area, course, False)
-                    created_courses.add(course)
-        await ctx.edit_original_response(
-            content=tail(logs, '```\n{}\n```\nDone.'))
+        await enqueue(ctx, 'setup_channels', SETUP_CHANNELS,
+                      setup_channels_steps(catalog))
 
     @app_commands.command()
     async def roles(self, ctx: discord.Interaction) -> None:
         """Set up area and course roles."""
         assert ctx.guild is not None
-        await ctx.response.defer(ephemeral=True)
-
-        async def make_role(name: str) -> None:
-            assert ctx.guild is not None
-            await ctx.guild.create_role(
-                name=name, permissions=discord.Permissions.none(),
-                hoist=False, mentionable=False)
-
-        with capture_logs(logger) as logs:
-            for area in range(1, 9):
-                name = f'Area {area}'
-                role = discord.utils.get(ctx.guild.roles, name=name)
-                if role is None:
-                    logger.debug('Creating missing %r role', name)
-                    await make_role(name)
-                else:
-                    logger.debug('%r role already exists', name)
-
-            courses = {course for area, levels in COURSES.items()
-                       if isinstance(area, int)
-                       for level in levels.values() for course in level}
-            for course in courses:
-                role = discord.utils.get(ctx.guild.roles, name=course)
-                if role is None:
-                    logger.debug('Creating missing role for %s', course)
-                    await make_role(course)
-                else:
-                    logger.debug('%s role already exists', course)
-
-        await ctx.edit_original_response(
-            content=tail(logs, '```\n{}\n```\nDone.'))
+        catalog = await get_catalog(ctx.guild.id)
+        await enqueue(ctx, 'setup_roles', SETUP_ROLES,
+                      setup_roles_steps(catalog))
 
     @app_commands.command()
     @app_commands.describe(
@@ -142,12 +150,10 @@ class Setup(app_commands.Group):
         assert ctx.guild is not None
         await ctx.response.defer()
 
-        amc = course_amc(course)
-
         # ensure the course exists
-        courses = {course for area, levels in COURSES.items() if area == amc
-                   for courses in levels.values() for course in courses}
-        if course not in courses:
+        catalog = await get_catalog(ctx.guild.id)
+        amc = catalog.course_amcs.get(course)
+        if amc is None:
             await ctx.edit_original_response(embed=error_embed(
                 f'No such course: {course!r}'
             ))
@@ -192,15 +198,28 @@ class Teardown(app_commands.Group):
     async def roles(self, ctx: discord.Interaction, pattern: str) -> None:
         """Tear down all roles matching a regex."""
         assert ctx.guild is not None
-        await ctx.response.defer()
-        deleted: list[str] = []
-        for role in ctx.guild.roles:
-            if re.search(pattern, role.name):
-                logger.debug('Deleting role %r', role.name)
-                await role.delete()
-                deleted.append(role.name)
-        await ctx.edit_original_response(
-            content='Deleted: ```\n' + '\n'.join(deleted) + '\n```')
+        # starting the sandbox may take longer than Discord waits for a reply
+        await ctx.response.defer(ephemeral=True)
+        roles = ctx.guild.roles
+        try:
+            matched = await sandbox.search(
+                pattern, [role.name for role in roles])
+        except re.error as exc:
+            await ctx.edit_original_response(embed=error_embed(
+                f'Invalid pattern: {exc}'))
+            return
+        except RegexTimeout:
+            await ctx.edit_original_response(embed=error_embed(
+                f'Pattern took over {REGEX_TIMEOUT:g} seconds to match '
+                'role names. Try one that backtracks less.'))
+            return
+        if not matched:
+            await ctx.edit_original_response(embed=error_embed(
+                f'No roles match {pattern!r}'))
+            return
+        steps = [(roles[index].id, roles[index].name) for index in matched]
+        await enqueue(ctx, 'teardown_roles',
+                      f'Tear down roles matching {pattern!r}', steps)
 
 def setup(bot: commands.Bot) -> None:
     bot.tree.add_command(Setup())
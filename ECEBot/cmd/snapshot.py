@@ -0,0 +1,97 @@
+# stdlib
+import time
+from datetime import datetime
+
+# 3rd-party
+import discord
+from discord.ext import commands
+from discord import app_commands
+
+# 1st-party
+from ..controller.course_creation import get_catalog
+from ..controller.snapshot import Restore, RestoreStep, list_snapshots, \
+    load_snapshot, save_snapshot, take_snapshot
+from ..cmd.setup_teardown import enqueue
+from ..jobs import job_kind
+from ..utils import error_embed
+
+@job_kind('restore_snapshot')
+async def restore_snapshot_step(guild: discord.Guild,
+                                step: RestoreStep) -> None:
+    stage, name, names = step
+    restore = Restore(guild, await get_catalog(guild.id),
+                      await load_snapshot(name))
+    await restore.run_step(stage, names)
+
+class Snapshots(commands.Cog):
+
+    snapshot = app_commands.Group(
+        name='snapshot',
+        description='Back up and restore the roles and channels the bot manages',
+        guild_only=True,
+        default_permissions=discord.Permissions.none(),
+    )
+
+    def __init__(self, bot: commands.Bot) -> None:
+        self.bot = bot
+
+    @snapshot.command()
+    async def export(self, ctx: discord.Interaction) -> None:
+        """Save a snapshot of the roles and channels the bot manages here."""
+        assert ctx.guild is not None
+        guild = self.bot.get_guild(ctx.guild.id) or ctx.guild
+        await ctx.response.defer(ephemeral=True)
+        start = time.perf_counter()
+        snapshot = await take_snapshot(guild, await get_catalog(guild.id))
+        path = await save_snapshot(snapshot)
+        await ctx.edit_original_response(
+            content=f'Saved {len(snapshot["roles"])} role(s), '
+            f'{len(snapshot["categories"])} category(ies), '
+            f'{len(snapshot["channels"])} channel(s) and '
+            f'{len(snapshot["selectors"])} selector message(s) in '
+            f'{time.perf_counter() - start:.2f}s.',
+            attachments=[discord.File(path)])
+
+    @snapshot.command()
+    @app_commands.describe(name='The snapshot to restore; the latest if not given.')
+    async def restore(self, ctx: discord.Interaction,
+                      name: str = '') -> None:
+        """Recreate what's missing from this server compared to a snapshot."""
+        assert ctx.guild is not None
+        guild = self.bot.get_guild(ctx.guild.id) or ctx.guild
+        names = list_snapshots(guild.id)
+        if not names or (name and name not in names):
+            await ctx.response.send_message(embed=error_embed(
+                f'No such snapshot: {name!r}' if name
+                else 'No snapshots of this server.'), ephemeral=True)
+            return
+        await ctx.response.defer(ephemeral=True)
+        name = name or names[0]
+        restore = Restore(guild, await get_catalog(guild.id),
+                          await load_snapshot(name))
+        steps = await restore.steps(name)
+        if not steps:
+            await ctx.edit_original_response(
+                content='Nothing to restore: this server has everything '
+                'in the snapshot.')
+            return
+        await enqueue(ctx, 'restore_snapshot', f'Restore snapshot {name}',
+                      steps)
+
+    @restore.autocomplete('name')
+    async def restore_autocomplete(
+        self, ctx: discord.Interaction, value: str
+    ) -> list[app_commands.Choice[str]]:
+        assert ctx.guild_id is not None
+        choices: list[app_commands.Choice[str]] = []
+        for name in list_snapshots(ctx.guild_id):
+            taken = datetime.fromtimestamp(int(name[:-5].rsplit('-', 1)[1]))
+            label = f'{taken:%Y-%m-%d %H:%M:%S}'
+            if value in label:
+                choices.append(app_commands.Choice(name=label, value=name))
+            if len(choices) == 25:
+                break
+        return choices
+
+async def setup(bot: commands.Bot) -> None:
+    await bot.add_cog(Snapshots(bot))
@@ -0,0 +1,58 @@
+# 3rd-party
+import discord
+from discord.ext import commands
+from discord import app_commands
+
+# 1st-party
+from ..lag import BUCKETS, watchdog
+from ..metrics import ShardMetrics
+
+class Statistics(commands.Cog):
+
+    stats = app_commands.Group(
+        name='stats',
+        description='View bot statistics',
+        guild_only=True,
+        default_permissions=discord.Permissions.none(),
+    )
+
+    def __init__(self, bot: commands.AutoShardedBot) -> None:
+        self.metrics = ShardMetrics(bot)
+
+    @commands.Cog.listener()
+    async def on_ready(self) -> None:
+        # can't wait until ready before logging in, so start once ready
+        if not self.metrics.task.is_running():
+            self.metrics.start()
+
+    async def cog_unload(self) -> None:
+        self.metrics.cancel()
+
+    @stats.command()
+    async def shards(self, ctx: discord.Interaction) -> None:
+        """View the latency, guild count and event rate of each shard."""
+        lines = ['Shard  Latency   Guilds  Events/s']
+        for stats in self.metrics.sample():
+            lines.append(
+                f'{stats.shard_id:>5}  {stats.latency * 1000:5.0f}ms  '
+                f'{stats.guilds:>7}  {stats.event_rate:8.2f}'
+                + (' *' if ctx.guild and ctx.guild.shard_id == stats.shard_id
+                   else ''))
+        await ctx.response.send_message(
+            '```\n' + '\n'.join(lines) + '\n```', ephemeral=True)
+
+    @stats.command()
+    async def lag(self, ctx: discord.Interaction) -> None:
+        """View how late the event loop has been running callbacks."""
+        stats = watchdog.stats()
+        lines = [f'{stats.samples} samples, mean {stats.mean * 1000:.1f}ms, '
+                 f'max {stats.max * 1000:.0f}ms, {stats.stalls} stall(s)', '']
+        bounds = [f'<= {bound * 1000:g}ms' for bound in BUCKETS]
+        bounds.append(f'> {BUCKETS[-1] * 1000:g}ms')
+        for bound, count in zip(bounds, stats.histogram):
+            lines.append(f'{bound:>10}  {count:>8}')
+        await ctx.response.send_message(
+            '```\n' + '\n'.join(lines) + '\n```', ephemeral=True)
+
+async def setup(bot: commands.AutoShardedBot) -> None:
+    await bot.add_cog(Statistics(bot))
@@ -0,0 +1,99 @@
+# stdlib
+import time
+import asyncio
+import itertools
+from collections import OrderedDict
+from logging import getLogger
+from typing import Optional
+
+# 1st-party
+from ..state import state
+
+logger = getLogger(__name__)
+
+# seconds to collect activity for before writing it to the state
+SAVE_INTERVAL = 60.0
+
+class ChannelActivity:
+    """When each course's channels were last used, per guild.
+
+    A guild's courses are kept least recently used first, so recording
+    activity is O(1) and the idlest courses are always at the front.
+    Activity is written to the bot's state in batches, so that it survives
+    restarts; a guild's is read back the first time it's needed.
+    """
+
+    def __init__(self) -> None:
+        # guild ID -> course -> when it was last active, least recent first
+        self.last: dict[int, OrderedDict[str, float]] = {}
+        # (guild ID, course) -> when it was last active, not yet saved
+        self.unsaved: dict[tuple[int, str], float] = {}
+        self.saver: Optional[asyncio.Task[None]] = None
+        self._loading: dict[int, asyncio.Task[OrderedDict[str, float]]] = {}
+
+    async def _load(self, guild_id: int) -> OrderedDict[str, float]:
+        courses = OrderedDict(await state.course_activity(guild_id))
+        # activity recorded while loading is newer than what was saved
+        for (unsaved_guild_id, course), at in self.unsaved.items():
+            if unsaved_guild_id == guild_id and at >= courses.get(course, 0.0):
+                courses[course] = at
+        return OrderedDict(sorted(courses.items(), key=lambda item: item[1]))
+
+    async def get(self, guild_id: int) -> OrderedDict[str, float]:
+        """Get the activity of a guild's courses, loading it if needed."""
+        courses = self.last.get(guild_id)
+        if courses is not None:
+            return courses
+        if guild_id not in self._loading:
+            self._loading[guild_id] = asyncio.create_task(
+                self._load(guild_id))
+        try:
+            courses = await asyncio.shield(self._loading[guild_id])
+        finally:
+            self._loading.pop(guild_id, None)
+        return self.last.setdefault(guild_id, courses)
+
+    def touch(self, guild_id: int, course: str,
+              at: Optional[float] = None) -> None:
+        """Record activity in a course's channels."""
+        if at is None:
+            at = time.time()
+        courses = self.last.get(guild_id)
+        if courses is not None:
+            courses[course] = at
+            courses.move_to_end(course)
+        self.unsaved[guild_id, course] = at
+        if self.saver is None or self.saver.done():
+            self.saver = asyncio.create_task(self._save_later())
+
+    def idle(self, courses: OrderedDict[str, float],
+             before: float) -> list[str]:
+        """Get the courses inactive since before a time,
+        least recently used first.
+        """
+        return [course for course, _ in itertools.takewhile(
+            lambda item: item[1] < before, courses.items())]
+
+    async def _save_later(self) -> None:
+        await asyncio.sleep(SAVE_INTERVAL)
+        # not cut short by flush() cancelling this
+        await asyncio.shield(self.save())
+
+    async def save(self) -> None:
+        """Write the activity recorded since the last save."""
+        unsaved, self.unsaved = self.unsaved, {}
+        if not unsaved:
+            return
+        # written in one transaction, since they're issued at once
+        await asyncio.gather(*(
+            state.set_course_activity(guild_id, course, at)
+            for (guild_id, course), at in unsaved.items()))
+        logger.debug('Saved activity of %s course(s)', len(unsaved))
+
+    async def flush(self) -> None:
+        """Save recorded activity now, e.g. when shutting down."""
+        if self.saver is not None:
+            self.saver.cancel()
+        await self.save()
+
+activity = ChannelActivity()
@@ -1,56 +1,211 @@
 # stdlib
+import os
 import re
-import tomllib
-from collections import defaultdict
-from typing import Optional, TypedDict, cast
+import time
+import asyncio
+import bisect
+import hashlib
+import weakref
+from collections import OrderedDict, defaultdict
+from typing import NamedTuple, Optional, TypedDict, cast
 from logging import getLogger
 
 # 3rd-party
 import discord
+try:
+    import tomllib
+except ImportError: # Python < 3.11
+    import _tomllib as tomllib
 
 # 1st-party
-from config import CHANNELS_ON_DEMAND
+from config import CHANNELS_ON_DEMAND, CHANNEL_IDLE_DAYS, CHANNEL_WATERMARK
+from .channel_activity import activity
 from ..utils import Category, Level
 
 logger = getLogger(__name__)
 
 COURSE_CHANNEL_SUFFIXES = ['', '-hw-help']
 COURSES_FILENAME = 'courses.toml'
+# per-guild catalogs are named <guild ID>.toml in here
+CATALOGS_DIRNAME = 'catalogs'
+# how many guilds' catalogs to keep loaded
+CATALOG_CACHE_SIZE = 64
+# Discord's limit on the number of options in a select
+PAGE_SIZE = 25
+# Discord's limit on the number of channels in a category
+CATEGORY_SIZE = 50
+COURSES_PER_CATEGORY = CATEGORY_SIZE // len(COURSE_CHANNEL_SUFFIXES)
 
 class CourseCategory(TypedDict):
     name: str
     courses: list[str]
 
+class CoursePage(NamedTuple):
+    """One select's worth of courses at a level."""
+    placeholder: str
+    options: list[discord.SelectOption]
+
 # load course info
 
-AREAS: dict[int, str] = {}
-MINORS_CERTS: dict[str, str] = {}
-COURSES: dict[Category, defaultdict[Level, list[str]]] = {}
+class Catalog:
+    """Course info for a guild: its areas, minors/certificates,
+    and the courses in each by level.
+    """
+
+    def __init__(self, courses: dict[str, CourseCategory]) -> None:
+        self.areas: dict[int, str] = {}
+        self.minors_certs: dict[str, str] = {}
+        self.courses: dict[Category, defaultdict[Level, list[str]]] = {}
+        # course -> the first area/minor/certificate it's listed in
+        self.course_amcs: dict[str, Category] = {}
+        for key, value in courses.items():
+            if key.startswith('area-'):
+                category = int(key[len('area-'):])
+                self.areas[category] = value['name']
+            else:
+                category = key
+                self.minors_certs[category] = value['name']
+            self.courses[category] = defaultdict(list)
+            for course in value['courses']:
+                code = re.search(r'[A-Z]{3}([12345ABCD])\d\d', course)
+                if code is None:
+                    raise ValueError(f'Invalid course code {course!r}')
+                code = code.group(1)
+                if code.isnumeric():
+                    level = cast(Level, int(code) * 100)
+                else: # UTSC-style ABCD level
+                    level = cast(Level, (ord(code) - ord('A') + 1) * 100)
+                self.courses[category][level].append(course)
+                self.course_amcs.setdefault(course, category)
+            for course_list in self.courses[category].values():
+                course_list.sort()
+        # category -> course -> which of the category's channel categories
+        # holds its channels; each holds a range of courses, in code order
+        self.course_slots: dict[Category, dict[str, int]] = {
+            category: {course: i // COURSES_PER_CATEGORY
+                       for i, course in enumerate(sorted(
+                           {course for level in levels.values()
+                            for course in level}))}
+            for category, levels in self.courses.items()}
+        # category -> level -> pages of its courses, in level order
+        self.pages: dict[Category, dict[Level, list[CoursePage]]] = {
+            category: {level: self._paginate(level, levels[level])
+                       for level in sorted(levels)}
+            for category, levels in self.courses.items()}
+
+    @staticmethod
+    def _paginate(level: Level, courses: list[str]) -> list[CoursePage]:
+        if len(courses) <= PAGE_SIZE:
+            return [CoursePage(f'{level}-level courses', [
+                discord.SelectOption(label=course) for course in courses])]
+        return [CoursePage(
+            f'{level}-level courses: {chunk[0]} to {chunk[-1]}',
+            [discord.SelectOption(label=course) for course in chunk]
+        ) for chunk in (courses[i:i+PAGE_SIZE]
+                        for i in range(0, len(courses), PAGE_SIZE))]
 
-def load_course_info():
-    with open(COURSES_FILENAME, 'rb') as f:
-        courses: dict[str, CourseCategory] = tomllib.load(f)
+    def find_page(self, category: Category,
+                  prefix: str) -> Optional[tuple[Level, int]]:
+        """Find the level and page of the first course in a category
+        whose code starts with a prefix, if any.
+        """
+        for level, courses in sorted(self.courses[category].items()):
+            i = bisect.bisect_left(courses, prefix)
+            if i < len(courses) and courses[i].startswith(prefix):
+                return level, i // PAGE_SIZE
+        return None
 
-    for key, value in courses.items():
-        if key.startswith('area-'):
-            category = int(key[len('area-'):])
-            AREAS[category] = value['name']
+    def amc_full_name(self, amc: Category) -> str:
+        """Get the full display name for an area/minor/certificate."""
+        if isinstance(amc, int):
+            name = self.areas[amc]
         else:
-            category = key
-            MINORS_CERTS[category] = value['name']
-        COURSES[category] = defaultdict(list)
-        for course in value['courses']:
-            code = re.search(r'[A-Z]{3}([12345ABCD])\d\d', course)
-            if code is None:
-                raise ValueError(f'Invalid course code {course!r}')
-            code = code.group(1)
-            if code.isnumeric():
-                level = cast(Level, int(code) * 100)
-            else: # UTSC-style ABCD level
-                level = cast(Level, (ord(code) - ord('A') + 1) * 100)
-            COURSES[category][level].append(course)
-        for course_list in COURSES[category].values():
-            course_list.sort()
+            name = self.minors_certs[amc]
+        return name
+
+    def category_name(self, amc: Category, course: str) -> str:
+        """Get the name of the channel category for a course's channels
+        in an area/minor/certificate, overflowing into "<name> (2)" and so on
+        for those with more courses than fit in one.
+        """
+        name = self.amc_full_name(amc)
+        slot = self.course_slots[amc].get(course, 0)
+        if slot:
+            name = f'{name} ({slot + 1})'
+        return name
+
+    def course_amc(self, course: str) -> Category:
+        """Get an area/minor/certificate that a course belongs to."""
+        try:
+            return self.course_amcs[course]
+        except KeyError:
+            raise ValueError(course) from None
+
+    def area_courses(self) -> set[str]:
+        """Get all courses that belong to an area."""
+        return {course for area, levels in self.courses.items()
+                if isinstance(area, int)
+                for level in levels.values() for course in level}
+
+# guild ID (None for default) -> its catalog, least recently used first
+_catalogs: OrderedDict[Optional[int], Catalog] = OrderedDict()
+# file contents digest -> catalog, so that identical catalogs are shared
+_by_digest: weakref.WeakValueDictionary[bytes, Catalog] = \
+    weakref.WeakValueDictionary()
+_loading: dict[Optional[int], asyncio.Task[Catalog]] = {}
+
+def _read_catalog(guild_id: Optional[int]) -> tuple[bytes, bytes]:
+    path = os.path.join(CATALOGS_DIRNAME, f'{guild_id}.toml')
+    if guild_id is None or not os.path.exists(path):
+        path = COURSES_FILENAME
+    with open(path, 'rb') as f:
+        data = f.read()
+    return hashlib.sha256(data).digest(), data
+
+def _parse_catalog(data: bytes) -> Catalog:
+    return Catalog(tomllib.loads(data.decode('utf8')))
+
+async def _load_catalog(guild_id: Optional[int]) -> Catalog:
+    digest, data = await asyncio.to_thread(_read_catalog, guild_id)
+    catalog = _by_digest.get(digest)
+    if catalog is None:
+        catalog = await asyncio.to_thread(_parse_catalog, data)
+        catalog = _by_digest.setdefault(digest, catalog)
+        logger.debug('Loaded catalog for guild ID %s', guild_id)
+    return catalog
+
+async def get_catalog(guild_id: Optional[int]) -> Catalog:
+    """Get the course catalog for a guild, loading it if needed.
+
+    Guilds without their own catalog file use the default one.
+    """
+    catalog = _catalogs.get(guild_id)
+    if catalog is not None:
+        _catalogs.move_to_end(guild_id)
+        return catalog
+    if guild_id not in _loading:
+        _loading[guild_id] = asyncio.create_task(_load_catalog(guild_id))
+    try:
+        catalog = await asyncio.shield(_loading[guild_id])
+    finally:
+        _loading.pop(guild_id, None)
+    _catalogs[guild_id] = catalog
+    while len(_catalogs) > CATALOG_CACHE_SIZE:
+        _catalogs.popitem(last=False)
+    return catalog
+
+def catalog_mtime() -> float:
+    """Get the latest modification time of any catalog file."""
+    mtime = os.path.getmtime(COURSES_FILENAME)
+    if os.path.isdir(CATALOGS_DIRNAME):
+        for entry in os.scandir(CATALOGS_DIRNAME):
+            if entry.name.endswith('.toml'):
+                mtime = max(mtime, entry.stat().st_mtime)
+    return mtime
+
+def clear_catalogs() -> None:
+    """Forget loaded catalogs, so they are reloaded on next use."""
+    _catalogs.clear()
 
 # end course info
 
@@ -62,38 +217,147 @@ def amc_name(amc: Category) -> str:
         amc = f'Area {amc}'
     return amc
 
-def amc_full_name(amc: Category) -> str:
-    """Get the full display name for an area/minor/certificate."""
-    if isinstance(amc, int):
-        name = AREAS[amc]
-    else:
-        name = MINORS_CERTS[amc]
-    return name
-
-def course_amc(course: str) -> Category:
-    """Get an area/minor/certificate that a course belongs to."""
-    for area, levels in COURSES.items():
-        for level in levels.values():
-            if course in level:
-                return area
-    raise ValueError(course)
-
 def amc_role(guild: discord.Guild,
              amc: Category) -> Optional[discord.Role]:
     """Get a role for an area/minor/certificate, or None if not found."""
     return discord.utils.get(guild.roles, name=amc_name(amc))
 
-def amc_category(guild: discord.Guild,
-                 amc: Category) -> Optional[discord.CategoryChannel]:
-    """Get a category for an area/minor/certificate, or None if not found."""
-    return discord.utils.get(guild.categories, name=amc_full_name(amc))
+def amc_category(guild: discord.Guild, catalog: Catalog, amc: Category,
+                 course: str) -> Optional[discord.CategoryChannel]:
+    """Get the category for a course's channels in an area/minor/certificate,
+    or None if not found.
+    """
+    return discord.utils.get(guild.categories,
+                             name=catalog.category_name(amc, course))
 
 def course_role(guild: discord.Guild, course: str) -> Optional[discord.Role]:
     """Get a role for a course, or None if not found."""
     return discord.utils.get(guild.roles, name=course)
 
+def course_of_channel(channel: discord.abc.GuildChannel,
+                      catalog: Catalog) -> Optional[str]:
+    """Get the course that a channel is for, if any."""
+    if not isinstance(channel, discord.TextChannel):
+        return None
+    # longest first, so that no suffix is left on the course
+    for suffix in sorted(COURSE_CHANNEL_SUFFIXES, key=len, reverse=True):
+        if channel.name.endswith(suffix):
+            course = channel.name[:len(channel.name) - len(suffix)].upper()
+            if course in catalog.course_amcs:
+                return course
+    return None
+
+def course_channels(guild: discord.Guild,
+                    course: str) -> list[discord.TextChannel]:
+    """Get the existing channels for a course."""
+    names = {course.lower() + suffix for suffix in COURSE_CHANNEL_SUFFIXES}
+    return [channel for channel in guild.text_channels
+            if channel.name in names]
+
+async def sort_category(
+    category: discord.CategoryChannel,
+    moved: Optional[list[discord.TextChannel]] = None,
+) -> None:
+    """Put a category's channels in name order, and so course code order,
+    moving ``moved`` into it, in one request, if they aren't already.
+    """
+    if moved is None:
+        moved = []
+    channels = sorted(category.channels,
+                      key=lambda channel: (channel.position, channel.id))
+    wanted = sorted(channels + moved, key=lambda channel: channel.name)
+    if channels == wanted:
+        return
+    logger.debug('Sorting %s channel(s) in %r, moving in %s',
+                 len(wanted), category.name, len(moved))
+    payload = []
+    for position, channel in enumerate(wanted):
+        data = {'id': channel.id, 'position': position}
+        if channel in moved:
+            data['parent_id'] = category.id
+        payload.append(data)
+    await category.guild._state.http.bulk_channel_update(
+        category.guild.id, payload, reason='Sorting course channels')
+    # the gateway updates these too, but maybe not before the next sort
+    for position, channel in enumerate(wanted):
+        channel.position = position
+        channel.category_id = category.id
+
+def role_order(catalog: Catalog) -> list[str]:
+    """Get the names of the roles the bot manages, from top to bottom:
+    areas/minors/certificates, then courses in code order.
+    """
+    return [amc_name(amc) for amc in catalog.courses] \
+        + sorted(catalog.course_amcs)
+
+async def sort_roles(guild: discord.Guild, catalog: Catalog) -> None:
+    """Put the roles the bot manages in order, in the positions they
+    already hold between them, in one request, if they aren't already.
+    """
+    order = {name: index for index, name in enumerate(role_order(catalog))}
+    # creating a role moves up the others, which the cache may not know yet
+    for data in await guild._state.http.get_roles(guild.id):
+        role = guild.get_role(int(data['id']))
+        if role is not None:
+            role.position = data['position']
+    # top first
+    roles = sorted((role for role in guild.roles if role.name in order),
+                   key=lambda role: (role.position, role.id), reverse=True)
+    wanted = sorted(roles, key=lambda role: order[role.name])
+    if roles == wanted:
+        return
+    positions = [role.position for role in roles]
+    logger.debug('Sorting %s role(s)', len(wanted))
+    # also caches the roles' new positions
+    await guild.edit_role_positions(dict(zip(wanted, positions)),
+                                    reason='Sorting course roles')
+
+async def make_room(guild: discord.Guild, catalog: Catalog,
+                    needed: int) -> None:
+    """Delete the channels of idle courses, least recently used first,
+    if creating ``needed`` channels would take the guild past
+    ``CHANNEL_WATERMARK``. Their roles are kept, and their channels are
+    created again the next time they're needed.
+    """
+    if CHANNEL_WATERMARK is None:
+        return
+    excess = len(guild.channels) + needed - CHANNEL_WATERMARK
+    if excess <= 0:
+        return
+    if not guild._state._intents.guild_messages:
+        # busy channels would look idle, e.g. in lean mode
+        logger.warning('Guild ID %s is past the channel watermark, but '
+                       'without messages to tell which course channels '
+                       'are idle, none are evicted', guild.id)
+        return
+    courses = await activity.get(guild.id)
+    # channels from before activity was tracked are idle from now on
+    for channel in guild.text_channels:
+        course = course_of_channel(channel, catalog)
+        if course is not None and course not in courses:
+            activity.touch(guild.id, course)
+    for course in activity.idle(
+            courses, time.time() - CHANNEL_IDLE_DAYS * 24 * 60 * 60):
+        channels = course_channels(guild, course)
+        for channel in channels:
+            logger.debug('Evicting idle #%s', channel.name)
+            try:
+                await channel.delete(reason='Idle course channel evicted '
+                                     'to stay under the channel limit')
+            except discord.NotFound:
+                pass # already deleted
+            guild._remove_channel(channel)
+        excess -= len(channels)
+        if excess <= 0:
+            logger.info('Evicted idle course channels in guild ID %s, '
+                        'up to %r', guild.id, course)
+            return
+    logger.warning('Guild ID %s is past the channel watermark, '
+                   'but no course channels are idle enough to evict',
+                   guild.id)
+
 async def add_course(guild: discord.Guild, amc: Category,
-                     course: str, on_demand: bool = False
+                     course: str, on_demand: bool = False, move: bool = False
                      ) -> tuple[discord.Role, list[discord.TextChannel]]:
     """Create a role+category+channel set for a course.
 
@@ -103,6 +367,8 @@ async def add_course(guild: discord.Guild, amc: Category,
         course: The course code to create items for.
         on_demand: If True, this is being done on demand and the
             relevant configuration option should be respected.
+        move: If True, move existing channels into the course's category,
+            such as one it overflowed into.
     """
     amc_key = amc_name(amc)
     _amc_role = amc_role(guild, amc_key)
@@ -112,6 +378,8 @@ async def add_course(guild: discord.Guild, amc: Category,
             name=amc_key, permissions=discord.Permissions.none(),
             hoist=False, mentionable=False
         )
+        # cache it now; the gateway event may come late, or (over HTTP) never
+        guild._add_role(_amc_role)
     # define perms for various contexts
     default_perms = discord.PermissionOverwrite(read_messages=False)
     role_perms = discord.PermissionOverwrite(read_messages=True)
@@ -127,27 +395,44 @@ async def add_course(guild: discord.Guild, amc: Category,
             name=course, permissions=discord.Permissions.none(),
             hoist=False, mentionable=False
         )
+        guild._add_role(role)
     if on_demand and not CHANNELS_ON_DEMAND:
         return role, []
+    catalog = await get_catalog(guild.id)
+    # using the course counts as activity in its channels
+    activity.touch(guild.id, course)
+    names = [course.lower() + suffix for suffix in COURSE_CHANNEL_SUFFIXES]
+    # search in guild channels: no duplicate channels across categories
+    existing = {channel.name: channel
+                for channel in course_channels(guild, course)}
+    missing = [name for name in names if name not in existing]
+    if not missing and not move:
+        # channels in a category from before it overflowed stay there
+        return role, [existing[name] for name in names]
+    category = amc_category(guild, catalog, amc, course)
+    needed = len(missing) + (category is None)
+    if needed:
+        await make_room(guild, catalog, needed)
     # get a/m/c category
-    category = amc_category(guild, amc)
     if category is None:
-        _amc_name = amc_full_name(amc)
+        _amc_name = catalog.category_name(amc, course)
         logger.debug('Creating %r category', _amc_name)
         category = await guild.create_category(_amc_name, overwrites={
             guild.default_role: default_perms,
             _amc_role: role_perms,
             guild.me: my_perms,
         })
+        guild._add_channel(category)
     # create channels
     channels: list[discord.TextChannel] = []
-    for suffix in COURSE_CHANNEL_SUFFIXES:
-        name = course.lower() + suffix
-        # search in guild channels: no duplicate channels across categories
-        channel = discord.utils.get(guild.channels, name=name)
-        if isinstance(channel, discord.TextChannel):
+    moved: list[discord.TextChannel] = []
+    for name in names:
+        channel = existing.get(name)
+        if channel is not None:
             logger.debug('Found #%s', name)
             channels.append(channel)
+            if move and channel.category_id != category.id:
+                moved.append(channel)
             continue
         logger.debug('Creating #%s', name)
         channel = await category.create_text_channel(name, overwrites={
@@ -157,5 +442,7 @@ async def add_course(guild: discord.Guild, amc: Category,
             role: role_perms,
             guild.me: my_perms,
         })
+        guild._add_channel(channel)
         channels.append(channel)
+    await sort_category(category, moved)
     return role, channels
@@ -0,0 +1,185 @@
+# stdlib
+import csv
+import asyncio
+from collections import Counter
+from logging import getLogger
+from typing import AsyncIterator, Iterable
+
+# 3rd-party
+import aiohttp
+import discord
+
+# 1st-party
+from .course_creation import Catalog, add_course
+
+logger = getLogger(__name__)
+
+# how many members' roles to edit at once in bulk operations; Discord's
+# per-guild rate limit on member edits makes more no faster
+EDIT_CONCURRENCY = 5
+
+class EnrollmentCounts:
+    """How many members have each role, per guild.
+
+    A guild's counts are taken from its member cache once, the first time
+    they're needed, and kept up to date from member events and the bot's
+    own role changes after that, so reading them never scans members.
+    """
+
+    def __init__(self) -> None:
+        # guild ID -> role ID -> number of members with it
+        self.counts: dict[int, Counter[int]] = {}
+
+    async def get(self, guild: discord.Guild) -> Counter[int]:
+        """Get the role counts for a guild, counting them if needed."""
+        counts = self.counts.get(guild.id)
+        if counts is not None:
+            return counts
+        if not guild.chunked:
+            await guild.chunk()
+        # no awaits from here on, so no events are missed
+        counts = self.counts.get(guild.id)
+        if counts is None:
+            counts = Counter(role_id for member in guild.members
+                             for role_id in member._roles)
+            self.counts[guild.id] = counts
+            logger.info('Counted roles of %s member(s) in guild ID %s',
+                        len(guild.members), guild.id)
+        return counts
+
+    def update(self, guild_id: int, before: Iterable[int],
+               after: Iterable[int]) -> None:
+        """Account for a member's roles changing."""
+        counts = self.counts.get(guild_id)
+        if counts is None:
+            return
+        before, after = set(before), set(after)
+        for role_id in after - before:
+            counts[role_id] += 1
+        for role_id in before - after:
+            counts[role_id] -= 1
+
+    def record(self, member: discord.Member, role: discord.Role,
+               added: bool) -> None:
+        """Account for the bot giving a member a role or taking it away.
+
+        The cached member is updated too, so that the member update event
+        Discord sends for the change isn't counted again. If that event
+        came first, this does nothing.
+        """
+        cached = member.guild.get_member(member.id)
+        if cached is None or (role.id in cached._roles) == added:
+            return
+        before = list(cached._roles)
+        if added:
+            cached._roles.add(role.id)
+        else:
+            cached._roles.remove(role.id)
+        self.update(member.guild.id, before, cached._roles)
+
+    def forget(self, guild_id: int) -> None:
+        """Drop a guild's counts, e.g. when leaving it."""
+        self.counts.pop(guild_id, None)
+
+enrollment = EnrollmentCounts()
+
+async def read_csv(url: str) -> AsyncIterator[tuple[int, list[str]]]:
+    """Stream the rows of a CSV file at a URL, with their line numbers.
+
+    Quoted fields can't span lines, which is fine for IDs and course codes.
+    """
+    async with aiohttp.ClientSession() as session:
+        async with session.get(url) as resp:
+            resp.raise_for_status()
+            lineno = 0
+            async for line in resp.content:
+                lineno += 1
+                text = line.decode('utf-8-sig', 'replace').rstrip('\r\n')
+                yield lineno, next(csv.reader([text]), [])
+
+async def parse_enrollment(
+    catalog: Catalog, rows: AsyncIterator[tuple[int, list[str]]],
+) -> tuple[dict[int, list[str]], list[str]]:
+    """Read which courses to give each member from rows of a user ID and
+    course codes. Returns them with a description of each problem with
+    the rows, none of which stop the rest being read.
+    """
+    problems: list[str] = []
+    wanted: dict[int, set[str]] = {}
+    async for lineno, row in rows:
+        cells = [cell.strip() for cell in row if cell.strip()]
+        if not cells:
+            continue
+        try:
+            user_id = int(cells[0])
+        except ValueError:
+            if lineno != 1: # otherwise probably a header
+                problems.append(f'Line {lineno}: invalid user ID {cells[0]!r}')
+            continue
+        if len(cells) < 2:
+            problems.append(f'Line {lineno}: no courses given')
+            continue
+        for course in cells[1:]:
+            course = course.upper()
+            if course in catalog.course_amcs:
+                wanted.setdefault(user_id, set()).add(course)
+            else:
+                problems.append(f'Line {lineno}: no such course {course!r}')
+    return {user_id: sorted(courses)
+            for user_id, courses in wanted.items()}, problems
+
+async def set_up_courses(guild: discord.Guild, catalog: Catalog,
+                         courses: list[str]) -> list[str]:
+    """Make sure each course has its role, returning a description
+    of each course that couldn't be set up.
+    """
+    problems: list[str] = []
+    for course in courses:
+        try:
+            await add_course(guild, catalog.course_amc(course), course, True)
+        except discord.HTTPException as exc:
+            problems.append(f'{course}: could not set up course ({exc.text})')
+    return problems
+
+async def enroll_members(
+    guild: discord.Guild, wanted: dict[int, list[str]],
+) -> tuple[int, list[str]]:
+    """Give members the roles of courses, which must already be set up.
+
+    Each member's roles are edited at most once. Returns the number of
+    members given roles and a description of each problem, none of which
+    stop the rest being enrolled.
+    """
+    roles = {role.name: role for role in guild.roles}
+    problems: list[str] = []
+    sem = asyncio.Semaphore(EDIT_CONCURRENCY)
+    enrolled = 0
+
+    async def enroll(user_id: int, courses: list[str]) -> None:
+        nonlocal enrolled
+        async with sem:
+            try:
+                member = guild.get_member(user_id) \
+                    or await guild.fetch_member(user_id)
+                new_roles = [roles[course] for course in courses
+                             if course in roles
+                             and roles[course] not in member.roles]
+                if new_roles:
+                    # one member edit for all the roles
+                    await member.add_roles(
+                        *new_roles, reason='Bulk enrollment', atomic=False)
+            except discord.NotFound:
+                problems.append(f'User ID {user_id}: not in the server')
+                return
+            except discord.HTTPException as exc:
+                problems.append(f'User ID {user_id}: {exc.text}')
+                return
+        for role in new_roles:
+            enrollment.record(member, role, True)
+        enrolled += bool(new_roles)
+
+    await asyncio.gather(*(enroll(user_id, courses)
+                           for user_id, courses in wanted.items()))
+    logger.info('Bulk enrolled %s member(s) in guild ID %s, %s problem(s)',
+                enrolled, guild.id, len(problems))
+    return enrolled, problems
@@ -1,6 +1,5 @@
 # stdlib
 from logging import getLogger
-import json
 from typing import Optional, cast
 import asyncio
 
@@ -9,50 +8,82 @@ import discord
 from discord.ext import commands
 
 # 1st-party
-from .course_creation import add_course, load_course_info, \
-    AREAS, MINORS_CERTS, COURSES
-from ..utils import Category, Level
+from config import VERIFY_SELECTOR_MESSAGES
+from .course_creation import Catalog, CoursePage, add_course, \
+    clear_catalogs, get_catalog
+from .enrollment import enrollment
+from ..cluster import subscribe
+from ..state import state
+from ..utils import Category, Level, error_embed
 
 logger = getLogger(__name__)
 
-MESSAGE_FILENAME = 'messages.json'
+# how many selector messages to verify at once
+VERIFY_CONCURRENCY = 5
 
 GIVEN_MESSAGE = 'Gave %r (%s) role to %s (%s)'
 REMOVED_MESSAGE = 'Removed %r (%s) role from %s (%s)'
 HAD_MESSAGE = '%r (%s) role already given to %s (%s)'
 NOT_HAD_MESSAGE = '%r (%s) role not present on %s (%s)'
 
-load_course_info()
+@subscribe('reload_catalog')
+async def reload_catalog(data: dict) -> None:
+    # sent selectors keep their options, but lookups see the changes
+    clear_catalogs()
+    logger.info('Reloaded course info')
 
 class CategoryView(discord.ui.View):
-    def __init__(self):
+    def __init__(self, catalog: Optional[Catalog] = None):
+        """Create an area/minor/certificate selector.
+
+        The catalog is only needed to send the selector; views registered
+        to listen to existing selectors only need the right custom IDs.
+        """
         super().__init__(timeout=None)
+        if catalog is None:
+            return
+        self.area.options = [
+            discord.SelectOption(label=area, value=f'{i}')
+            for i, area in catalog.areas.items()]
+        self.minor_cert.options = [
+            discord.SelectOption(label=name, value=key)
+            for key, name in catalog.minors_certs.items()]
+        # selects can't be empty
+        if not catalog.areas:
+            self.remove_item(self.area)
+        if not catalog.minors_certs:
+            self.remove_item(self.minor_cert)
 
-    @discord.ui.select(options=[
-        discord.SelectOption(label=area, value=f'{i}')
-        for i, area in AREAS.items()
-    ], placeholder='Choose an area')
+    @discord.ui.select(placeholder='Choose an area', custom_id='ECEBot:area')
     async def area(self, ctx: discord.Interaction,
                    select: discord.ui.Select) -> None:
-        await self._category(ctx, int(select.values[0]),
-                             f'Area {select.values[0]}')
+        await self._category(ctx, int(select.values[0]))
 
-    @discord.ui.select(options=[
-        discord.SelectOption(label=name, value=key)
-        for key, name in MINORS_CERTS.items()
-    ], placeholder='Choose a minor/certificate')
+    @discord.ui.select(placeholder='Choose a minor/certificate',
+                       custom_id='ECEBot:minor_cert')
     async def minor_cert(self, ctx: discord.Interaction,
                          select: discord.ui.Select) -> None:
-        await self._category(ctx, select.values[0],
-                             MINORS_CERTS[select.values[0]])
+        await self._category(ctx, select.values[0])
 
-    async def _category(self, ctx: discord.Interaction,
-                        key: Category, value: str) -> None:
+    async def _category(self, ctx: discord.Interaction, key: Category) -> None:
         assert ctx.guild is not None
         assert ctx.message is not None
         assert isinstance(ctx.user, discord.Member)
-        view = LevelView(category=key)
-        await ctx.response.edit_message(view=self)
+        catalog = await get_catalog(ctx.guild.id)
+        if key not in catalog.courses:
+            # the catalog changed since the selector was sent
+            await ctx.response.send_message(embed=error_embed(
+                'That option is no longer available.'), ephemeral=True)
+            return
+        value = f'Area {key}' if isinstance(key, int) \
+            else catalog.minors_certs[key]
+        view: discord.ui.View
+        if all(len(pages) == 1 for pages in catalog.pages[key].values()):
+            view = LevelView(category=key, catalog=catalog)
+        else:
+            view = PagedLevelView(category=key, catalog=catalog)
+        # clear the choice; registered views have no options to send
+        await ctx.response.edit_message(view=CategoryView(catalog))
         await ctx.followup.send(
             content=f'Choose {value} courses from the below dropdowns.',
             view=view,
@@ -60,39 +91,118 @@ class CategoryView(discord.ui.View):
         )
 
 class LevelView(discord.ui.View):
+    """One course dropdown per level, for categories that fit."""
+
+    def __init__(self, *, category: Category, catalog: Catalog,
+                 timeout: Optional[float] = 180):
+        super().__init__(timeout=timeout)
+        for (page,) in catalog.pages[category].values():
+            self.add_item(CourseSelect(category=category, page=page))
+
+class PagedLevelView(discord.ui.View):
+    """Choose a level, then page through its courses,
+    for categories with too many courses to show at once.
+    """
 
-    def __init__(self, *, category: Category, timeout: Optional[float] = 180):
+    level: Level
+    page: int
+
+    def __init__(self, *, category: Category, catalog: Catalog,
+                 timeout: Optional[float] = 180):
         super().__init__(timeout=timeout)
-        for level in 100, 200, 300, 400, 500:
-            courses = COURSES[category][level]
-            if courses:
-                self.add_item(CourseSelect(
-                    category=category, level=level, courses=courses))
+        self.category = category
+        self.catalog = catalog
+        self.levels = catalog.pages[category]
+        self.level_select.options = [
+            discord.SelectOption(
+                label=f'{level}-level courses', value=str(level),
+                description=f'{len(catalog.courses[category][level])} courses')
+            for level in self.levels]
+        self.courses = CourseSelect(
+            category=category, page=next(iter(self.levels.values()))[0], row=1)
+        self.add_item(self.courses)
+        self.show(next(iter(self.levels)), 0)
+
+    def show(self, level: Level, page: int) -> None:
+        """Switch to a page of courses at a level."""
+        self.level = level
+        self.page = page
+        pages = self.levels[level]
+        self.courses.show(pages[page])
+        self.level_select.placeholder = (
+            f'{level}-level courses (page {page + 1} of {len(pages)})')
+        self.prev_page.disabled = page == 0
+        self.next_page.disabled = page == len(pages) - 1
+
+    @discord.ui.select(row=0)
+    async def level_select(self, ctx: discord.Interaction,
+                           select: discord.ui.Select) -> None:
+        self.show(cast(Level, int(select.values[0])), 0)
+        await ctx.response.edit_message(view=self)
+
+    @discord.ui.button(label='Previous', emoji='\N{BLACK LEFT-POINTING TRIANGLE}',
+                       row=2)
+    async def prev_page(self, ctx: discord.Interaction,
+                        button: discord.ui.Button) -> None:
+        self.show(self.level, self.page - 1)
+        await ctx.response.edit_message(view=self)
+
+    @discord.ui.button(label='Next', emoji='\N{BLACK RIGHT-POINTING TRIANGLE}',
+                       row=2)
+    async def next_page(self, ctx: discord.Interaction,
+                        button: discord.ui.Button) -> None:
+        self.show(self.level, self.page + 1)
+        await ctx.response.edit_message(view=self)
 
-class CourseSelect(discord.ui.Select[LevelView]):
+    @discord.ui.button(label='Jump to...', style=discord.ButtonStyle.primary,
+                       row=2)
+    async def jump(self, ctx: discord.Interaction,
+                   button: discord.ui.Button) -> None:
+        await ctx.response.send_modal(JumpModal(self))
+
+class JumpModal(discord.ui.Modal):
+
+    prefix: discord.ui.TextInput
+
+    def __init__(self, picker: PagedLevelView) -> None:
+        super().__init__(title='Jump to Courses')
+        self.picker = picker
+        self.prefix = discord.ui.TextInput(
+            label='Course code starts with', placeholder='ECE3',
+            max_length=10)
+        self.add_item(self.prefix)
+
+    async def on_submit(self, ctx: discord.Interaction, /) -> None:
+        prefix = self.prefix.value.strip().upper()
+        found = self.picker.catalog.find_page(self.picker.category, prefix)
+        if found is None:
+            await ctx.response.send_message(embed=error_embed(
+                f'No courses starting with {prefix!r}'), ephemeral=True)
+            return
+        self.picker.show(*found)
+        await ctx.response.edit_message(view=self.picker)
+
+class CourseSelect(discord.ui.Select[discord.ui.View]):
 
     category: Category
 
-    def __init__(self, *, category: Category,
-                 level: Level, courses: list[str]) -> None:
-        super().__init__(
-            placeholder=f'{level}-level courses',
-            options=[discord.SelectOption(label=course)
-                     for course in courses]
-        )
+    def __init__(self, *, category: Category, page: CoursePage,
+                 row: Optional[int] = None) -> None:
+        super().__init__(placeholder=page.placeholder,
+                         options=page.options, row=row)
         self.category = category
 
+    def show(self, page: CoursePage) -> None:
+        """Show a different page of courses."""
+        self.placeholder = page.placeholder
+        self.options = page.options
+
     async def callback(self, ctx: discord.Interaction) -> None:
         assert ctx.guild is not None
         assert isinstance(ctx.user, discord.Member)
         name = self.values[0]
-        for cat, levels in COURSES.items():
-            level_courses = set(sum(levels.values(), start=[]))
-            if name in level_courses:
-                category = cat
-                break
-        else:
-            category = self.category
+        catalog = await get_catalog(ctx.guild.id)
+        category = catalog.course_amcs.get(name, self.category)
         _, (role, _) = await asyncio.gather(
             # clear dropdown
             ctx.response.edit_message(view=self.view),
@@ -102,45 +212,69 @@ class CourseSelect(discord.ui.Select[LevelView]):
         )
         if role in ctx.user.roles:
             await ctx.user.remove_roles(role, reason='Requested by user')
+            enrollment.record(ctx.user, role, False)
             logger.info(REMOVED_MESSAGE, name, role.id, ctx.user, ctx.user.id)
             await ctx.followup.send(
                 content=f'Successfully removed your {name!r} role.', ephemeral=True)
         else:
             await ctx.user.add_roles(role, reason='Requested by user')
+            enrollment.record(ctx.user, role, True)
             logger.info(GIVEN_MESSAGE, name, role.id, ctx.user, ctx.user.id)
             await ctx.followup.send(
                 content=f'Successfully gave you the {name!r} role.', ephemeral=True)
 
 async def load_guilds(bot: commands.Bot) -> None:
-    data = {}
-    try:
-        with open(MESSAGE_FILENAME, 'r', encoding='utf8') as f:
-            data: dict[str, int] = json.load(f)
-    except FileNotFoundError:
+    """Re-attach persistent views to all registered selector messages.
+
+    This makes no API calls: interactions on the stored messages are
+    routed by message ID and the views' fixed custom IDs, so it can
+    (and should) be done before connecting to the gateway.
+    """
+    data = await state.selector_messages()
+    if not data:
         logger.warning('No guild data to load')
         return
-    else:
-        # to prevent modifying a dictionary we're iterating over
-        data_items = list(data.items())
-        for channel_id, message_id in data_items:
-            channel_id = int(channel_id)
-            try:
-                channel = cast(discord.TextChannel, bot.get_channel(channel_id)
-                               or await bot.fetch_channel(channel_id))
-            except discord.NotFound:
-                logger.error('Channel ID %s not found, unsetting', channel_id)
-                del data[str(channel_id)] # clear this channel
-                continue
-            message = channel.get_partial_message(message_id)
-            logger.info('Taking ownership of #%s (%s) %s',
-                        channel.name, channel.id, message.id)
+    for message_id in data.values():
+        bot.add_view(CategoryView(), message_id=message_id)
+    logger.info('Registered %s selector message(s)', len(data))
+    if VERIFY_SELECTOR_MESSAGES:
+        asyncio.create_task(verify_guilds(bot, data))
+
+async def verify_guilds(bot: commands.Bot, data: dict[int, int]) -> None:
+    """Check that registered selector messages still exist,
+    and unset the ones that don't.
+
+    This also refreshes the components on each message in a known guild
+    from its catalog, which upgrades messages that were sent before their
+    views had fixed custom IDs. Messages elsewhere are only fetched.
+    """
+    await bot.wait_until_ready()
+    sem = asyncio.Semaphore(VERIFY_CONCURRENCY)
+
+    async def verify(channel_id: int, message_id: int) -> None:
+        channel = bot.get_channel(channel_id)
+        guild = getattr(channel, 'guild', None)
+        message = bot.get_partial_messageable(channel_id) \
+            .get_partial_message(message_id)
+        async with sem:
             try:
-                await message.edit(view=CategoryView())
+                if guild is None:
+                    await message.fetch()
+                else:
+                    catalog = await get_catalog(guild.id)
+                    await message.edit(view=CategoryView(catalog))
             except discord.NotFound:
-                logger.error('Message ID %s not found, unsetting', message.id)
-                del data[str(channel_id)] # clear this message
-                continue
-    finally:
-        with open(MESSAGE_FILENAME, 'w', encoding='utf8') as f:
-            json.dump(data, f)
-        logger.debug('Written updated data')
+                logger.error('Message ID %s in channel ID %s not found, '
+                             'unsetting', message_id, channel_id)
+                await state.unset_selector(channel_id, message_id)
+                return
+            except discord.HTTPException as exc:
+                # don't unset messages we merely failed to reach
+                logger.warning('Could not verify message ID %s: %s',
+                               message_id, exc)
+                return
+        logger.debug('Verified ownership of %s in channel ID %s',
+                     message_id, channel_id)
+
+    await asyncio.gather(*(verify(channel_id, message_id)
+                           for channel_id, message_id in data.items()))
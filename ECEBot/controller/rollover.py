@@ -0,0 +1,74 @@
+# stdlib
+import asyncio
+from logging import getLogger
+
+# 3rd-party
+import discord
+
+# 1st-party
+from .course_creation import get_catalog
+from .enrollment import enrollment
+
+logger = getLogger(__name__)
+
+# members to roll over in each step of a rollover job
+BATCH_SIZE = 50
+# lower than other bulk operations, so that members using the
+# course selector don't wait behind the rollover's edits
+ROLLOVER_CONCURRENCY = 2
+
+async def course_role_ids(guild: discord.Guild) -> set[int]:
+    catalog = await get_catalog(guild.id)
+    return {role.id for role in guild.roles
+            if role.name in catalog.course_amcs}
+
+async def rollover_steps(guild: discord.Guild) -> list[list[int]]:
+    """Get the steps of a rollover job: batches of the IDs of the members
+    with course roles, in ID order.
+    """
+    course_roles = await course_role_ids(guild)
+    if guild.chunked:
+        members = guild.members
+    else:
+        # without waiting on the gateway to chunk the guild
+        members = [member async for member in guild.fetch_members(limit=None)]
+    member_ids = sorted(member.id for member in members
+                        if not course_roles.isdisjoint(member._roles))
+    logger.info('Rolling over %s member(s) in guild ID %s',
+                len(member_ids), guild.id)
+    return [member_ids[i:i+BATCH_SIZE]
+            for i in range(0, len(member_ids), BATCH_SIZE)]
+
+async def roll_over(guild: discord.Guild, member_ids: list[int]) -> None:
+    """Take every course role away from some members of a guild,
+    for the end of a semester, leaving the roles and channels themselves.
+
+    Each member's roles are edited once, and only if they have any course
+    roles, so rolling over the same members again does nothing.
+    """
+    course_roles = await course_role_ids(guild)
+    sem = asyncio.Semaphore(ROLLOVER_CONCURRENCY)
+
+    async def strip(member_id: int) -> None:
+        async with sem:
+            try:
+                member = guild.get_member(member_id) \
+                    or await guild.fetch_member(member_id)
+                removed = [role for role in member.roles
+                           if role.id in course_roles]
+                if not removed:
+                    return
+                await member.edit(roles=[
+                    role for role in member.roles
+                    if not role.is_default() and role.id not in course_roles
+                ], reason='Semester rollover')
+            except discord.NotFound:
+                return # left the server
+            except discord.HTTPException as exc:
+                logger.warning('Could not roll over member ID %s: %s',
+                               member_id, exc.text)
+                return
+        for role in removed:
+            enrollment.record(member, role, False)
+
+    await asyncio.gather(*(strip(member_id) for member_id in member_ids))
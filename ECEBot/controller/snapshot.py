@@ -0,0 +1,371 @@
+# stdlib
+import os
+import json
+import time
+import asyncio
+import functools
+import itertools
+from logging import getLogger
+from typing import Any, Awaitable, Optional, TypedDict, Union
+
+# 3rd-party
+import discord
+
+# 1st-party
+from .course_creation import Catalog, amc_name, course_of_channel, \
+    sort_category, sort_roles
+from .role_assignment import CategoryView
+from ..cluster import publish
+from ..state import state
+
+logger = getLogger(__name__)
+
+# snapshots are named <guild ID>-<Unix time>.json in here
+SNAPSHOTS_DIRNAME = 'snapshots'
+# requests to make at once when restoring; discord.py waits out rate limits,
+# so more would only queue up behind them
+RESTORE_CONCURRENCY = 5
+# snapshots to keep read, for the steps of restoring them
+SNAPSHOT_CACHE_SIZE = 4
+# overwrite targets that aren't roles
+EVERYONE = '@everyone'
+ME = '@me'
+
+# overwrite target name -> [allow, deny] permission values
+Overwrites = dict[str, list[int]]
+
+class RoleSnapshot(TypedDict):
+    name: str
+    permissions: int
+    color: int
+    hoist: bool
+    mentionable: bool
+
+class ChannelSnapshot(TypedDict):
+    name: str
+    category: Optional[str]
+    position: int
+    topic: Optional[str]
+    overwrites: Overwrites
+
+class SelectorSnapshot(TypedDict):
+    channel: str
+    content: str
+
+class Snapshot(TypedDict):
+    guild_id: int
+    taken: float
+    roles: list[RoleSnapshot]
+    categories: list[ChannelSnapshot]
+    channels: list[ChannelSnapshot]
+    selectors: list[SelectorSnapshot]
+
+# stage, snapshot file name, names of the items to restore in that stage
+RestoreStep = tuple[str, str, list[str]]
+
+def managed_names(catalog: Catalog) -> tuple[set[str], set[str]]:
+    """Get the names of the roles and categories the bot manages."""
+    roles = {amc_name(amc) for amc in catalog.courses}
+    roles.update(catalog.course_amcs)
+    categories = {catalog.category_name(amc, course)
+                  for amc, slots in catalog.course_slots.items()
+                  for course in slots}
+    return roles, categories
+
+def dump_overwrites(channel: discord.abc.GuildChannel) -> Overwrites:
+    """Get a channel's overwrites for roles and the bot, by name.
+
+    Read from the raw overwrites, since building a PermissionOverwrite
+    for each would take most of the time to snapshot a whole guild.
+    """
+    guild = channel.guild
+    overwrites: Overwrites = {}
+    for overwrite in channel._overwrites:
+        if overwrite.id == guild.id:
+            name = EVERYONE
+        elif overwrite.is_member():
+            if overwrite.id != guild.me.id:
+                continue # members other than the bot aren't managed
+            name = ME
+        else:
+            role = guild.get_role(overwrite.id)
+            if role is None:
+                continue # deleted
+            name = role.name
+        overwrites[name] = [overwrite.allow, overwrite.deny]
+    return overwrites
+
+def load_overwrites(guild: discord.Guild, overwrites: Overwrites) -> dict[
+        Union[discord.Role, discord.Member], discord.PermissionOverwrite]:
+    """Resolve overwrites by name to the guild's current roles."""
+    roles = {role.name: role for role in guild.roles}
+    resolved: dict[Union[discord.Role, discord.Member],
+                   discord.PermissionOverwrite] = {}
+    for name, (allow, deny) in overwrites.items():
+        target = guild.default_role if name == EVERYONE \
+            else guild.me if name == ME else roles.get(name)
+        if target is not None:
+            resolved[target] = discord.PermissionOverwrite.from_pair(
+                discord.Permissions(allow), discord.Permissions(deny))
+    return resolved
+
+def dump_channel(channel: Union[discord.TextChannel,
+                                discord.CategoryChannel]) -> ChannelSnapshot:
+    return {
+        'name': channel.name,
+        'category': channel.category.name if channel.category else None,
+        'position': channel.position,
+        'topic': getattr(channel, 'topic', None),
+        'overwrites': dump_overwrites(channel),
+    }
+
+async def take_snapshot(guild: discord.Guild, catalog: Catalog) -> Snapshot:
+    """Snapshot the roles, categories, channels (with their permission
+    overwrites) and selector messages that the bot manages in a guild.
+
+    Everything but the text of selector messages comes from the cache.
+    """
+    role_names, category_names = managed_names(catalog)
+    selectors = {channel_id: message_id for channel_id, message_id
+                 in (await state.selector_messages()).items()
+                 if isinstance(guild.get_channel(channel_id),
+                               discord.TextChannel)}
+    messages = await asyncio.gather(*(
+        guild.get_channel(channel_id).fetch_message(message_id) # type: ignore
+        for channel_id, message_id in selectors.items()
+    ), return_exceptions=True)
+    return {
+        'guild_id': guild.id,
+        'taken': time.time(),
+        'roles': [{
+            'name': role.name, 'permissions': role.permissions.value,
+            'color': role.color.value, 'hoist': role.hoist,
+            'mentionable': role.mentionable,
+        } for role in guild.roles if role.name in role_names],
+        'categories': [dump_channel(category) for category in guild.categories
+                       if category.name in category_names],
+        'channels': [dump_channel(channel) for channel in guild.text_channels
+                     if channel.id in selectors
+                     or course_of_channel(channel, catalog) is not None],
+        'selectors': [{'channel': message.channel.name, # type: ignore
+                       'content': message.content}
+                      for message in messages
+                      if isinstance(message, discord.Message)],
+    }
+
+def snapshot_path(guild_id: int, taken: float) -> str:
+    return os.path.join(SNAPSHOTS_DIRNAME, f'{guild_id}-{int(taken)}.json')
+
+def _write(path: str, snapshot: Snapshot) -> None:
+    os.makedirs(SNAPSHOTS_DIRNAME, exist_ok=True)
+    with open(path, 'w', encoding='utf8') as f:
+        json.dump(snapshot, f, separators=(',', ':'))
+
+async def save_snapshot(snapshot: Snapshot) -> str:
+    """Write a snapshot to a file, returning its path."""
+    path = snapshot_path(snapshot['guild_id'], snapshot['taken'])
+    await asyncio.to_thread(_write, path, snapshot)
+    return path
+
+def list_snapshots(guild_id: int) -> list[str]:
+    """Get the file names of a guild's snapshots, newest first."""
+    if not os.path.isdir(SNAPSHOTS_DIRNAME):
+        return []
+    prefix = f'{guild_id}-'
+    names = [name for name in os.listdir(SNAPSHOTS_DIRNAME)
+             if name.startswith(prefix) and name.endswith('.json')]
+    return sorted(names, key=lambda name: int(name[len(prefix):-5]),
+                  reverse=True)
+
+@functools.lru_cache(maxsize=SNAPSHOT_CACHE_SIZE)
+def _read(path: str) -> Snapshot:
+    with open(path, encoding='utf8') as f:
+        return json.load(f)
+
+async def load_snapshot(name: str) -> Snapshot:
+    """Read a snapshot by file name. Don't modify it: it may be cached,
+    since each step of restoring it needs it.
+    """
+    return await asyncio.to_thread(
+        _read, os.path.join(SNAPSHOTS_DIRNAME, os.path.basename(name)))
+
+def wanted_overwrites(current: Union[discord.TextChannel,
+                                     discord.CategoryChannel],
+                      channel: ChannelSnapshot) -> Optional[Overwrites]:
+    """Get the overwrites to give an existing channel, with those it lost
+    since the snapshot put back, or None if it lost none.
+    """
+    overwrites = dump_overwrites(current)
+    wanted = {**overwrites, **channel['overwrites']}
+    return None if wanted == overwrites else wanted
+
+class Restore:
+    """Recreate what's missing from a guild compared to a snapshot:
+    roles, then categories, then channels, with their permission overwrites,
+    then selector messages.
+
+    This is done as the steps of a job, each recreating up to
+    ``RESTORE_CONCURRENCY`` items of one kind concurrently. Steps only name
+    the items, which are looked up in the snapshot file, and check again
+    what's missing, so that a step interrupted by a restart can run again.
+    """
+
+    def __init__(self, guild: discord.Guild, catalog: Catalog,
+                 snapshot: Snapshot) -> None:
+        self.guild = guild
+        self.catalog = catalog
+        self.snapshot = snapshot
+
+    def existing(self, categories: bool) -> dict[str, Union[
+            discord.TextChannel, discord.CategoryChannel]]:
+        return {channel.name: channel for channel in (
+            self.guild.categories if categories else self.guild.text_channels)}
+
+    async def steps(self, name: str) -> list[RestoreStep]:
+        """Diff the guild against the snapshot, named ``name``,
+        to get the steps of a job restoring it.
+        """
+        steps: list[RestoreStep] = []
+
+        def batches(stage: str, names: list[str]) -> None:
+            for i in range(0, len(names), RESTORE_CONCURRENCY):
+                steps.append((stage, name, names[i:i + RESTORE_CONCURRENCY]))
+
+        roles = {role.name for role in self.guild.roles}
+        missing = [role['name'] for role in self.snapshot['roles']
+                   if role['name'] not in roles]
+        batches('roles', missing)
+        if missing:
+            # created roles go at the bottom
+            steps.append(('sort_roles', name, []))
+        for stage in 'categories', 'channels':
+            existing = self.existing(stage == 'categories')
+            created: list[str] = []
+            edited: list[str] = []
+            created_in: set[str] = set()
+            for channel in sorted(self.snapshot[stage], # type: ignore
+                                  key=lambda data: data['position']):
+                current = existing.get(channel['name'])
+                if current is None:
+                    created.append(channel['name'])
+                    if channel['category'] is not None:
+                        created_in.add(channel['category'])
+                elif wanted_overwrites(current, channel) is not None:
+                    edited.append(channel['name'])
+            # creating and editing channels are rate limited separately,
+            # so mixing them in each step lets them overlap
+            batches(stage, [name for pair in itertools.zip_longest(
+                created, edited) for name in pair if name is not None])
+            if created_in:
+                # created channels go at the end of their categories
+                steps.append(('sort', name, sorted(created_in)))
+        registered = await state.selector_messages()
+        batches('selectors', [
+            selector['channel'] for selector in self.snapshot['selectors']
+            for channel in [discord.utils.get(self.guild.text_channels,
+                                              name=selector['channel'])]
+            if channel is None or channel.id not in registered])
+        return steps
+
+    async def run_step(self, stage: str, names: list[str]) -> None:
+        """Run a step, raising an exception listing the items that failed,
+        after trying them all.
+        """
+        guild = self.guild
+        if stage == 'sort_roles':
+            await sort_roles(guild, self.catalog)
+            return
+        if stage == 'sort':
+            for name in names:
+                category = discord.utils.get(guild.categories, name=name)
+                if category is not None:
+                    await sort_category(category)
+            return
+        # what each item is -> the request recreating it
+        items: dict[str, Awaitable[None]] = {}
+        if stage == 'roles':
+            roles = {role.name for role in guild.roles}
+            for role in self.snapshot['roles']:
+                if role['name'] in names and role['name'] not in roles:
+                    items[f'Role {role["name"]!r}'] = self.create_role(role)
+        elif stage in ('categories', 'channels'):
+            categories = stage == 'categories'
+            existing = self.existing(categories)
+            for channel in self.snapshot[stage]: # type: ignore
+                if channel['name'] not in names:
+                    continue
+                current = existing.get(channel['name'])
+                if current is None:
+                    what = repr(channel['name']) if categories \
+                        else f'#{channel["name"]}'
+                    items[what] = self.create_channel(channel, categories)
+                    continue
+                wanted = wanted_overwrites(current, channel)
+                if wanted is not None:
+                    items[f'Permissions of {current.name!r}'] = \
+                        self.edit_overwrites(current, wanted)
+        elif stage == 'selectors':
+            registered = await state.selector_messages()
+            for selector in self.snapshot['selectors']:
+                channel = discord.utils.get(guild.text_channels,
+                                            name=selector['channel'])
+                if selector['channel'] in names and channel is not None \
+                        and channel.id not in registered:
+                    items[f'Selector in #{channel.name}'] = \
+                        self.send_selector(channel, selector['content'])
+        results = await asyncio.gather(*items.values(),
+                                       return_exceptions=True)
+        problems: list[str] = []
+        for what, result in zip(items, results):
+            if isinstance(result, discord.HTTPException):
+                problems.append(f'{what}: {result.text}')
+            elif isinstance(result, BaseException):
+                raise result
+        if problems:
+            raise RuntimeError('; '.join(problems))
+        logger.debug('Restored %s %s in guild ID %s',
+                     len(items), stage, guild.id)
+
+    async def create_role(self, role: RoleSnapshot) -> None:
+        created = await self.guild.create_role(
+            name=role['name'],
+            permissions=discord.Permissions(role['permissions']),
+            color=role['color'], hoist=role['hoist'],
+            mentionable=role['mentionable'], reason='Restoring snapshot')
+        self.guild._add_role(created)
+
+    async def create_channel(self, channel: ChannelSnapshot,
+                             category: bool) -> None:
+        guild = self.guild
+        overwrites = load_overwrites(guild, channel['overwrites'])
+        created: Union[discord.TextChannel, discord.CategoryChannel]
+        if category:
+            created = await guild.create_category(
+                channel['name'], overwrites=overwrites,
+                reason='Restoring snapshot')
+        else:
+            options: dict[str, Any] = {}
+            if channel['topic'] is not None:
+                options['topic'] = channel['topic']
+            created = await guild.create_text_channel(
+                channel['name'], overwrites=overwrites,
+                category=discord.utils.get(guild.categories,
+                                           name=channel['category']),
+                reason='Restoring snapshot', **options)
+        guild._add_channel(created)
+
+    async def edit_overwrites(self, channel: Union[discord.TextChannel,
+                                                   discord.CategoryChannel],
+                              overwrites: Overwrites) -> None:
+        edited = await channel.edit(
+            overwrites=load_overwrites(self.guild, overwrites),
+            reason='Restoring snapshot')
+        if edited is not None:
+            self.guild._add_channel(edited)
+
+    async def send_selector(self, channel: discord.TextChannel,
+                            content: str) -> None:
+        message = await channel.send(content, view=CategoryView(self.catalog))
+        await state.register_selector(channel.guild.id, channel.id,
+                                      message.id)
+        await publish('selector', message_id=message.id)
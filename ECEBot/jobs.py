@@ -0,0 +1,218 @@
+# stdlib
+import json
+import time
+import asyncio
+from collections import deque
+from logging import getLogger
+from typing import Any, Awaitable, Callable, NamedTuple, Optional
+
+# 3rd-party
+import discord
+from discord.ext import commands
+
+# 1st-party
+from config import JOB_CONCURRENCY, JOB_TOTAL_CONCURRENCY
+from .state import state
+
+logger = getLogger(__name__)
+
+# job statuses
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+UNFINISHED = (QUEUED, RUNNING)
+
+Step = Any # anything JSON-serializable
+StepHandler = Callable[[discord.Guild, Step], Awaitable[None]]
+
+STEP_HANDLERS: dict[str, StepHandler] = {}
+
+def job_kind(kind: str) -> Callable[[StepHandler], StepHandler]:
+    """Register the function that runs each step of a kind of job.
+
+    Steps must be idempotent: a step interrupted by a restart is run again.
+    """
+    def decorator(handler: StepHandler) -> StepHandler:
+        STEP_HANDLERS[kind] = handler
+        return handler
+    return decorator
+
+class Job(NamedTuple):
+    id: int
+    guild_id: int
+    kind: str
+    description: str
+    steps: list[Step]
+    done: int
+    status: str
+    error: Optional[str]
+    created: float
+    updated: float
+
+    @classmethod
+    def from_row(cls, row: tuple[Any, ...]) -> 'Job':
+        job = cls(*row)
+        return job._replace(steps=json.loads(job.steps))
+
+JOB_COLUMNS = ', '.join(Job._fields)
+
+class JobQueue:
+    """Run long admin operations as jobs, persisted in the bot's state,
+    one step at a time, resuming unfinished jobs after a restart.
+
+    At most ``JOB_CONCURRENCY`` jobs run at once in each guild, and at most
+    ``JOB_TOTAL_CONCURRENCY`` in all; the rest wait in the order they were
+    queued. Since each guild only takes its share of the total, a slow
+    guild doesn't hold up jobs in the others.
+    """
+
+    def __init__(self) -> None:
+        self.bot: Optional[commands.Bot] = None
+        # guild ID -> IDs of jobs waiting to run there
+        self.queued: dict[int, deque[int]] = {}
+        # job ID -> task running it
+        self.running: dict[int, asyncio.Task[None]] = {}
+        self.running_guilds: dict[int, set[int]] = {}
+        self.cancelled: set[int] = set()
+
+    async def get(self, job_id: int) -> Optional[Job]:
+        rows = await state.fetchall(
+            f'SELECT {JOB_COLUMNS} FROM jobs WHERE id = ?', job_id)
+        return Job.from_row(rows[0]) if rows else None
+
+    async def recent(self, guild_id: int, limit: int = 20) -> list[Job]:
+        """Get a guild's most recent jobs."""
+        rows = await state.fetchall(
+            f'SELECT {JOB_COLUMNS} FROM jobs WHERE guild_id = ? '
+            'ORDER BY id DESC LIMIT ?', guild_id, limit)
+        return [Job.from_row(row) for row in rows]
+
+    async def get_many(self, job_ids: list[int]) -> dict[int, Job]:
+        """Get several jobs by ID at once."""
+        if not job_ids:
+            return {}
+        rows = await state.fetchall(
+            f'SELECT {JOB_COLUMNS} FROM jobs WHERE id IN '
+            f'({", ".join("?" * len(job_ids))})', *job_ids)
+        return {job.id: job for job in map(Job.from_row, rows)}
+
+    async def enqueue(self, guild_id: int, kind: str, description: str,
+                      steps: list[Step]) -> int:
+        """Queue a job with precomputed steps, returning its ID."""
+        now = time.time()
+        job_id = await state.insert(
+            'INSERT INTO jobs (guild_id, kind, description, steps, status, '
+            'created, updated) VALUES (?, ?, ?, ?, ?, ?, ?)',
+            guild_id, kind, description, json.dumps(steps), QUEUED, now, now)
+        logger.info('Queued job #%s in guild ID %s: %s',
+                    job_id, guild_id, description)
+        self.queued.setdefault(guild_id, deque()).append(job_id)
+        self.schedule(guild_id)
+        return job_id
+
+    async def resume(self, bot: commands.Bot, load_guild: Optional[
+            Callable[[int], Awaitable[None]]] = None) -> None:
+        """Requeue unfinished jobs in the bot's guilds, oldest first.
+
+        Without a gateway connection to receive guilds from, pass
+        ``load_guild`` to cache the guilds of all unfinished jobs.
+        """
+        self.bot = bot
+        rows = await state.fetchall(
+            'SELECT id, guild_id FROM jobs WHERE status IN (?, ?) '
+            'ORDER BY id', *UNFINISHED)
+        for job_id, guild_id in rows:
+            if job_id in self.running \
+                    or job_id in self.queued.get(guild_id, ()):
+                continue # already resumed
+            if bot.get_guild(guild_id) is None:
+                if load_guild is None:
+                    continue # another worker's guild
+                try:
+                    await load_guild(guild_id)
+                except discord.HTTPException as exc:
+                    # the job fails for want of its guild
+                    logger.warning('Could not load guild ID %s: %s',
+                                   guild_id, exc)
+            logger.info('Resuming job #%s in guild ID %s', job_id, guild_id)
+            self.queued.setdefault(guild_id, deque()).append(job_id)
+        for guild_id in list(self.queued):
+            self.schedule(guild_id)
+
+    async def cancel(self, job_id: int) -> bool:
+        """Cancel a job before its next step. Returns False if finished."""
+        job = await self.get(job_id)
+        if job is None or job.status not in UNFINISHED:
+            return False
+        queued = self.queued.get(job.guild_id)
+        if queued is not None and job_id in queued:
+            queued.remove(job_id)
+        if job_id in self.running:
+            self.cancelled.add(job_id) # noticed between steps
+        await self.set_status(job_id, CANCELLED)
+        logger.info('Cancelled job #%s', job_id)
+        return True
+
+    async def set_status(self, job_id: int, status: str,
+                         error: Optional[str] = None) -> None:
+        await state.execute(
+            'UPDATE jobs SET status = ?, error = ?, updated = ? WHERE id = ?',
+            status, error, time.time(), job_id)
+
+    def schedule(self, guild_id: int) -> None:
+        """Start queued jobs in a guild, as concurrency allows."""
+        queued = self.queued.get(guild_id)
+        running = self.running_guilds.setdefault(guild_id, set())
+        while queued and len(running) < JOB_CONCURRENCY \
+                and len(self.running) < JOB_TOTAL_CONCURRENCY:
+            job_id = queued.popleft()
+            running.add(job_id)
+            self.running[job_id] = asyncio.create_task(
+                self.run(guild_id, job_id))
+
+    async def run(self, guild_id: int, job_id: int) -> None:
+        try:
+            await self.run_steps(job_id)
+        finally:
+            del self.running[job_id]
+            self.running_guilds[guild_id].discard(job_id)
+            self.cancelled.discard(job_id)
+            # the guild that waited longest gets the freed slot first
+            for waiting in sorted(
+                    (other for other, queued in self.queued.items() if queued),
+                    key=lambda other: self.queued[other][0]):
+                self.schedule(waiting)
+
+    async def run_steps(self, job_id: int) -> None:
+        job = await self.get(job_id)
+        if job is None or job.status not in UNFINISHED:
+            return # cancelled while queued
+        guild = self.bot.get_guild(job.guild_id) if self.bot else None
+        handler = STEP_HANDLERS.get(job.kind)
+        if guild is None or handler is None:
+            await self.set_status(job_id, FAILED, 'Guild or job kind missing')
+            return
+        await self.set_status(job_id, RUNNING)
+        for index in range(job.done, len(job.steps)):
+            if job_id in self.cancelled:
+                return
+            try:
+                await handler(guild, job.steps[index])
+            except Exception as exc:
+                logger.exception('Job #%s failed at step %s', job_id, index)
+                if job_id in self.cancelled:
+                    return # cancelled while the step ran
+                await self.set_status(job_id, FAILED,
+                                      f'Step {index + 1}: {exc}')
+                return
+            await state.execute(
+                'UPDATE jobs SET done = ?, updated = ? WHERE id = ?',
+                index + 1, time.time(), job_id)
+        if job_id in self.cancelled:
+            return
+        await self.set_status(job_id, DONE)
+        logger.info('Finished job #%s', job_id)
+
+queue = JobQueue()
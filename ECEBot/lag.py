@@ -0,0 +1,101 @@
+# stdlib
+import sys
+import time
+import bisect
+import asyncio
+import threading
+import traceback
+from logging import getLogger
+from typing import NamedTuple, Optional
+
+logger = getLogger(__name__)
+
+# seconds between measurements
+INTERVAL = 0.1
+# upper bounds of histogram buckets, in seconds; the last bucket is open
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+# innermost frames of a blocking stack to log
+STACK_DEPTH = 25
+
+class LagStats(NamedTuple):
+    samples: int
+    mean: float # seconds
+    max: float # seconds
+    histogram: list[int] # counts per bucket in BUCKETS, then the rest
+    stalls: int # times the loop was blocked past the threshold
+
+class LagWatchdog:
+    """Continuously measure how late the event loop runs scheduled callbacks.
+
+    If given a threshold, a helper thread also watches for the loop being
+    blocked for longer than it, logging the stack of whatever is blocking it.
+    """
+
+    def __init__(self) -> None:
+        self.histogram = [0] * (len(BUCKETS) + 1)
+        self.samples = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.stalls = 0
+        self.heartbeat = time.monotonic()
+        self.task: Optional[asyncio.Task[None]] = None
+        self.stopped = threading.Event()
+
+    def start(self, threshold: Optional[float]) -> None:
+        loop = asyncio.get_running_loop()
+        self.heartbeat = time.monotonic()
+        self.task = loop.create_task(self.measure())
+        if threshold is None:
+            return
+        self.stopped.clear()
+        threading.Thread(
+            target=self.watch, args=(loop, threading.get_ident(), threshold),
+            name='lag-watchdog', daemon=True).start()
+
+    def cancel(self) -> None:
+        self.stopped.set()
+        if self.task is not None:
+            self.task.cancel()
+
+    async def measure(self) -> None:
+        while 1:
+            start = time.monotonic()
+            await asyncio.sleep(INTERVAL)
+            self.heartbeat = time.monotonic()
+            self.record(self.heartbeat - start - INTERVAL)
+
+    def record(self, lag: float) -> None:
+        lag = max(lag, 0.0)
+        self.samples += 1
+        self.total += lag
+        self.max = max(self.max, lag)
+        self.histogram[bisect.bisect_left(BUCKETS, lag)] += 1
+
+    def watch(self, loop: asyncio.AbstractEventLoop,
+              thread_id: int, threshold: float) -> None:
+        """Dump the loop thread's stack once per stall. Runs in a thread."""
+        dumped = False
+        while not self.stopped.wait(min(threshold / 2, INTERVAL)):
+            blocked = time.monotonic() - self.heartbeat - INTERVAL
+            if blocked < threshold:
+                dumped = False
+                continue
+            if dumped:
+                continue
+            dumped = True
+            frame = sys._current_frames().get(thread_id)
+            if frame is None:
+                return # the loop's thread is gone
+            stack = ''.join(traceback.format_stack(frame, STACK_DEPTH))
+            self.stalls += 1
+            # logs are queued for a task on the loop, so log from the loop;
+            # this is logged as soon as the loop is unblocked
+            loop.call_soon_threadsafe(
+                logger.warning, 'Event loop blocked for over %.2fs in:\n%s',
+                blocked, stack.rstrip())
+
+    def stats(self) -> LagStats:
+        return LagStats(self.samples, self.total / (self.samples or 1),
+                        self.max, self.histogram.copy(), self.stalls)
+
+watchdog = LagWatchdog()
@@ -4,8 +4,7 @@ import os
 import time
 import logging
 from logging.handlers import QueueHandler
-from contextlib import contextmanager
-from typing import Iterator
+from typing import Optional
 import asyncio
 
 # 1st-party
@@ -16,8 +15,12 @@ TIME = '%Y-%m-%d'
 
 os.makedirs('logs', exist_ok=True)
 
+# records waiting to be written
+records: Optional[asyncio.Queue[logging.LogRecord]] = None
+
 def activate():
-    queue = asyncio.Queue()
+    global records
+    queue = records = asyncio.Queue()
     handler = QueueHandler(queue) # type: ignore - still implements put_nowait
     handler.setFormatter(logging.Formatter(FORMAT, style='{'))
     logging.basicConfig(handlers=[handler], level=logging.WARNING)
@@ -36,25 +39,9 @@ async def consume_logs(queue: asyncio.Queue[logging.LogRecord]):
     while 1: # the nice thing about tasks is that they can be cancelled
         record = await queue.get()
         handler.emit(record)
+        queue.task_done()
 
-class ListHandler(logging.Handler):
-
-    def __init__(self) -> None:
-        super().__init__()
-        self.logs: list[str] = []
-
-    def emit(self, record: logging.LogRecord) -> None:
-        try:
-            msg = self.format(record)
-            self.logs.append(msg)
-        except Exception:
-            self.handleError(record)
-
-@contextmanager
-def capture_logs(logger: logging.Logger) -> Iterator[list[str]]:
-    handler = ListHandler()
-    logger.addHandler(handler)
-    try:
-        yield handler.logs
-    finally:
-        logger.removeHandler(handler)
+async def flush():
+    """Wait for the records logged so far to be written."""
+    if records is not None:
+        await records.join()
@@ -0,0 +1,65 @@
+# stdlib
+import time
+from collections import Counter
+from logging import getLogger
+from typing import NamedTuple
+
+# 3rd-party
+from discord.ext import tasks, commands
+
+logger = getLogger(__name__)
+
+class ShardStats(NamedTuple):
+    shard_id: int
+    latency: float # seconds
+    guilds: int
+    event_rate: float # events per second
+
+class ShardMetrics:
+    """Periodically log the latency, guild count and event rate of each shard."""
+
+    def __init__(self, bot: commands.AutoShardedBot):
+        self.bot = bot
+        self.task = tasks.loop(minutes=1.0)(self.log_metrics)
+        self.task.before_loop(self.before)
+        # shard ID -> (time, sequence number) at the last logged sample
+        self.last: dict[int, tuple[float, int]] = {}
+
+    def sample(self, update: bool = False) -> list[ShardStats]:
+        """Get current stats for each shard.
+
+        Event rates are averaged since the last logged sample,
+        using the gateway sequence number as an event counter.
+        If ``update`` is True, start a new averaging window.
+        """
+        now = time.monotonic()
+        guilds = Counter(guild.shard_id for guild in self.bot.guilds)
+        stats: list[ShardStats] = []
+        for shard_id, shard in sorted(self.bot.shards.items()):
+            ws = shard._parent.ws
+            seq = (ws.sequence if ws is not None else None) or 0
+            since, last_seq = self.last.get(shard_id, (now, seq))
+            if seq < last_seq: # a new session restarts numbering
+                last_seq = 0
+            rate = (seq - last_seq) / (now - since) if now > since else 0.0
+            if update:
+                self.last[shard_id] = (now, seq)
+            stats.append(ShardStats(shard_id, shard.latency,
+                                    guilds[shard_id], rate))
+        return stats
+
+    async def log_metrics(self):
+        for stats in self.sample(update=True):
+            logger.info('Shard %s: %.0fms latency, %s guild(s), %.2f events/s',
+                        stats.shard_id, stats.latency * 1000,
+                        stats.guilds, stats.event_rate)
+
+    async def before(self):
+        await self.bot.wait_until_ready()
+        self.sample(update=True)
+
+    def start(self):
+        self.task.start()
+
+    def cancel(self):
+        self.task.cancel()
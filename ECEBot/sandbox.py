@@ -0,0 +1,77 @@
+# stdlib
+import re
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from logging import getLogger
+from typing import Optional
+
+logger = getLogger(__name__)
+
+# seconds a pattern may take to search every name in a batch
+REGEX_TIMEOUT = 2.0
+
+class RegexTimeout(Exception):
+    """A pattern took too long to search with, and was stopped."""
+
+def _search(pattern: re.Pattern[str], names: list[str]) -> list[int]:
+    return [index for index, name in enumerate(names) if pattern.search(name)]
+
+class RegexSandbox:
+    """Search with admin-supplied regexes in a worker process,
+    so that one that backtracks catastrophically can't block the event loop,
+    and can be stopped after a timeout by killing the worker.
+
+    Searches run one at a time, so that killing the worker
+    only stops the search that overran.
+    """
+
+    def __init__(self) -> None:
+        self.executor: Optional[ProcessPoolExecutor] = None
+        # made when first needed, in the running event loop
+        self.lock: Optional[asyncio.Lock] = None
+
+    async def search(self, pattern: str, names: list[str],
+                     timeout: float = REGEX_TIMEOUT) -> list[int]:
+        """Get the indexes of the names that a pattern matches part of.
+
+        Raises re.error for an invalid pattern, and RegexTimeout for one
+        that took longer than ``timeout`` seconds to search all the names.
+        """
+        compiled = re.compile(pattern)
+        if self.lock is None:
+            self.lock = asyncio.Lock()
+        async with self.lock:
+            loop = asyncio.get_running_loop()
+            if self.executor is None:
+                # forking would copy the bot's sockets, threads and database
+                self.executor = ProcessPoolExecutor(
+                    max_workers=1,
+                    mp_context=multiprocessing.get_context('spawn'))
+                # don't count starting the worker against the timeout
+                await loop.run_in_executor(
+                    self.executor, _search, compiled, [])
+            try:
+                return await asyncio.wait_for(loop.run_in_executor(
+                    self.executor, _search, compiled, names), timeout)
+            except asyncio.TimeoutError:
+                logger.warning('Pattern %r took over %ss, stopping it',
+                               pattern, timeout)
+                self.close(kill=True)
+                raise RegexTimeout(pattern) from None
+            except BrokenProcessPool:
+                self.close()
+                raise
+
+    def close(self, kill: bool = False) -> None:
+        """Stop the worker, if any; with ``kill``, even if it's busy."""
+        executor, self.executor = self.executor, None
+        if executor is None:
+            return
+        if kill:
+            for process in executor._processes.values():
+                process.kill()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+sandbox = RegexSandbox()
@@ -0,0 +1,127 @@
+# stdlib
+import time
+import asyncio
+from logging import getLogger
+from typing import NamedTuple
+
+# 3rd-party
+import discord
+from discord.ext import commands
+
+# 1st-party
+from .state import GLOBAL_STATE, state
+from .webhook import load_guild
+
+logger = getLogger(__name__)
+
+# bot-wide state key for a shard's gateway session
+SESSION_KEY = 'gateway_session:%s'
+# seconds after closing within which a session is assumed resumable
+RESUME_WINDOW = 60.0
+# seconds to wait for resumed shards to replay the events they missed
+RESUMED_TIMEOUT = 30.0
+# guilds to load over REST at once before resuming
+LOAD_CONCURRENCY = 10
+
+class SavedSession(NamedTuple):
+    session_id: str
+    sequence: int
+    resume_url: str
+    shard_count: int
+    saved: float
+    guild_ids: list[int]
+
+async def save_sessions(bot: commands.AutoShardedBot,
+                        disconnect: bool = True) -> None:
+    """Persist each shard's gateway session, then disconnect it
+    without invalidating the session, so that the next start can resume it.
+
+    If ``disconnect`` is False, stay connected, only checkpointing the
+    sessions in case this process dies.
+    """
+    for shard_id, info in bot.shards.items():
+        shard = info._parent
+        ws = shard.ws
+        if ws is None or ws.session_id is None or ws.sequence is None:
+            continue
+        session = SavedSession(
+            ws.session_id, ws.sequence, str(ws.gateway), bot.shard_count,
+            time.time(), [guild.id for guild in bot.guilds
+                          if guild.shard_id == shard_id])
+        await state.set(GLOBAL_STATE, SESSION_KEY % shard_id,
+                        session._asdict())
+        if not disconnect:
+            continue
+        shard._cancel_task()
+        # Discord invalidates sessions closed with 1000 or 1001
+        await ws.close(code=4000)
+        logger.debug('Saved session of shard %s at sequence %s',
+                     shard_id, ws.sequence)
+
+async def load_sessions(bot: commands.AutoShardedBot
+                        ) -> dict[int, SavedSession]:
+    """Get the saved sessions of all the bot's shards, if all are resumable.
+
+    Resuming some shards while others identify would leave discord.py
+    waiting forever for the resumed shards to become ready, so either
+    all shards resume or none do. Saved sessions are discarded either way.
+    """
+    if bot.shard_count is None:
+        return {} # the shard count will come from Discord
+    shard_ids = bot.shard_ids or range(bot.shard_count)
+    sessions: dict[int, SavedSession] = {}
+    for shard_id in shard_ids:
+        data = await state.get(GLOBAL_STATE, SESSION_KEY % shard_id)
+        if data is None:
+            continue
+        await state.delete(GLOBAL_STATE, SESSION_KEY % shard_id)
+        session = SavedSession(**data)
+        if session.shard_count == bot.shard_count \
+                and time.time() - session.saved < RESUME_WINDOW:
+            sessions[shard_id] = session
+    if len(sessions) < len(shard_ids):
+        if sessions:
+            logger.info('Only %s of %s shard(s) can resume, identifying',
+                        len(sessions), len(shard_ids))
+        return {}
+    return sessions
+
+async def load_resumed_guilds(bot: commands.AutoShardedBot,
+                              sessions: dict[int, SavedSession]) -> None:
+    """Cache the guilds of resuming shards, which Discord won't resend.
+
+    Guilds that can't be loaded, like ones the bot was removed from while
+    it was down, are left out.
+    """
+    sem = asyncio.Semaphore(LOAD_CONCURRENCY)
+
+    async def load(guild_id: int) -> None:
+        async with sem:
+            try:
+                await load_guild(bot, guild_id)
+            except discord.HTTPException as exc:
+                logger.warning('Could not load guild ID %s: %s',
+                               guild_id, exc)
+
+    await asyncio.gather(*(load(guild_id) for session in sessions.values()
+                           for guild_id in session.guild_ids))
+
+async def ready_when_resumed(bot: commands.AutoShardedBot,
+                             shard_ids: set[int]) -> None:
+    """Mark the bot ready once resumed shards have caught up,
+    since discord.py only does so after READY, which resuming skips.
+    """
+    waiting = set(shard_ids)
+
+    def resumed(shard_id: int) -> bool:
+        waiting.discard(shard_id)
+        return not waiting
+
+    try:
+        await bot.wait_for('shard_resumed', check=resumed,
+                           timeout=RESUMED_TIMEOUT)
+    except asyncio.TimeoutError:
+        logger.warning('Shard(s) %s did not resume in time, continuing',
+                       ', '.join(map(str, sorted(waiting))))
+    bot._ready.set()
+    bot.dispatch('ready')
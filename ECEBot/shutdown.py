@@ -0,0 +1,112 @@
+# stdlib
+import time
+import asyncio
+from logging import getLogger
+from typing import Awaitable, Iterable, Optional
+
+# 1st-party
+from . import cluster
+from .state import GLOBAL_STATE, state
+
+logger = getLogger(__name__)
+
+# seconds from the start of shutdown by which everything must be stopped
+DEADLINE = 10.0
+# seconds of that kept for saving state and writing the last logs
+RESERVE = 2.0
+# names of the tasks discord.py runs interaction handlers in
+INTERACTION_TASKS = ('CommandTree-invoker', 'discord-ui-view-dispatch-',
+                     'discord-ui-modal-dispatch-')
+
+def describe(task: asyncio.Task) -> str:
+    coro = task.get_coro()
+    return f'{task.get_name()} ({getattr(coro, "__qualname__", coro)})'
+
+def interaction_tasks() -> set[asyncio.Task]:
+    """Get the tasks handling interactions right now."""
+    return {task for task in asyncio.all_tasks()
+            if task.get_name().startswith(INTERACTION_TASKS)
+            and task is not asyncio.current_task()}
+
+class Shutdown:
+    """Stop the bot's components in order, within one overall deadline,
+    reporting the steps and tasks that overran their share of it.
+    """
+
+    def __init__(self, deadline: float = DEADLINE) -> None:
+        self.deadline = deadline
+        self.started: Optional[float] = None
+
+    def start(self) -> None:
+        """Start the clock. Later calls keep the first start time."""
+        if self.started is None:
+            self.started = time.monotonic()
+            logger.info('Shutting down')
+
+    def remaining(self, reserve: float = 0.0) -> float:
+        self.start()
+        assert self.started is not None
+        return max(0.0, self.started + self.deadline - reserve
+                   - time.monotonic())
+
+    def elapsed(self) -> float:
+        return 0.0 if self.started is None \
+            else time.monotonic() - self.started
+
+    async def step(self, name: str, aw: Awaitable[None],
+                   final: bool = False) -> None:
+        """Run a shutdown step, giving up on it at the deadline.
+
+        Steps that aren't ``final`` leave the reserved time to those that are.
+        """
+        try:
+            await asyncio.wait_for(
+                aw, self.remaining(0.0 if final else RESERVE))
+        except asyncio.TimeoutError:
+            logger.warning('Shutdown step %r overran the deadline', name)
+        except Exception:
+            logger.exception('Shutdown step %r failed', name)
+
+    async def drain(self, name: str, tasks: Iterable[asyncio.Task],
+                    cancel: bool = False) -> None:
+        """Wait for tasks to finish at once, until the deadline
+        (less the time reserved for the final steps).
+
+        If ``cancel`` is True, cancel the tasks still running then.
+        """
+        tasks = set(tasks)
+        if not tasks:
+            return
+        logger.debug('Waiting for %s %s', len(tasks), name)
+        _, pending = await asyncio.wait(tasks,
+                                        timeout=self.remaining(RESERVE))
+        if not pending:
+            return
+        logger.warning('%s %s overran the shutdown deadline%s:\n%s',
+                       len(pending), name, ', cancelling' if cancel else '',
+                       '\n'.join(sorted(map(describe, pending))))
+        if cancel:
+            for task in pending:
+                task.cancel()
+            await asyncio.wait(pending, timeout=1.0)
+
+    async def record(self) -> None:
+        """Store the time of this shutdown, for log_restart()."""
+        await state.set(GLOBAL_STATE, restart_key(), time.time())
+
+shutdown = Shutdown()
+
+def restart_key() -> str:
+    # the workers of a cluster restart separately
+    if cluster.client is None:
+        return 'shutdown'
+    return f'shutdown:{cluster.client.index}'
+
+async def log_restart() -> None:
+    """Log how long it's been since the last recorded shutdown."""
+    key = restart_key()
+    stopped = await state.get(GLOBAL_STATE, key)
+    if stopped is not None:
+        logger.info('Restarted %.2fs after shutting down',
+                    time.time() - stopped)
+        await state.delete(GLOBAL_STATE, key)
@@ -0,0 +1,136 @@
+# stdlib
+import os
+import time
+import fcntl
+import signal
+import asyncio
+from logging import getLogger
+from typing import Optional
+
+# 3rd-party
+from discord.ext import commands
+
+# 1st-party
+from .controller.course_creation import CATALOG_CACHE_SIZE, \
+    CATALOGS_DIRNAME, get_catalog
+from .sessions import save_sessions
+
+logger = getLogger(__name__)
+
+# held by the process connected to the gateway, with its PID and heartbeat
+LEADER_FILENAME = 'leader.lock'
+# seconds between the leader's heartbeats
+HEARTBEAT_INTERVAL = 0.5
+# seconds without a heartbeat after which the leader is taken to be hung
+HEARTBEAT_TIMEOUT = 5.0
+# seconds between the standby's checks on the leader
+POLL_INTERVAL = 0.1
+# seconds between the leader's checkpoints of its gateway sessions,
+# which the standby resumes; older ones only replay more events
+CHECKPOINT_INTERVAL = 5.0
+
+class Leadership:
+    """Decide which of the bot processes on this host connects to the gateway.
+
+    The leader holds an exclusive lock on a file, which the OS releases if
+    it dies, and writes its PID and a heartbeat to it. A standby takes over
+    as soon as the lock is free, or kills a leader whose heartbeat lapsed,
+    since a hung process keeps its lock.
+    """
+
+    def __init__(self, filename: str = LEADER_FILENAME) -> None:
+        self.filename = filename
+        self.fd: Optional[int] = None
+        self.task: Optional[asyncio.Task[None]] = None
+
+    def try_acquire(self) -> bool:
+        fd = os.open(self.filename, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        self.fd = fd
+        self.beat()
+        return True
+
+    def beat(self, at: Optional[float] = None) -> None:
+        """Write this process's PID and the time of its heartbeat."""
+        assert self.fd is not None
+        data = f'{os.getpid()} {time.time() if at is None else at}'
+        os.ftruncate(self.fd, 0)
+        os.pwrite(self.fd, data.encode('ascii'), 0)
+
+    def leader(self) -> Optional[tuple[int, float]]:
+        """Get the leader's PID and last heartbeat, if written yet."""
+        try:
+            with open(self.filename, encoding='ascii') as f:
+                pid, at = f.read().split()
+            return int(pid), float(at)
+        except (OSError, ValueError):
+            return None # not there yet, or caught mid-write
+
+    async def wait(self) -> None:
+        """Wait to become the leader."""
+        logger.info('Standing by')
+        while not self.try_acquire():
+            leader = self.leader()
+            if leader is not None and leader[0] != os.getpid() \
+                    and time.time() - leader[1] > HEARTBEAT_TIMEOUT:
+                logger.warning(
+                    'Leader (pid %s) missed heartbeats for %.1fs, killing it',
+                    leader[0], time.time() - leader[1])
+                try:
+                    os.kill(leader[0], signal.SIGKILL)
+                except ProcessLookupError:
+                    pass # already gone
+            await asyncio.sleep(POLL_INTERVAL)
+        logger.info('Took over as leader')
+
+    def lead(self, bot: commands.AutoShardedBot) -> None:
+        """Keep up heartbeats, and checkpoint the gateway sessions."""
+        self.task = asyncio.create_task(self._lead(bot))
+
+    async def _lead(self, bot: commands.AutoShardedBot) -> None:
+        # checkpoint as soon as ready
+        checkpointed = float('-inf')
+        while True:
+            self.beat()
+            if time.monotonic() - checkpointed >= CHECKPOINT_INTERVAL \
+                    and bot.is_ready():
+                checkpointed = time.monotonic()
+                await save_sessions(bot, disconnect=False)
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+
+    def step_down(self, within: float) -> None:
+        """Stop heartbeats for shutdown, promising to exit within
+        ``within`` seconds, so that the standby doesn't kill this process
+        while it saves its sessions for the standby to resume.
+        """
+        if self.task is not None:
+            self.task.cancel()
+        if self.fd is not None:
+            self.beat(time.time() + within)
+
+    def release(self) -> None:
+        if self.fd is None:
+            return
+        fcntl.flock(self.fd, fcntl.LOCK_UN)
+        os.close(self.fd)
+        self.fd = None
+
+leadership = Leadership()
+
+async def preload() -> None:
+    """Load the course catalogs, and with them the course autocomplete
+    index, of the default and up to the cache size of guilds with their own.
+    """
+    guild_ids: list[Optional[int]] = [None]
+    if os.path.isdir(CATALOGS_DIRNAME):
+        guild_ids.extend(int(name[:-len('.toml')]) for name
+                         in os.listdir(CATALOGS_DIRNAME)
+                         if name.endswith('.toml')
+                         and name[:-len('.toml')].isdigit())
+    guild_ids = guild_ids[:CATALOG_CACHE_SIZE]
+    await asyncio.gather(*map(get_catalog, guild_ids))
+    logger.info('Preloaded %s catalog(s)', len(guild_ids))
@@ -0,0 +1,240 @@
+# stdlib
+import os
+import json
+import sqlite3
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from logging import getLogger
+from typing import Any, Callable, Optional, TypeVar
+
+logger = getLogger(__name__)
+
+STATE_FILENAME = 'state.sqlite3'
+# the guild ID under which to store bot-wide state
+GLOBAL_STATE = 0
+# legacy storage of selector messages, migrated on first open
+# from the same directory as the database
+MESSAGE_FILENAME = 'messages.json'
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS selector_messages (
+    channel_id INTEGER PRIMARY KEY,
+    guild_id INTEGER,
+    message_id INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS guild_state (
+    guild_id INTEGER NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (guild_id, key)
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    guild_id INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    description TEXT NOT NULL,
+    steps TEXT NOT NULL,
+    done INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL,
+    error TEXT,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS course_activity (
+    guild_id INTEGER NOT NULL,
+    course TEXT NOT NULL,
+    last_active REAL NOT NULL,
+    PRIMARY KEY (guild_id, course)
+);
+'''
+
+T = TypeVar('T')
+Statement = tuple[str, tuple[Any, ...]]
+
+class StateStore:
+    """Persistent bot state, kept in an SQLite database.
+
+    All database access happens on one dedicated thread, so the event loop
+    never blocks on disk I/O. Writes issued while another batch is being
+    committed are queued and committed together in one transaction.
+    """
+
+    def __init__(self, filename: str = STATE_FILENAME) -> None:
+        self.filename = filename
+        self._conn: Optional[sqlite3.Connection] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._batch: list[tuple[Statement, asyncio.Future[None]]] = []
+        # commits queued writes; cancelling it mid-batch would lose them
+        self.flusher: Optional[asyncio.Task[None]] = None
+
+    # thread-side methods
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.filename, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.executescript(SCHEMA)
+            self._conn = conn
+            self._migrate(conn)
+        return self._conn
+
+    def _migrate(self, conn: sqlite3.Connection) -> None:
+        """Import selector messages from the old JSON file, once."""
+        filename = os.path.join(os.path.dirname(self.filename),
+                                MESSAGE_FILENAME)
+        try:
+            with open(filename, 'r', encoding='utf8') as f:
+                data: dict[str, int] = json.load(f)
+        except FileNotFoundError:
+            return
+        with conn:
+            conn.execute('BEGIN')
+            conn.executemany(
+                'INSERT OR IGNORE INTO selector_messages '
+                '(channel_id, guild_id, message_id) VALUES (?, NULL, ?)',
+                [(int(channel_id), message_id)
+                 for channel_id, message_id in data.items()])
+        os.replace(filename, filename + '.migrated')
+        logger.info('Migrated %s selector message(s) from %s',
+                    len(data), filename)
+
+    def _commit(self, statements: list[Statement]) -> None:
+        conn = self._connect()
+        with conn:
+            conn.execute('BEGIN')
+            for sql, params in statements:
+                conn.execute(sql, params)
+
+    def _insert(self, sql: str, params: tuple[Any, ...]) -> int:
+        return self._connect().execute(sql, params).lastrowid or 0
+
+    def _fetchall(self, sql: str, params: tuple[Any, ...]) -> list[Any]:
+        return self._connect().execute(sql, params).fetchall()
+
+    def _close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    # loop-side methods
+
+    async def _run(self, func: Callable[..., T], *args: Any) -> T:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix='ECEBot-state')
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    async def _flush(self) -> None:
+        while self._batch:
+            batch, self._batch = self._batch, []
+            try:
+                await self._run(self._commit, [stmt for stmt, _ in batch])
+            except Exception as exc:
+                if len(batch) == 1:
+                    batch[0][1].set_exception(exc)
+                    continue
+                # don't let one bad statement fail the whole batch
+                for stmt, fut in batch:
+                    try:
+                        await self._run(self._commit, [stmt])
+                    except Exception as exc:
+                        fut.set_exception(exc)
+                    else:
+                        fut.set_result(None)
+            else:
+                for _, fut in batch:
+                    fut.set_result(None)
+
+    async def execute(self, sql: str, *params: Any) -> None:
+        """Run a write statement, returning once it has been committed."""
+        fut = asyncio.get_running_loop().create_future()
+        self._batch.append(((sql, params), fut))
+        if self.flusher is None or self.flusher.done():
+            self.flusher = asyncio.create_task(self._flush())
+        await fut
+
+    async def insert(self, sql: str, *params: Any) -> int:
+        """Run an insert statement right away, returning the new row ID."""
+        return await self._run(self._insert, sql, params)
+
+    async def fetchall(self, sql: str, *params: Any) -> list[Any]:
+        """Run a read statement, returning all rows."""
+        return await self._run(self._fetchall, sql, params)
+
+    async def close(self) -> None:
+        """Commit pending writes and close the database."""
+        if self.flusher is not None:
+            await asyncio.gather(self.flusher, return_exceptions=True)
+        # left by a cancelled flusher, or queued since it finished
+        await self._flush()
+        if self._executor is not None:
+            await self._run(self._close)
+            self._executor.shutdown()
+            self._executor = None
+
+    # selector messages
+
+    async def selector_messages(self) -> dict[int, int]:
+        """Get the registered selector messages, keyed by channel ID."""
+        rows = await self.fetchall(
+            'SELECT channel_id, message_id FROM selector_messages')
+        return dict(rows)
+
+    async def register_selector(self, guild_id: Optional[int],
+                                channel_id: int, message_id: int) -> None:
+        """Register a selector message, replacing any in the channel."""
+        await self.execute(
+            'INSERT OR REPLACE INTO selector_messages '
+            '(channel_id, guild_id, message_id) VALUES (?, ?, ?)',
+            channel_id, guild_id, message_id)
+
+    async def unset_selector(self, channel_id: int, message_id: int) -> None:
+        """Unset a selector message, if it is still the registered one."""
+        await self.execute(
+            'DELETE FROM selector_messages '
+            'WHERE channel_id = ? AND message_id = ?',
+            channel_id, message_id)
+
+    # course channel activity
+
+    async def course_activity(self, guild_id: int) -> list[tuple[str, float]]:
+        """Get when each course's channels were last used in a guild,
+        least recently first.
+        """
+        return await self.fetchall(
+            'SELECT course, last_active FROM course_activity '
+            'WHERE guild_id = ? ORDER BY last_active', guild_id)
+
+    async def set_course_activity(self, guild_id: int, course: str,
+                                  last_active: float) -> None:
+        await self.execute(
+            'INSERT OR REPLACE INTO course_activity '
+            '(guild_id, course, last_active) VALUES (?, ?, ?)',
+            guild_id, course, last_active)
+
+    # other per-guild state
+
+    async def get(self, guild_id: int, key: str, default: Any = None) -> Any:
+        """Get a JSON-serializable value stored for a guild."""
+        rows = await self.fetchall(
+            'SELECT value FROM guild_state WHERE guild_id = ? AND key = ?',
+            guild_id, key)
+        if not rows:
+            return default
+        return json.loads(rows[0][0])
+
+    async def set(self, guild_id: int, key: str, value: Any) -> None:
+        """Store a JSON-serializable value for a guild."""
+        await self.execute(
+            'INSERT OR REPLACE INTO guild_state (guild_id, key, value) '
+            'VALUES (?, ?, ?)', guild_id, key, json.dumps(value))
+
+    async def delete(self, guild_id: int, key: str) -> None:
+        """Remove a value stored for a guild."""
+        await self.execute(
+            'DELETE FROM guild_state WHERE guild_id = ? AND key = ?',
+            guild_id, key)
+
+state = StateStore()
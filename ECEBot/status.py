@@ -3,15 +3,22 @@ import discord
 from discord.ext import tasks, commands
 
 class SetStatus:
-    def __init__(self, bot: commands.Bot):
+    def __init__(self, bot: commands.AutoShardedBot):
         self.bot = bot
         self.task = tasks.loop(minutes=5.0)(self.set_status)
         self.task.before_loop(self.before)
+        # shards lose their presence when they reconnect with a new session
+        bot.add_listener(self.set_shard_status, 'on_shard_ready')
 
     async def set_status(self):
+        for shard_id in self.bot.shards:
+            await self.set_shard_status(shard_id)
+
+    async def set_shard_status(self, shard_id: int):
         message = '/course_role'
         await self.bot.change_presence(activity=discord.Activity(
-            type=discord.ActivityType.watching, name=message))
+            type=discord.ActivityType.watching, name=message),
+            shard_id=shard_id)
 
     async def before(self):
         await self.bot.wait_until_ready()
@@ -21,5 +28,6 @@ class SetStatus:
 
     def cancel(self):
         self.task.cancel()
+        self.bot.remove_listener(self.set_shard_status, 'on_shard_ready')
 
     __del__ = cancel
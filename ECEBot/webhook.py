@@ -0,0 +1,248 @@
+# stdlib
+import json
+import time
+import asyncio
+from logging import getLogger
+from typing import Any, Optional
+
+# 3rd-party
+import discord
+from discord.ext import commands
+from discord.webhook.async_ import AsyncWebhookAdapter, async_context
+from aiohttp import web
+
+logger = getLogger(__name__)
+
+# Discord gives up on a response after 3 seconds
+RESPONSE_TIMEOUT = 2.5
+# how long fetched guild data is trusted before fetching it again
+GUILD_TTL = 300.0
+# how long an interaction's token can be used to follow up on it
+TOKEN_TTL = 15 * 60.0
+# interaction type -> response to defer with if the handler is slow
+DEFERRED_RESPONSES: dict[int, dict[str, Any]] = {
+    2: {'type': 5}, # application command -> deferred channel message
+    3: {'type': 6}, # message component -> deferred message update
+    4: {'type': 8, 'data': {'choices': []}}, # autocomplete -> no choices
+    5: {'type': 6}, # modal submit -> deferred message update
+}
+
+class InteractionResponder(AsyncWebhookAdapter):
+    """Send initial interaction responses as HTTP responses
+    to the interactions' requests, instead of as callback requests.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        # interaction ID -> future for the response payload,
+        # or None if it was responded to with a callback request
+        self.pending: dict[int, asyncio.Future[Optional[dict[str, Any]]]] = {}
+        # interaction ID -> application ID and when it was deferred,
+        # for interactions deferred because the handler was slow
+        self.deferred: dict[int, tuple[int, float]] = {}
+
+    def defer(self, interaction_id: int, application_id: int) -> None:
+        """Record that an interaction was deferred on the handler's behalf."""
+        now = time.monotonic()
+        for other, (_, deferred) in list(self.deferred.items()):
+            if now - deferred > TOKEN_TTL:
+                del self.deferred[other]
+        self.deferred[interaction_id] = (application_id, now)
+
+    def create_interaction_response(self, interaction_id: int, token: str,
+                                    **kwargs: Any) -> Any:
+        interaction_id = int(interaction_id)
+        deferred = self.deferred.pop(interaction_id, None)
+        if deferred is not None:
+            return self._respond_late(interaction_id, token, deferred[0],
+                                      **kwargs)
+        fut = self.pending.pop(interaction_id, None)
+        params = kwargs['params']
+        if fut is None or fut.done():
+            return super().create_interaction_response(
+                interaction_id, token, **kwargs)
+        if params.files:
+            # needs a multipart response, so send it as a callback request
+            return self._respond_multipart(fut, interaction_id, token,
+                                           **kwargs)
+        fut.set_result(params.payload)
+        return self._responded(interaction_id, params.payload)
+
+    async def _respond_multipart(
+        self, fut: asyncio.Future[Optional[dict[str, Any]]],
+        interaction_id: int, token: str, **kwargs: Any
+    ) -> Any:
+        try:
+            return await super().create_interaction_response(
+                interaction_id, token, **kwargs)
+        finally:
+            # only now can the request be answered without a response
+            if not fut.done():
+                fut.set_result(None)
+
+    async def _respond_late(self, interaction_id: int, token: str,
+                            application_id: int, **kwargs: Any) -> Any:
+        """Send an initial response to an already deferred interaction
+        as what it would have been after deferring.
+        """
+        params = kwargs.pop('params')
+        payload = params.payload
+        multipart = params.multipart
+        if params.files:
+            # the message is wrapped in the first part's JSON
+            first, *rest = multipart
+            payload = json.loads(first['value'])
+            multipart = [dict(first, value=json.dumps(payload['data'])),
+                         *rest]
+        response_type = payload['type']
+        message = None if params.files else payload.get('data')
+        if response_type == 4: # channel message
+            # replaces the "thinking" message of a deferred command
+            await self.execute_webhook(
+                application_id, token, payload=message, multipart=multipart,
+                files=params.files, wait=True, **kwargs)
+        elif response_type == 7: # message update
+            await self.edit_webhook_message(
+                application_id, token, '@original', payload=message,
+                multipart=multipart, files=params.files, **kwargs)
+        elif response_type not in (5, 6): # deferrals were already sent
+            logger.warning('Interaction %s already deferred, dropping its '
+                           'response of type %s', interaction_id, response_type)
+        return await self._responded(interaction_id, payload)
+
+    async def _responded(self, interaction_id: int,
+                         payload: dict[str, Any]) -> dict[str, Any]:
+        return {'interaction': {'id': str(interaction_id),
+                                'type': payload['type']}}
+
+async def load_guild(bot: commands.Bot, guild_id: int) -> None:
+    """Cache a guild's roles and channels, and the bot's member, over REST."""
+    http = bot.http
+    assert bot.user is not None
+    data, channels, me = await asyncio.gather(
+        http.get_guild(guild_id),
+        http.get_all_guild_channels(guild_id),
+        http.get_member(guild_id, bot.user.id),
+    )
+    data = dict(data, channels=channels, members=[me])
+    bot._connection._add_guild_from_data(data) # type: ignore
+    logger.debug('Loaded guild ID %s', guild_id)
+
+class InteractionServer:
+    """Serve Discord's outgoing-webhook interactions over HTTP,
+    dispatching them as if they had arrived over the gateway.
+    """
+
+    def __init__(self, bot: commands.Bot, public_key: str) -> None:
+        try:
+            from nacl.signing import VerifyKey
+        except ImportError:
+            raise RuntimeError('HTTP interactions require PyNaCl: '
+                               'pip install PyNaCl') from None
+        self.bot = bot
+        self.verify_key = VerifyKey(bytes.fromhex(public_key))
+        self.responder = InteractionResponder()
+        # guild ID -> when its data was fetched
+        self.loaded: dict[int, float] = {}
+        self.loading: dict[int, asyncio.Task[None]] = {}
+        self.dispatching: set[asyncio.Task[None]] = set()
+
+    def verify(self, request: web.Request, body: bytes) -> bool:
+        from nacl.exceptions import BadSignatureError
+        try:
+            self.verify_key.verify(
+                request.headers['X-Signature-Timestamp'].encode() + body,
+                bytes.fromhex(request.headers['X-Signature-Ed25519']))
+        except (KeyError, ValueError, BadSignatureError):
+            return False
+        return True
+
+    def ensure_guild(self, guild_id: int) -> Optional[asyncio.Task[None]]:
+        """Make sure the guild's roles and channels are cached, returning
+        the task loading them if they aren't cached yet.
+
+        Guilds cached some other way, like from the gateway, are trusted.
+        Stale guilds are refreshed in the background.
+        """
+        cached = self.bot.get_guild(guild_id) is not None
+        loaded = self.loaded.get(guild_id)
+        if cached and (loaded is None
+                       or time.monotonic() - loaded < GUILD_TTL):
+            return None
+        task = self.loading.get(guild_id)
+        if task is None:
+            task = self.loading[guild_id] = asyncio.create_task(
+                self.load_guild(guild_id))
+            task.add_done_callback(
+                lambda _: self.loading.pop(guild_id, None))
+        return None if cached else task
+
+    async def load_guild(self, guild_id: int) -> None:
+        try:
+            await load_guild(self.bot, guild_id)
+        except discord.HTTPException as exc:
+            # handlers fall back to the interaction's partial guild
+            logger.warning('Could not load guild ID %s: %s', guild_id, exc)
+            return
+        self.loaded[guild_id] = time.monotonic()
+
+    async def dispatch(self, data: dict[str, Any],
+                       loading: Optional[asyncio.Task[None]]) -> None:
+        if loading is not None:
+            await asyncio.shield(loading)
+        # the adapter is looked up from the context of the handling task
+        async_context.set(self.responder)
+        self.bot._connection.parsers['INTERACTION_CREATE'](data)
+
+    async def handle(self, request: web.Request) -> web.Response:
+        body = await request.read()
+        if not self.verify(request, body):
+            return web.Response(status=401, text='invalid request signature')
+        data = json.loads(body)
+        if data['type'] == 1: # ping
+            return web.json_response({'type': 1})
+        # the deadline includes loading the guild
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + RESPONSE_TIMEOUT
+        loading = None
+        if 'guild_id' in data:
+            loading = self.ensure_guild(int(data['guild_id']))
+        interaction_id = int(data['id'])
+        fut = loop.create_future()
+        self.responder.pending[interaction_id] = fut
+        task = asyncio.create_task(self.dispatch(data, loading))
+        self.dispatching.add(task)
+        task.add_done_callback(self.dispatching.discard)
+        try:
+            payload = await asyncio.wait_for(
+                fut, max(deadline - loop.time(), 0))
+        except asyncio.TimeoutError:
+            self.responder.pending.pop(interaction_id, None)
+            # the handler's initial response becomes a followup
+            self.responder.defer(interaction_id, int(data['application_id']))
+            logger.warning('Interaction %s not responded to in time, deferring',
+                           interaction_id)
+            payload = DEFERRED_RESPONSES.get(data['type'], {'type': 5})
+        if payload is None:
+            # responded to with a callback request
+            return web.Response(status=204)
+        return web.json_response(payload)
+
+    async def start(self, host: Optional[str], port: int) -> web.AppRunner:
+        app = web.Application()
+        app.router.add_post('/interactions', self.handle)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        logger.info('Serving interactions on %s:%s', host or '*', port)
+        return runner
+
+async def serve(bot: commands.Bot, public_key: str,
+                host: Optional[str], port: int) -> None:
+    """Serve interactions until the bot is closed."""
+    runner = await InteractionServer(bot, public_key).start(host, port)
+    try:
+        while not bot.is_closed():
+            await asyncio.sleep(1)
+    finally:
+        await runner.cleanup()
@@ -10,9 +10,16 @@ from types import MappingProxyType
 from typing import Any, BinaryIO, NamedTuple
 
 from ._re import (
+    RE_ARRAY_STR_ITEM,
+    RE_ARRAY_WS,
+    RE_BARE_KEY,
+    RE_BASIC_STR_CHUNK,
     RE_DATETIME,
     RE_LOCALTIME,
+    RE_MULTILINE_BASIC_STR_CHUNK,
     RE_NUMBER,
+    RE_WS,
+    RE_WS_AND_NEWLINE,
     match_to_datetime,
     match_to_localtime,
     match_to_number,
@@ -229,7 +236,19 @@ class Output(NamedTuple):
     flags: Flags
 
 
+# Character sets skipped often enough to scan with a regex
+SKIP_CHARS_RES = {
+    TOML_WS: RE_WS,
+    TOML_WS_AND_NEWLINE: RE_WS_AND_NEWLINE,
+    BARE_KEY_CHARS: RE_BARE_KEY,
+}
+
+
 def skip_chars(src: str, pos: Pos, chars: Iterable[str]) -> Pos:
+    pattern = SKIP_CHARS_RES.get(chars)  # type: ignore[call-overload]
+    if pattern is not None:
+        # pos may be past the end, where match() would clamp it
+        return max(pos, pattern.match(src, pos).end())
     try:
         while src[pos] in chars:
             pos += 1
@@ -273,6 +292,9 @@ def skip_comment(src: str, pos: Pos) -> Pos:
 
 
 def skip_comments_and_array_ws(src: str, pos: Pos) -> Pos:
+    # Fast path: skip valid comments and whitespace in bulk,
+    # leaving anything invalid for the loop below to report
+    pos = max(pos, RE_ARRAY_WS.match(src, pos).end())
     while True:
         pos_before_skip = pos
         pos = skip_chars(src, pos, TOML_WS_AND_NEWLINE)
@@ -413,6 +435,18 @@ def parse_array(src: str, pos: Pos, parse_float: ParseFloat) -> tuple[Pos, list]
     pos += 1
     array: list = []
 
+    # Fast path: take items that are simple strings one regex match at a
+    # time, until the end of the array or an item that needs the full parser
+    while True:
+        match = RE_ARRAY_STR_ITEM.match(src, pos)
+        if match is None:
+            break
+        basic, literal, end = match.groups()
+        array.append(basic if basic is not None else literal)
+        pos = match.end()
+        if end == "]":
+            return pos, array
+
     pos = skip_comments_and_array_ws(src, pos)
     if src.startswith("]", pos):
         return pos + 1, array
@@ -553,12 +587,16 @@ def parse_basic_str(src: str, pos: Pos, *, multiline: bool) -> tuple[Pos, str]:
     if multiline:
         error_on = ILLEGAL_MULTILINE_BASIC_STR_CHARS
         parse_escapes = parse_basic_str_escape_multiline
+        chunk = RE_MULTILINE_BASIC_STR_CHUNK
     else:
         error_on = ILLEGAL_BASIC_STR_CHARS
         parse_escapes = parse_basic_str_escape
+        chunk = RE_BASIC_STR_CHUNK
     result = ""
     start_pos = pos
     while True:
+        # Fast path: skip characters that need no special handling in bulk
+        pos = chunk.match(src, pos).end()
         try:
             char = src[pos]
         except IndexError:
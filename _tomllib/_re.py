@@ -16,6 +16,27 @@ from ._types import ParseFloat
 # - 00:32:00
 _TIME_RE_STR = r"([01][0-9]|2[0-3]):([0-5][0-9]):([0-5][0-9])(?:\.([0-9]{1,6})[0-9]*)?"
 
+# Fast paths for bulk scanning of common constructs. Each only matches
+# input the character-by-character parser would accept, so anything they
+# don't match falls through to it and gets the same results and errors.
+RE_WS = re.compile(r"[ \t]*")
+RE_WS_AND_NEWLINE = re.compile(r"[ \t\n]*")
+RE_BARE_KEY = re.compile(r"[A-Za-z0-9_-]*")
+# Whitespace, newlines and complete comments between array items
+_ARRAY_WS_RE_STR = r"(?:[ \t\n]|#[^\x00-\x08\x0a-\x1f\x7f]*(?=\n|\Z))*"
+RE_ARRAY_WS = re.compile(_ARRAY_WS_RE_STR)
+# One single-line basic string without escapes, or one single-line literal
+# string, followed by the comma or bracket that ends the array item
+RE_ARRAY_STR_ITEM = re.compile(
+    _ARRAY_WS_RE_STR
+    + r"""(?:"([^"\\\x00-\x08\x0a-\x1f\x7f]*)"|'([^'\x00-\x08\x0a-\x1f\x7f]*)')"""
+    + _ARRAY_WS_RE_STR
+    + r"([,\]])"
+)
+# Runs of characters in basic strings that need no special handling
+RE_BASIC_STR_CHUNK = re.compile(r'[^"\\\x00-\x08\x0a-\x1f\x7f]*')
+RE_MULTILINE_BASIC_STR_CHUNK = re.compile(r'[^"\\\x00-\x08\x0b-\x1f\x7f]*')
+
 RE_NUMBER = re.compile(
     r"""
 0
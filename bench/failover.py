@@ -0,0 +1,148 @@
+"""Benchmark failing over from one bot process to a warm standby.
+
+Runs the bot with --standby as two processes sharing one state file and
+leader lock, against a local fake Discord (see bench/fake_discord.py) with
+guilds on every shard, and stops the leader three ways in turn: killing it
+(a crash), stopping it with SIGSTOP (a hang), and with SIGINT (a restart,
+as for a deploy). Each time, a process is started to stand by for the next.
+The fake gateway sends an interaction on each shard as soon as its session
+is live, and the time from stopping the leader to the standby answering one
+on every shard is reported, along with a cold start after a crash, with no
+standby, for comparison.
+
+Run from a directory with a config.py and courses.toml, like the bot.
+Usage: python bench/failover.py [guilds]
+
+With SHARD_COUNT = 6 and 12 guilds:
+- After a crash, the standby answers in about 0.2s, because it resumes
+  the sessions the leader checkpointed.
+- After a hang, it takes HEARTBEAT_TIMEOUT (5s) longer.
+- After a restart, it answers in about 0.2s.
+- With no standby, a cold start after a crash takes about 0.6s, most of
+  it importing and loading the cogs. It also resumes the checkpointed
+  sessions. Before sessions were checkpointed, it had to identify every
+  shard, which took 25.6s.
+
+With SHARD_COUNT = 'auto', the fake gateway recommends one shard, and
+every start identifies, since only a fixed shard count resumes sessions.
+"""
+# stdlib
+import os
+import sys
+import time
+import signal
+import asyncio
+import tempfile
+from typing import Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 1st-party
+from fake_discord import FakeDiscord, point_at # noqa: E402
+
+GUILDS = 12
+# seconds to wait for every shard to answer
+TIMEOUT = 120.0
+# seconds to give a standby to load before relying on it
+WARMUP = 5.0
+
+async def child(port: int, filename: str, lock: str) -> None:
+    """Run the bot in standby mode against the fake on ``port``."""
+    import ECEBot
+    from ECEBot.standby import leadership
+    from ECEBot.state import state
+    point_at(FakeDiscord(port=port))
+    state.filename = filename
+    leadership.filename = lock
+    try:
+        await ECEBot.run_standby()
+    except asyncio.CancelledError:
+        pass
+    finally:
+        await ECEBot.done()
+
+async def spawn(fake: FakeDiscord, tmp: str) -> asyncio.subprocess.Process:
+    return await asyncio.create_subprocess_exec(
+        sys.executable, os.path.abspath(__file__), '--child', str(fake.port),
+        os.path.join(tmp, 'state.sqlite3'), os.path.join(tmp, 'leader.lock'),
+        stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL)
+
+async def answered(fake: FakeDiscord, shard_ids: set[int],
+                   since: float) -> Optional[float]:
+    """Wait for every shard to answer an interaction,
+    returning how long after ``since`` the last one did.
+    """
+    deadline = time.monotonic() + TIMEOUT
+    while set(fake.first_responses) < shard_ids \
+            and time.monotonic() < deadline:
+        await asyncio.sleep(0.01)
+    if set(fake.first_responses) < shard_ids:
+        return None
+    return max(fake.first_responses.values()) - since
+
+def report(name: str, fake: FakeDiscord, elapsed: Optional[float]) -> None:
+    ops = ', '.join(f'{count} {op}' for op, count
+                    in sorted(fake.gateway_ops.items()) if op != 'HEARTBEAT')
+    if elapsed is None:
+        print(f'{name}: no answer on every shard within {TIMEOUT:.0f}s '
+              f'({ops})')
+    else:
+        print(f'{name}: answered on every shard {elapsed:.2f}s after '
+              f'stopping the leader ({ops})')
+
+def reset(fake: FakeDiscord) -> None:
+    fake.first_responses.clear()
+    fake.gateway_ops.clear()
+
+async def main(guilds: int = GUILDS) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        async with FakeDiscord() as fake:
+            fake.interact = True
+            from config import SHARD_COUNT
+            shard_count = fake.recommended_shards \
+                if SHARD_COUNT == 'auto' else SHARD_COUNT or 1
+            # spread the guilds across the shards
+            base = fake.snowflake() >> 22
+            for i in range(guilds):
+                guild = fake.add_guild((base + i) << 22)
+                guild.add_channel(fake.snowflake(), 'general')
+            shard_ids = {(base + i) % shard_count for i in range(guilds)}
+            procs = [await spawn(fake, tmp)]
+            if await answered(fake, shard_ids, time.monotonic()) is None:
+                print('the first leader never answered')
+                return
+            try:
+                for name, stop in (('crash', signal.SIGKILL),
+                                   ('hang', signal.SIGSTOP),
+                                   ('restart', signal.SIGINT)):
+                    procs.append(await spawn(fake, tmp))
+                    await asyncio.sleep(WARMUP)
+                    reset(fake)
+                    leader = procs.pop(0)
+                    since = time.monotonic()
+                    leader.send_signal(stop)
+                    report(name, fake,
+                           await answered(fake, shard_ids, since))
+                    # a hung leader is killed by the standby
+                    await leader.wait()
+                # for comparison, a crash with no standby, as a process
+                # manager would restart the bot
+                await asyncio.sleep(WARMUP)
+                reset(fake)
+                leader = procs.pop(0)
+                since = time.monotonic()
+                leader.kill()
+                await leader.wait()
+                procs.append(await spawn(fake, tmp))
+                report('cold start after a crash', fake,
+                       await answered(fake, shard_ids, since))
+            finally:
+                for proc in procs:
+                    proc.send_signal(signal.SIGINT)
+                    await proc.wait()
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--child']:
+        asyncio.run(child(int(sys.argv[2]), sys.argv[3], sys.argv[4]))
+    else:
+        asyncio.run(main(*map(int, sys.argv[1:])))
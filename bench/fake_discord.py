@@ -0,0 +1,743 @@
+"""A local stand-in for the Discord REST API, for benchmarks.
+
+FakeDiscord serves the REST routes the bot uses from an in-process aiohttp
+server, keeping the roles, channels and members of fake guilds. It emulates
+per-route rate limit buckets and the global rate limit, answering with 429s
+like Discord does, and records every call made to it.
+
+It also serves a fake gateway, which sends READY and the guilds of each
+shard on IDENTIFY, resumes sessions that weren't closed with 1000 or 1001,
+and can send an interaction once each session is live.
+
+fake_bot() loads the real cogs into the bot and points it at a FakeDiscord,
+and invoke() runs slash commands as if a member had used them.
+
+Not a benchmark itself; see bench/setup_api_calls.py for one that uses it.
+"""
+# stdlib
+import os
+import sys
+import json
+import time
+import asyncio
+import itertools
+from collections import Counter
+from typing import Any, NamedTuple, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 3rd-party
+import yarl
+import discord
+from aiohttp import WSMsgType, web
+from discord.ext import commands
+from discord.gateway import DiscordWebSocket
+from discord.webhook import async_ as webhook_async
+
+Payload = dict[str, Any]
+
+BOT_ID = 1
+# owner of the fake guilds, and who invokes commands
+USER_ID = 2
+# requests per bucket per window, unless overridden per route
+DEFAULT_LIMIT = (50, 1.0)
+GLOBAL_LIMIT = (50, 1.0)
+# Discord's limits on these are much stricter than on most routes
+ROUTE_LIMITS: dict[str, tuple[int, float]] = {
+    'POST /guilds/{guild_id}/roles': (10, 1.0),
+    'POST /guilds/{guild_id}/channels': (10, 1.0),
+    'PATCH /guilds/{guild_id}/members/{user_id}': (10, 1.0),
+}
+# parameters that give routes their own buckets, as on Discord
+MAJOR_PARAMS = ('guild_id', 'channel_id', 'webhook_id', 'token')
+
+class Call(NamedTuple):
+    method: str
+    route: str
+    status: int
+    at: float
+
+class Bucket:
+    """A fixed-window rate limit."""
+
+    def __init__(self, limit: int, per: float) -> None:
+        self.limit = limit
+        self.per = per
+        self.remaining = limit
+        self.reset = 0.0
+
+    def hit(self, now: float) -> Optional[float]:
+        """Take a request, or return how long until one can be taken."""
+        if now >= self.reset:
+            self.remaining = self.limit
+            self.reset = now + self.per
+        if self.remaining == 0:
+            return self.reset - now
+        self.remaining -= 1
+        return None
+
+    def headers(self, now: float, bucket: str) -> dict[str, str]:
+        return {
+            'X-RateLimit-Limit': str(self.limit),
+            'X-RateLimit-Remaining': str(self.remaining),
+            'X-RateLimit-Reset': f'{time.time() + self.reset - now:.3f}',
+            'X-RateLimit-Reset-After': f'{self.reset - now:.3f}',
+            'X-RateLimit-Bucket': bucket,
+        }
+
+def json_response(data: Any, status: int = 200,
+                  headers: Optional[dict[str, str]] = None) -> web.Response:
+    # discord.py only parses bodies with exactly this content type,
+    # but aiohttp's json_response() adds a charset
+    return web.Response(body=json.dumps(data).encode('utf8'), status=status,
+                        headers=headers, content_type='application/json')
+
+def not_found(message: str, code: int) -> web.HTTPNotFound:
+    return web.HTTPNotFound(body=json.dumps({'message': message, 'code': code}),
+                            content_type='application/json')
+
+def check_components(data: Optional[Payload]) -> None:
+    """Reject string selects without options, as Discord does."""
+    for row in (data or {}).get('components') or []:
+        for component in row.get('components', []):
+            if component['type'] == 3 and not component.get('options'):
+                raise web.HTTPBadRequest(body=json.dumps({
+                    'message': 'Invalid Form Body', 'code': 50035,
+                    'errors': {'components': {'_errors': [{
+                        'code': 'BASE_TYPE_REQUIRED',
+                        'message': 'This field is required'}]}},
+                }), content_type='application/json')
+
+def user(user_id: int) -> Payload:
+    return {'id': str(user_id), 'username': f'user{user_id}',
+            'discriminator': '0', 'avatar': None, 'global_name': None,
+            'bot': user_id == BOT_ID}
+
+class GatewaySession:
+
+    def __init__(self, session_id: str, shard_id: int,
+                 shard_count: int) -> None:
+        self.id = session_id
+        self.shard_id = shard_id
+        self.shard_count = shard_count
+        self.sequence = 0
+
+class FakeGuild:
+
+    def __init__(self, guild_id: int, owner_id: int) -> None:
+        self.id = guild_id
+        self.owner_id = owner_id
+        self.roles: dict[int, Payload] = {guild_id: {
+            'id': str(guild_id), 'name': '@everyone', 'permissions': '0',
+            'position': 0, 'color': 0, 'hoist': False, 'managed': False,
+            'mentionable': False}}
+        self.channels: dict[int, Payload] = {}
+        self.members: dict[int, Payload] = {}
+
+    def add_role(self, role_id: int, name: str) -> Payload:
+        # new roles go at the bottom, above @everyone
+        for other in self.roles.values():
+            if other['position'] > 0:
+                other['position'] += 1
+        role = self.roles[role_id] = {
+            'id': str(role_id), 'name': name, 'permissions': '0',
+            'position': 1, 'color': 0, 'hoist': False, 'managed': False,
+            'mentionable': False}
+        return role
+
+    def add_channel(self, channel_id: int, name: str, type: int = 0,
+                    parent_id: Optional[int] = None) -> Payload:
+        channel = self.channels[channel_id] = {
+            'id': str(channel_id), 'guild_id': str(self.id), 'type': type,
+            'name': name, 'position': len(self.channels),
+            'parent_id': None if parent_id is None else str(parent_id),
+            'permission_overwrites': [], 'nsfw': False, 'topic': None,
+            'rate_limit_per_user': 0}
+        return channel
+
+    def add_member(self, user_id: int, roles: list[int] = []) -> Payload:
+        member = self.members[user_id] = {
+            'user': user(user_id), 'roles': [str(r) for r in roles],
+            'joined_at': '2022-09-01T00:00:00+00:00', 'deaf': False,
+            'mute': False, 'flags': 0}
+        return member
+
+    def payload(self) -> Payload:
+        """The guild as sent in GUILD_CREATE."""
+        return {
+            'id': str(self.id), 'name': f'Fake Guild {self.id}',
+            'owner_id': str(self.owner_id), 'features': [], 'emojis': [],
+            'stickers': [], 'member_count': len(self.members),
+            'roles': list(self.roles.values()),
+            'channels': list(self.channels.values()),
+            'members': list(self.members.values()),
+        }
+
+class FakeDiscord:
+    """Serve a fake Discord REST API on localhost."""
+
+    def __init__(self, port: int = 8766,
+                 route_limits: dict[str, tuple[int, float]] = ROUTE_LIMITS,
+                 default_limit: tuple[int, float] = DEFAULT_LIMIT,
+                 global_limit: tuple[int, float] = GLOBAL_LIMIT) -> None:
+        self.port = port
+        self.route_limits = route_limits
+        self.default_limit = default_limit
+        self.guilds: dict[int, FakeGuild] = {}
+        self.calls: list[Call] = []
+        self.buckets: dict[tuple[str, str], Bucket] = {}
+        self.global_bucket = Bucket(*global_limit)
+        self.ids = itertools.count(10**17)
+        # interaction ID -> future for its initial response
+        self.responses: dict[int, asyncio.Future[Payload]] = {}
+        # interaction token -> future for the next message sent with it
+        self.followups: dict[str, asyncio.Future[Payload]] = {}
+        # message ID -> the message, as last sent or edited
+        self.messages: dict[int, Payload] = {}
+        self.sessions: dict[str, GatewaySession] = {}
+        # gateway opcode name -> times received
+        self.gateway_ops: Counter[str] = Counter()
+        # if True, send an interaction in each session once it's live
+        self.interact = False
+        # shard ID -> when it first responded to an interaction
+        self.first_responses: dict[int, float] = {}
+        # interaction ID -> shard ID it was sent on
+        self.interaction_shards: dict[int, int] = {}
+        # seconds to take over each request, like the round trip to Discord
+        self.latency = 0.0
+        # how many shards to recommend, as for SHARD_COUNT = 'auto'
+        self.recommended_shards = 1
+        self.runner: Optional[web.AppRunner] = None
+
+    @property
+    def base(self) -> str:
+        return f'http://127.0.0.1:{self.port}/api/v10'
+
+    @property
+    def gateway_url(self) -> str:
+        return f'ws://127.0.0.1:{self.port}/gateway'
+
+    def snowflake(self) -> int:
+        return next(self.ids)
+
+    def add_guild(self, guild_id: Optional[int] = None) -> FakeGuild:
+        guild = FakeGuild(guild_id or self.snowflake(), USER_ID)
+        guild.add_member(BOT_ID)
+        guild.add_member(USER_ID)
+        self.guilds[guild.id] = guild
+        return guild
+
+    def counts(self) -> Counter[str]:
+        """Count the calls made to each route."""
+        return Counter(f'{call.method} {call.route}' for call in self.calls)
+
+    def reset_calls(self) -> None:
+        self.calls.clear()
+
+    # server
+
+    async def start(self) -> None:
+        app = web.Application(middlewares=[self.rate_limit])
+        routes = [
+            ('GET', '/users/@me', self.get_me),
+            ('GET', '/gateway/bot', self.get_gateway),
+            ('GET', '/oauth2/applications/@me', self.get_application),
+            ('GET', '/guilds/{guild_id}', self.get_guild),
+            ('GET', '/guilds/{guild_id}/roles', self.get_roles),
+            ('POST', '/guilds/{guild_id}/roles', self.create_role),
+            ('PATCH', '/guilds/{guild_id}/roles', self.move_roles),
+            ('PATCH', '/guilds/{guild_id}/roles/{role_id}', self.edit_role),
+            ('DELETE', '/guilds/{guild_id}/roles/{role_id}', self.delete_role),
+            ('GET', '/guilds/{guild_id}/channels', self.get_channels),
+            ('POST', '/guilds/{guild_id}/channels', self.create_channel),
+            ('PATCH', '/guilds/{guild_id}/channels', self.move_channels),
+            ('PATCH', '/channels/{channel_id}', self.edit_channel),
+            ('DELETE', '/channels/{channel_id}', self.delete_channel),
+            ('PUT', '/channels/{channel_id}/permissions/{overwrite_id}',
+             self.edit_overwrite),
+            ('POST', '/channels/{channel_id}/messages', self.send_message),
+            ('GET', '/channels/{channel_id}/messages/{message_id}',
+             self.get_message),
+            ('PATCH', '/channels/{channel_id}/messages/{message_id}',
+             self.edit_message),
+            ('GET', '/guilds/{guild_id}/members', self.get_members),
+            ('GET', '/guilds/{guild_id}/members/{user_id}', self.get_member),
+            ('PATCH', '/guilds/{guild_id}/members/{user_id}',
+             self.edit_member),
+            ('PUT', '/guilds/{guild_id}/members/{user_id}/roles/{role_id}',
+             self.add_member_role),
+            ('DELETE', '/guilds/{guild_id}/members/{user_id}/roles/{role_id}',
+             self.remove_member_role),
+            ('POST', '/interactions/{webhook_id}/{token}/callback',
+             self.interaction_callback),
+            ('POST', '/webhooks/{webhook_id}/{token}', self.followup),
+            ('PATCH', '/webhooks/{webhook_id}/{token}/messages/{message_id}',
+             self.followup),
+        ]
+        for method, path, handler in routes:
+            app.router.add_route(method, '/api/v10' + path, handler)
+        app.router.add_get('/gateway', self.gateway)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, '127.0.0.1', self.port).start()
+
+    async def close(self) -> None:
+        if self.runner is not None:
+            await self.runner.cleanup()
+
+    async def __aenter__(self) -> 'FakeDiscord':
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        await self.close()
+
+    @web.middleware
+    async def rate_limit(self, request: web.Request,
+                         handler: Any) -> web.StreamResponse:
+        info = request.match_info
+        route = info.route.resource.canonical[len('/api/v10'):] \
+            if info.route.resource is not None else request.path
+        key = f'{request.method} {route}'
+        major = ','.join(info[param] for param in MAJOR_PARAMS
+                         if param in info)
+        bucket = self.buckets.get((key, major))
+        if bucket is None:
+            bucket = self.buckets[key, major] = Bucket(
+                *self.route_limits.get(key, self.default_limit))
+        now = time.monotonic()
+        # interaction responses and followups aren't subject to the global limit
+        retry_after = None if route.startswith(('/interactions', '/webhooks')) \
+            else self.global_bucket.hit(now)
+        is_global = retry_after is not None
+        if retry_after is None:
+            retry_after = bucket.hit(now)
+        bucket_id = f'{abs(hash(key)):x}'
+        if retry_after is not None:
+            self.calls.append(Call(request.method, route, 429, now))
+            headers = bucket.headers(now, bucket_id)
+            headers['Retry-After'] = f'{retry_after:.3f}'
+            # without this, discord.py takes it for a Cloudflare ban
+            headers['Via'] = '1.1 google'
+            if is_global:
+                headers['X-RateLimit-Global'] = 'true'
+            headers['X-RateLimit-Scope'] = 'global' if is_global else 'user'
+            return json_response({
+                'message': 'You are being rate limited.',
+                'retry_after': retry_after, 'global': is_global,
+            }, status=429, headers=headers)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        try:
+            response = await handler(request)
+        except web.HTTPException as exc:
+            response = exc
+        self.calls.append(Call(request.method, route, response.status, now))
+        response.headers.update(bucket.headers(now, bucket_id))
+        return response
+
+    # helpers
+
+    def guild(self, request: web.Request) -> FakeGuild:
+        guild = self.guilds.get(int(request.match_info['guild_id']))
+        if guild is None:
+            raise not_found('Unknown Guild', 10004)
+        return guild
+
+    def channel_guild(self, channel_id: int) -> FakeGuild:
+        for guild in self.guilds.values():
+            if channel_id in guild.channels:
+                return guild
+        raise not_found('Unknown Channel', 10003)
+
+    async def body(self, request: web.Request) -> Payload:
+        """Get the JSON body of a request, even one with files attached."""
+        if request.content_type != 'multipart/form-data':
+            return await request.json()
+        data = await request.post()
+        return json.loads(str(data['payload_json']))
+
+    def message(self, channel_id: int, data: Payload,
+                message_id: Optional[int] = None) -> Payload:
+        message = {
+            'id': str(message_id or self.snowflake()),
+            'channel_id': str(channel_id), 'author': user(BOT_ID),
+            'content': data.get('content') or '',
+            'timestamp': '2022-09-01T00:00:00+00:00',
+            'edited_timestamp': None, 'tts': False,
+            'mention_everyone': False, 'mentions': [], 'mention_roles': [],
+            'attachments': [], 'embeds': data.get('embeds') or [],
+            'components': data.get('components') or [],
+            'pinned': False, 'type': 0, 'flags': data.get('flags') or 0,
+        }
+        self.messages[int(message['id'])] = message
+        return message
+
+    # routes
+
+    async def get_me(self, request: web.Request) -> web.Response:
+        return json_response(user(BOT_ID))
+
+    async def get_gateway(self, request: web.Request) -> web.Response:
+        return json_response({
+            'url': self.gateway_url, 'shards': self.recommended_shards,
+            'session_start_limit': {'total': 1000, 'remaining': 1000,
+                                    'reset_after': 0, 'max_concurrency': 1}})
+
+    async def get_application(self, request: web.Request) -> web.Response:
+        return json_response({
+            'id': str(BOT_ID), 'name': 'ECEBot', 'description': '',
+            'icon': None, 'bot_public': True, 'bot_require_code_grant': False,
+            'owner': user(USER_ID), 'team': None, 'verify_key': '00' * 32,
+            'flags': 0})
+
+    async def get_guild(self, request: web.Request) -> web.Response:
+        data = self.guild(request).payload()
+        del data['channels'], data['members']
+        return json_response(data)
+
+    async def get_roles(self, request: web.Request) -> web.Response:
+        return json_response(list(self.guild(request).roles.values()))
+
+    async def create_role(self, request: web.Request) -> web.Response:
+        guild = self.guild(request)
+        body = await request.json()
+        role = guild.add_role(self.snowflake(), body.get('name', 'new role'))
+        role.update((key, body[key]) for key in
+                    ('permissions', 'color', 'hoist', 'mentionable')
+                    if key in body)
+        role['permissions'] = str(role['permissions'])
+        return json_response(role)
+
+    async def move_roles(self, request: web.Request) -> web.Response:
+        guild = self.guild(request)
+        for item in await request.json():
+            role = guild.roles.get(int(item['id']))
+            if role is not None and 'position' in item:
+                role['position'] = item['position']
+        return json_response(list(guild.roles.values()))
+
+    async def edit_role(self, request: web.Request) -> web.Response:
+        guild = self.guild(request)
+        role = guild.roles.get(int(request.match_info['role_id']))
+        if role is None:
+            raise not_found('Unknown Role', 10011)
+        role.update(await request.json())
+        return json_response(role)
+
+    async def delete_role(self, request: web.Request) -> web.Response:
+        guild = self.guild(request)
+        role_id = int(request.match_info['role_id'])
+        if guild.roles.pop(role_id, None) is None:
+            raise not_found('Unknown Role', 10011)
+        for member in guild.members.values():
+            if str(role_id) in member['roles']:
+                member['roles'].remove(str(role_id))
+        for channel in guild.channels.values():
+            channel['permission_overwrites'] = [
+                overwrite for overwrite in channel['permission_overwrites']
+                if overwrite['id'] != str(role_id)]
+        return web.Response(status=204)
+
+    async def get_channels(self, request: web.Request) -> web.Response:
+        return json_response(list(self.guild(request).channels.values()))
+
+    async def create_channel(self, request: web.Request) -> web.Response:
+        guild = self.guild(request)
+        body = await request.json()
+        channel = {
+            'id': str(self.snowflake()), 'guild_id': str(guild.id),
+            'type': body.get('type', 0), 'name': body['name'],
+            'position': body.get('position') or len(guild.channels),
+            'parent_id': body.get('parent_id'),
+            'permission_overwrites': body.get('permission_overwrites', []),
+            'nsfw': body.get('nsfw', False), 'topic': body.get('topic'),
+            'rate_limit_per_user': body.get('rate_limit_per_user', 0),
+        }
+        guild.channels[int(channel['id'])] = channel
+        return json_response(channel)
+
+    async def move_channels(self, request: web.Request) -> web.Response:
+        guild = self.guild(request)
+        for item in await request.json():
+            channel = guild.channels.get(int(item['id']))
+            if channel is None:
+                continue
+            for key in ('position', 'parent_id'):
+                if key in item:
+                    channel[key] = item[key]
+        return web.Response(status=204)
+
+    async def edit_channel(self, request: web.Request) -> web.Response:
+        channel_id = int(request.match_info['channel_id'])
+        channel = self.channel_guild(channel_id).channels[channel_id]
+        channel.update(await request.json())
+        return json_response(channel)
+
+    async def delete_channel(self, request: web.Request) -> web.Response:
+        channel_id = int(request.match_info['channel_id'])
+        return json_response(
+            self.channel_guild(channel_id).channels.pop(channel_id))
+
+    async def edit_overwrite(self, request: web.Request) -> web.Response:
+        channel_id = int(request.match_info['channel_id'])
+        channel = self.channel_guild(channel_id).channels[channel_id]
+        body = await request.json()
+        overwrite = dict(body, id=request.match_info['overwrite_id'])
+        channel['permission_overwrites'] = [
+            o for o in channel['permission_overwrites']
+            if o['id'] != overwrite['id']] + [overwrite]
+        return web.Response(status=204)
+
+    async def send_message(self, request: web.Request) -> web.Response:
+        channel_id = int(request.match_info['channel_id'])
+        self.channel_guild(channel_id)
+        data = await self.body(request)
+        check_components(data)
+        return json_response(self.message(channel_id, data))
+
+    async def get_message(self, request: web.Request) -> web.Response:
+        message = self.messages.get(int(request.match_info['message_id']))
+        if message is None \
+                or message['channel_id'] != request.match_info['channel_id']:
+            raise not_found('Unknown Message', 10008)
+        return json_response(message)
+
+    async def edit_message(self, request: web.Request) -> web.Response:
+        channel_id = int(request.match_info['channel_id'])
+        data = await request.json()
+        check_components(data)
+        return json_response(self.message(
+            channel_id, data, int(request.match_info['message_id'])))
+
+    async def get_members(self, request: web.Request) -> web.Response:
+        guild = self.guild(request)
+        after = int(request.query.get('after', 0))
+        limit = int(request.query.get('limit', 1))
+        members = sorted((member for user_id, member in guild.members.items()
+                          if user_id > after),
+                         key=lambda member: int(member['user']['id']))
+        return json_response(members[:limit])
+
+    async def get_member(self, request: web.Request) -> web.Response:
+        member = self.guild(request).members.get(
+            int(request.match_info['user_id']))
+        if member is None:
+            raise not_found('Unknown Member', 10007)
+        return json_response(member)
+
+    async def edit_member(self, request: web.Request) -> web.Response:
+        guild = self.guild(request)
+        member = guild.members.get(int(request.match_info['user_id']))
+        if member is None:
+            raise not_found('Unknown Member', 10007)
+        body = await request.json()
+        if 'roles' in body:
+            member['roles'] = [str(role_id) for role_id in body['roles']]
+        return json_response(member)
+
+    async def add_member_role(self, request: web.Request) -> web.Response:
+        member = self.guild(request).members[
+            int(request.match_info['user_id'])]
+        role_id = request.match_info['role_id']
+        if role_id not in member['roles']:
+            member['roles'].append(role_id)
+        return web.Response(status=204)
+
+    async def remove_member_role(self, request: web.Request) -> web.Response:
+        member = self.guild(request).members[
+            int(request.match_info['user_id'])]
+        role_id = request.match_info['role_id']
+        if role_id in member['roles']:
+            member['roles'].remove(role_id)
+        return web.Response(status=204)
+
+    async def interaction_callback(self, request: web.Request) -> web.Response:
+        interaction_id = int(request.match_info['webhook_id'])
+        body = await self.body(request)
+        check_components(body.get('data'))
+        fut = self.responses.pop(interaction_id, None)
+        if fut is not None and not fut.done():
+            fut.set_result(body)
+        shard_id = self.interaction_shards.pop(interaction_id, None)
+        if shard_id is not None:
+            self.first_responses.setdefault(shard_id, time.monotonic())
+        return json_response({'interaction': {
+            'id': str(interaction_id), 'type': body['type']}})
+
+    async def followup(self, request: web.Request) -> web.Response:
+        data = await self.body(request)
+        check_components(data)
+        message = self.message(0, data)
+        fut = self.followups.pop(request.match_info['token'], None)
+        if fut is not None and not fut.done():
+            fut.set_result(message)
+        return json_response(message)
+
+    def expect_followup(self, token: str) -> asyncio.Future[Payload]:
+        """Get a future for the next message sent with an interaction token."""
+        fut = self.followups[token] = \
+            asyncio.get_running_loop().create_future()
+        return fut
+
+    # gateway
+
+    async def gateway(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        await ws.send_json({'op': 10, 'd': {'heartbeat_interval': 41250},
+                            's': None, 't': None})
+        session: Optional[GatewaySession] = None
+        async for msg in ws:
+            if msg.type != WSMsgType.TEXT:
+                continue
+            data = json.loads(msg.data)
+            op = data['op']
+            if op == 1:
+                self.gateway_ops['HEARTBEAT'] += 1
+                await ws.send_json({'op': 11, 'd': None, 's': None, 't': None})
+            elif op == 2:
+                self.gateway_ops['IDENTIFY'] += 1
+                session = await self.identify(ws, data['d'])
+            elif op == 6:
+                self.gateway_ops['RESUME'] += 1
+                session = self.sessions.get(data['d']['session_id'])
+                if session is None:
+                    await ws.send_json({'op': 9, 'd': False,
+                                        's': None, 't': None})
+                    continue
+                await self.dispatch(ws, session, 'RESUMED', {})
+                await self.go_live(ws, session)
+        # as on Discord, closing normally ends the session
+        if session is not None and ws.close_code in (1000, 1001):
+            self.sessions.pop(session.id, None)
+        return ws
+
+    async def dispatch(self, ws: web.WebSocketResponse,
+                       session: GatewaySession, event: str,
+                       data: Payload) -> None:
+        session.sequence += 1
+        await ws.send_json({'op': 0, 't': event, 's': session.sequence,
+                            'd': data})
+
+    async def identify(self, ws: web.WebSocketResponse,
+                       data: Payload) -> GatewaySession:
+        shard_id, shard_count = data.get('shard', (0, 1))
+        session = GatewaySession(f'session{self.snowflake()}',
+                                 shard_id, shard_count)
+        self.sessions[session.id] = session
+        guilds = [guild for guild in self.guilds.values()
+                  if (guild.id >> 22) % shard_count == shard_id]
+        await self.dispatch(ws, session, 'READY', {
+            'v': 10, 'user': user(BOT_ID), 'session_id': session.id,
+            'resume_gateway_url': self.gateway_url,
+            'shard': [shard_id, shard_count],
+            'guilds': [{'id': str(guild.id), 'unavailable': True}
+                       for guild in guilds],
+            'application': {'id': str(BOT_ID), 'flags': 0},
+        })
+        for guild in guilds:
+            await self.dispatch(ws, session, 'GUILD_CREATE', guild.payload())
+        await self.go_live(ws, session)
+        return session
+
+    async def go_live(self, ws: web.WebSocketResponse,
+                      session: GatewaySession) -> None:
+        """Send an interaction in a shard's first guild, if asked to."""
+        if not self.interact:
+            return
+        for guild in self.guilds.values():
+            if (guild.id >> 22) % session.shard_count == session.shard_id:
+                payload = interaction(self, guild.id, guild.owner_id, 2,
+                                      command('hello'))
+                self.interaction_shards[int(payload['id'])] = session.shard_id
+                await self.dispatch(ws, session, 'INTERACTION_CREATE', payload)
+                return
+
+# fixtures
+
+def point_at(fake: FakeDiscord) -> None:
+    """Make discord.py use ``fake`` instead of Discord."""
+    discord.http.Route.BASE = fake.base
+    webhook_async.Route.BASE = fake.base
+    DiscordWebSocket.DEFAULT_GATEWAY = yarl.URL(fake.gateway_url)
+
+async def fake_bot(fake: FakeDiscord) -> commands.AutoShardedBot:
+    """Load the cogs into the bot, point it at ``fake``,
+    and cache all of ``fake``'s guilds as if received from the gateway.
+    """
+    from ECEBot import MODULES, import_cog
+    from ECEBot.client import bot
+
+    point_at(fake)
+    bot.sync_owner = False # nothing to sync with
+    for name, (fname, _) in MODULES.items():
+        await import_cog(bot, name, fname)
+    await bot._async_setup_hook()
+    state = bot._connection
+    state.user = discord.ClientUser(
+        state=state, data=await bot.http.static_login('fake'))
+    state.application_id = BOT_ID
+    for guild in fake.guilds.values():
+        state.parsers['GUILD_CREATE'](guild.payload())
+    return bot
+
+_interaction_ids = itertools.count(1)
+
+def interaction(fake: FakeDiscord, guild_id: int, user_id: int, type: int,
+                data: Payload, **fields: Any) -> Payload:
+    """Make an interaction payload from a member of a fake guild."""
+    interaction_id = next(_interaction_ids)
+    guild = fake.guilds[guild_id]
+    member = dict(guild.members[user_id], permissions=str(
+        discord.Permissions.all().value if user_id == guild.owner_id else 0))
+    # discord.py resolves the channel from this, not from channel_id
+    channel = next(iter(guild.channels.values()), None)
+    if channel is not None:
+        fields.setdefault('channel', channel)
+    return dict({
+        'id': str(interaction_id), 'application_id': str(BOT_ID),
+        'type': type, 'token': f'token{interaction_id}', 'version': 1,
+        'guild_id': str(guild_id),
+        'channel_id': str(next(iter(guild.channels), 0)),
+        'member': member, 'locale': 'en-US', 'guild_locale': 'en-US',
+        'app_permissions': str(discord.Permissions.all().value),
+        'entitlements': [], 'attachment_size_limit': 10 * 1024 * 1024,
+        'data': data,
+    }, **fields)
+
+def command(name: str, /, *subcommands: str, **options: Any) -> Payload:
+    """Make the data of a slash command interaction.
+
+    An option whose value is a (value,) tuple is the focused option
+    of an autocomplete interaction.
+    """
+    opts: list[Payload] = []
+    for key, value in options.items():
+        if isinstance(value, tuple):
+            opts.append({'name': key, 'type': 3, 'value': value[0],
+                         'focused': True})
+        else:
+            opts.append({'name': key, 'type': 3, 'value': value})
+    for sub in reversed(subcommands):
+        opts = [{'name': sub, 'type': 1, 'options': opts}]
+    return {'id': '1', 'name': name, 'type': 1, 'options': opts}
+
+def dispatch(bot: commands.Bot, fake: FakeDiscord,
+             payload: Payload) -> asyncio.Future[Payload]:
+    """Receive an interaction as if from the gateway,
+    returning a future for its initial response.
+    """
+    fut = fake.responses[int(payload['id'])] = \
+        asyncio.get_running_loop().create_future()
+    bot._connection.parsers['INTERACTION_CREATE'](payload)
+    return fut
+
+async def invoke(bot: commands.Bot, fake: FakeDiscord, guild_id: int,
+                 name: str, /, *subcommands: str, **options: Any) -> Payload:
+    """Run a slash command as the fake guild's owner,
+    returning the command's initial response.
+    """
+    payload = interaction(fake, guild_id, fake.guilds[guild_id].owner_id,
+                          2, command(name, *subcommands, **options))
+    return await asyncio.wait_for(dispatch(bot, fake, payload), 10)
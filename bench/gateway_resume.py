@@ -0,0 +1,102 @@
+"""Benchmark the time to the first interaction after a restart,
+resuming the gateway sessions versus identifying anew.
+
+Starts the bot twice in turn, as separate processes sharing one state file,
+against a local fake Discord (see bench/fake_discord.py) with guilds on every
+shard, and stops each with SIGINT like a graceful restart would. The first
+start identifies; the second, started right after the first shut down,
+resumes the sessions the first saved. The fake gateway sends an interaction
+on each shard as soon as its session is live, and the time from the bot
+logging in to the last shard answering one is reported for each start.
+
+Run from a directory with a config.py and courses.toml, like the bot.
+Usage: python bench/gateway_resume.py [guilds]
+
+With SHARD_COUNT = 6, identifying takes over 25s, since discord.py waits
+5 seconds between identifying each shard, as Discord requires; resuming
+isn't rate limited like that, so it takes as long as loading the guilds
+over REST and replaying the missed events.
+"""
+# stdlib
+import os
+import sys
+import time
+import signal
+import asyncio
+import tempfile
+from typing import Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 1st-party
+from fake_discord import FakeDiscord, point_at # noqa: E402
+
+GUILDS = 12
+# seconds to wait for a start to answer on every shard
+TIMEOUT = 120.0
+
+async def child(port: int, filename: str) -> None:
+    """Run the bot against the fake on ``port`` until interrupted."""
+    import ECEBot
+    from ECEBot.state import state
+    point_at(FakeDiscord(port=port))
+    state.filename = filename
+    try:
+        await ECEBot.run()
+    except asyncio.CancelledError:
+        pass
+    finally:
+        await ECEBot.done()
+
+async def start(fake: FakeDiscord, filename: str,
+                shard_ids: set[int]) -> Optional[float]:
+    """Start the bot, time it until it answers on every shard, then stop it."""
+    fake.reset_calls()
+    fake.first_responses.clear()
+    fake.gateway_ops.clear()
+    proc = await asyncio.create_subprocess_exec(
+        sys.executable, os.path.abspath(__file__),
+        '--child', str(fake.port), filename,
+        stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL)
+    deadline = time.monotonic() + TIMEOUT
+    while set(fake.first_responses) < shard_ids \
+            and time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+    elapsed = None
+    if set(fake.first_responses) >= shard_ids:
+        elapsed = max(fake.first_responses.values()) - fake.calls[0].at
+    proc.send_signal(signal.SIGINT)
+    await proc.wait()
+    return elapsed
+
+async def main(guilds: int = GUILDS) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        filename = os.path.join(tmp, 'state.sqlite3')
+        async with FakeDiscord() as fake:
+            fake.interact = True
+            from config import SHARD_COUNT
+            shard_count = SHARD_COUNT or 1
+            # spread the guilds across the shards
+            base = fake.snowflake() >> 22
+            for i in range(guilds):
+                guild = fake.add_guild((base + i) << 22)
+                guild.add_channel(fake.snowflake(), 'general')
+            shard_ids = {(base + i) % shard_count for i in range(guilds)}
+            for name in ('identify', 'resume'):
+                elapsed = await start(fake, filename, shard_ids)
+                ops = ', '.join(f'{count} {op}' for op, count
+                                in sorted(fake.gateway_ops.items())
+                                if op != 'HEARTBEAT')
+                if elapsed is None:
+                    print(f'{name}: no answer on every shard within '
+                          f'{TIMEOUT:.0f}s ({ops})')
+                else:
+                    print(f'{name}: answered on {len(shard_ids)} shard(s) '
+                          f'{elapsed:.2f}s after logging in ({ops}, '
+                          f'{len(fake.calls)} REST calls)')
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--child']:
+        asyncio.run(child(int(sys.argv[2]), sys.argv[3]))
+    else:
+        asyncio.run(main(*map(int, sys.argv[1:])))
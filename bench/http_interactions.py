@@ -0,0 +1,138 @@
+"""Benchmark serving interactions over HTTP.
+
+Starts the interactions endpoint in-process with the real cogs loaded and a
+fake guild cached, then posts signed fake interaction payloads to it
+(autocomplete keystrokes for /course_role and /hello invocations),
+reporting throughput and latency percentiles.
+
+Requires PyNaCl. Usage: python bench/http_interactions.py [count] [concurrency]
+"""
+# stdlib
+import os
+import sys
+import json
+import time
+import asyncio
+import random
+from typing import Any
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 3rd-party
+import aiohttp
+import discord
+from nacl.signing import SigningKey
+
+# 1st-party
+from ECEBot import MODULES, import_cog # noqa: E402
+from ECEBot.client import bot # noqa: E402
+from ECEBot.controller.course_creation import get_catalog # noqa: E402
+from ECEBot.webhook import InteractionServer # noqa: E402
+
+BOT_ID = 1
+GUILD_ID = 2
+CHANNEL_ID = 3
+USER_ID = 4
+PORT = 8765
+
+def user(i: int) -> dict[str, Any]:
+    return {'id': str(i), 'username': f'user{i}', 'discriminator': '0',
+            'avatar': None, 'global_name': None}
+
+def member(i: int) -> dict[str, Any]:
+    return {'user': user(i), 'roles': [], 'joined_at':
+            '2022-09-01T00:00:00+00:00', 'deaf': False, 'mute': False,
+            'flags': 0, 'permissions': '0'}
+
+def guild() -> dict[str, Any]:
+    return {
+        'id': str(GUILD_ID), 'name': 'Engineering', 'owner_id': '9',
+        'member_count': 2, 'features': [], 'emojis': [], 'stickers': [],
+        'roles': [{'id': str(GUILD_ID), 'name': '@everyone',
+                   'permissions': '0', 'position': 0, 'color': 0,
+                   'hoist': False, 'managed': False, 'mentionable': False}],
+        'channels': [{'id': str(CHANNEL_ID), 'type': 0, 'name': 'roles',
+                      'position': 0, 'permission_overwrites': []}],
+        'members': [member(BOT_ID)],
+    }
+
+def interaction(i: int, type: int, data: dict[str, Any]) -> dict[str, Any]:
+    return {
+        'id': str(10**6 + i), 'application_id': str(BOT_ID), 'type': type,
+        'token': f'token{i}', 'version': 1, 'guild_id': str(GUILD_ID),
+        'channel_id': str(CHANNEL_ID), 'member': member(USER_ID),
+        'data': data, 'locale': 'en-US', 'guild_locale': 'en-US',
+        'app_permissions': '0', 'entitlements': [],
+        'attachment_size_limit': 10 * 1024 * 1024,
+    }
+
+def payloads(courses: list[str], count: int) -> list[dict[str, Any]]:
+    result = []
+    for i in range(count):
+        if i % 5:
+            course = random.choice(courses)
+            typed = course[:random.randint(0, len(course))]
+            result.append(interaction(i, 4, {
+                'id': '100', 'name': 'course_role', 'type': 1,
+                'options': [{'name': 'course', 'type': 3,
+                             'value': typed, 'focused': True}]}))
+        else:
+            result.append(interaction(i, 2, {
+                'id': '101', 'name': 'hello', 'type': 1}))
+    return result
+
+def signed(key: SigningKey, body: bytes) -> dict[str, str]:
+    timestamp = str(int(time.time()))
+    return {
+        'Content-Type': 'application/json',
+        'X-Signature-Timestamp': timestamp,
+        'X-Signature-Ed25519': key.sign(timestamp.encode() + body).signature.hex(),
+    }
+
+async def main(count: int, concurrency: int) -> None:
+    for name, (fname, _) in MODULES.items():
+        await import_cog(bot, name, fname)
+    await bot._async_setup_hook()
+    state = bot._connection
+    state.user = discord.ClientUser(state=state, data=user(BOT_ID))
+    state.parsers['GUILD_CREATE'](guild())
+
+    courses = sorted((await get_catalog(GUILD_ID)).course_amcs)
+    key = SigningKey.generate()
+    server = InteractionServer(bot, key.verify_key.encode().hex())
+    runner = await server.start('127.0.0.1', PORT)
+    url = f'http://127.0.0.1:{PORT}/interactions'
+    bodies = [json.dumps(payload).encode() for payload in payloads(courses, count)]
+    latencies: list[float] = []
+    sem = asyncio.Semaphore(concurrency)
+
+    async with aiohttp.ClientSession() as session:
+        async with session.post(url, data=b'{"type": 1}', headers={
+            'X-Signature-Timestamp': '0', 'X-Signature-Ed25519': '00' * 64,
+        }) as resp:
+            assert resp.status == 401, 'bad signature was accepted'
+
+        async def post(body: bytes) -> None:
+            async with sem:
+                start = time.perf_counter()
+                async with session.post(url, data=body,
+                                        headers=signed(key, body)) as resp:
+                    assert resp.status == 200, await resp.text()
+                    await resp.json()
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(post(body) for body in bodies))
+        elapsed = time.perf_counter() - start
+
+    await runner.cleanup()
+    latencies.sort()
+    def pct(p: float) -> float:
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+    print(f'{count} interactions, concurrency {concurrency}: '
+          f'{count / elapsed:.0f}/s, latency p50 {pct(0.5):.2f}ms '
+          f'p90 {pct(0.9):.2f}ms p99 {pct(0.99):.2f}ms')
+
+if __name__ == '__main__':
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000,
+                     int(sys.argv[2]) if len(sys.argv) > 2 else 32))
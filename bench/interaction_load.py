@@ -0,0 +1,294 @@
+"""Load test the bot's interaction handling.
+
+Drives interactions through the real cogs and command tree, against a local
+fake Discord (see bench/fake_discord.py) standing in for the REST API, and
+reports throughput, latency percentiles of the initial responses (which
+Discord needs within 3 seconds) and event loop lag.
+
+Traffic is either synthesized or replayed. Synthesized traffic is a mix of
+flows, each by a random member:
+    course_role  typing a course into /course_role, one autocomplete per
+                 keystroke, then running it to toggle the role
+    selector     choosing an area in the course selector message,
+                 then a course in the dropdowns that brings up
+    hello        running /hello
+Replayed traffic follows the timing, members and commands of the
+interaction_check lines ("... running /<command>") in log files. Only
+/course_role and /hello are replayed, since other commands are admin
+commands that change the guild; /course_role is replayed with a random
+course, typed out as above. Component interactions aren't logged, so the
+course selector isn't replayed.
+
+Run from a directory with a config.py and courses.toml, like the bot.
+Usage:
+    python bench/interaction_load.py [--flows N] [--concurrency N]
+    python bench/interaction_load.py --replay logs/*.log [--speed X]
+Add --unlimited to lift the fake's rate limits and measure the bot alone.
+"""
+# stdlib
+import os
+import re
+import sys
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+from datetime import datetime
+from collections import Counter, defaultdict
+from typing import Any, Awaitable, Callable, Iterator, NamedTuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 3rd-party
+from discord.ext import commands # noqa: E402
+
+# 1st-party
+from fake_discord import FakeDiscord, Payload, command, dispatch, \
+    fake_bot, interaction # noqa: E402
+from ECEBot.controller.course_creation import get_catalog # noqa: E402
+from ECEBot.controller.role_assignment import CategoryView # noqa: E402
+from ECEBot.state import state # noqa: E402
+
+# Discord's deadline for the initial response
+DEADLINE = 3.0
+LAG_INTERVAL = 0.01
+MEMBERS = 500
+# seconds a member takes to use the dropdowns they're shown; also
+# gives the bot time to start listening to them after sending them
+THINK_TIME = 0.05
+FLOW_WEIGHTS = {'course_role': 45, 'selector': 45, 'hello': 10}
+REPLAYED = ('course_role', 'hello')
+# an interaction_check line, as formatted by ECEBot.logs
+LOG_LINE = re.compile(
+    r'^INFO\t(?P<time>\d{4}-\d\d-\d\d \d\d:\d\d:\d\d,\d{3}) ECEBot\.client\s+'
+    r'User .*\t\(\s*(?P<user>\d+)\) in channel .*\t\(.*\) '
+    r'running /(?P<command>.+)$')
+
+class Replayed(NamedTuple):
+    at: float
+    user_id: int
+    command: str
+
+def parse_logs(filenames: list[str]) -> Iterator[Replayed]:
+    """Parse the interaction_check lines in log files, in order."""
+    for filename in sorted(filenames):
+        with open(filename, encoding='utf8') as f:
+            for line in f:
+                match = LOG_LINE.match(line.rstrip('\n'))
+                if match is None:
+                    continue
+                at = datetime.strptime(match['time'], '%Y-%m-%d %H:%M:%S,%f')
+                yield Replayed(at.timestamp(), int(match['user']),
+                               match['command'])
+
+class Load:
+    """Generate interactions from a fake guild's members and time them."""
+
+    def __init__(self, bot: commands.Bot, fake: FakeDiscord,
+                 guild_id: int, selector: Payload,
+                 courses: list[str], areas: list[int]) -> None:
+        self.bot = bot
+        self.fake = fake
+        self.guild_id = guild_id
+        self.selector = selector
+        self.courses = courses
+        self.areas = areas
+        # kind of interaction -> seconds until the initial response
+        self.latencies: defaultdict[str, list[float]] = defaultdict(list)
+        self.missed: defaultdict[str, int] = defaultdict(int)
+        self.lag: list[float] = []
+
+    async def respond(self, kind: str, user_id: int, type: int,
+                      data: Payload, **fields: Any) -> Payload:
+        """Send an interaction and wait for its initial response."""
+        payload = interaction(self.fake, self.guild_id, user_id,
+                              type, data, **fields)
+        start = time.perf_counter()
+        try:
+            response = await asyncio.wait_for(
+                dispatch(self.bot, self.fake, payload), DEADLINE)
+        except asyncio.TimeoutError:
+            self.missed[kind] += 1
+            self.fake.responses.pop(int(payload['id']), None)
+            raise
+        self.latencies[kind].append(time.perf_counter() - start)
+        return response
+
+    async def course_role(self, user_id: int) -> None:
+        course = random.choice(self.courses)
+        # not every keystroke makes it before the next
+        for end in range(1, len(course) + 1, random.randint(1, 3)):
+            await self.respond('autocomplete', user_id, 4, command(
+                'course_role', course=(course[:end],)))
+        await self.respond('course_role', user_id, 2, command(
+            'course_role', course=course))
+
+    async def selector_flow(self, user_id: int) -> None:
+        area = str(random.choice(self.areas))
+        payload = interaction(self.fake, self.guild_id, user_id, 3, {
+            'custom_id': 'ECEBot:area', 'component_type': 3,
+            'values': [area]}, message=self.selector)
+        followup = self.fake.expect_followup(payload['token'])
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(
+                dispatch(self.bot, self.fake, payload), DEADLINE)
+        except asyncio.TimeoutError:
+            self.missed['area_select'] += 1
+            raise
+        self.latencies['area_select'].append(time.perf_counter() - start)
+        message = await asyncio.wait_for(followup, DEADLINE)
+        await asyncio.sleep(THINK_TIME)
+        selects = [component for row in message['components']
+                   for component in row['components']
+                   if component['type'] == 3 and any(
+                       option['value'] in self.courses
+                       for option in component['options'])]
+        select = random.choice(selects)
+        await self.respond('course_select', user_id, 3, {
+            'custom_id': select['custom_id'], 'component_type': 3,
+            'values': [random.choice(select['options'])['value']]},
+            message=message)
+
+    async def hello(self, user_id: int) -> None:
+        await self.respond('hello', user_id, 2, command('hello'))
+
+    def flow(self, name: str) -> Callable[[int], Awaitable[None]]:
+        return {'course_role': self.course_role,
+                'selector': self.selector_flow, 'hello': self.hello}[name]
+
+    async def run_flow(self, name: str, user_id: int) -> None:
+        try:
+            await self.flow(name)(user_id)
+        except asyncio.TimeoutError:
+            pass # counted as missed
+
+    async def measure_lag(self) -> None:
+        loop = asyncio.get_running_loop()
+        while 1:
+            start = loop.time()
+            await asyncio.sleep(LAG_INTERVAL)
+            self.lag.append(loop.time() - start - LAG_INTERVAL)
+
+    async def synthesize(self, flows: int, concurrency: int) -> int:
+        names = random.choices(list(FLOW_WEIGHTS),
+                               weights=list(FLOW_WEIGHTS.values()), k=flows)
+        members = list(self.fake.guilds[self.guild_id].members)
+        sem = asyncio.Semaphore(concurrency)
+
+        async def run(name: str) -> None:
+            async with sem:
+                await self.run_flow(name, random.choice(members))
+
+        await asyncio.gather(*map(run, names))
+        return flows
+
+    async def replay(self, lines: list[Replayed], speed: float) -> int:
+        lines = [line for line in lines if line.command in REPLAYED]
+        if not lines:
+            return 0
+        guild = self.fake.guilds[self.guild_id]
+        for line in lines:
+            if line.user_id not in guild.members:
+                guild.add_member(line.user_id)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        tasks: list[asyncio.Task[None]] = []
+        for line in lines:
+            delay = (line.at - lines[0].at) / speed - (loop.time() - start)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(
+                self.run_flow(line.command, line.user_id)))
+        await asyncio.gather(*tasks)
+        return len(lines)
+
+async def quiesce(fake: FakeDiscord, idle: float = 0.5) -> None:
+    """Wait for the bot to finish what the last interactions started."""
+    calls = -1
+    while calls != len(fake.calls):
+        calls = len(fake.calls)
+        await asyncio.sleep(idle)
+
+def pct(values: list[float], p: float) -> float:
+    return values[min(len(values) - 1, int(len(values) * p))] * 1000
+
+def report(load: Load, flows: int, elapsed: float) -> None:
+    total = sum(map(len, load.latencies.values()))
+    print(f'{flows} flows, {total} interactions in {elapsed:.2f}s: '
+          f'{total / elapsed:.0f} interactions/s')
+    for kind, latencies in sorted(load.latencies.items()):
+        latencies.sort()
+        print(f'  {kind:<14} {len(latencies):>6}  p50 {pct(latencies, 0.5):7.2f}'
+              f'ms  p90 {pct(latencies, 0.9):7.2f}ms  p99 '
+              f'{pct(latencies, 0.99):7.2f}ms  max {latencies[-1] * 1000:7.2f}ms'
+              f'  missed {load.missed[kind]}')
+    for kind in sorted(set(load.missed) - set(load.latencies)):
+        print(f'  {kind:<14} {0:>6}  missed {load.missed[kind]}')
+    lag = sorted(load.lag) or [0.0]
+    print(f'  event loop lag  p50 {pct(lag, 0.5):.2f}ms  p99 {pct(lag, 0.99):.2f}'
+          f'ms  max {lag[-1] * 1000:.2f}ms')
+
+async def main(args: argparse.Namespace) -> None:
+    limits: dict[str, Any] = {}
+    if args.unlimited:
+        limits = {'route_limits': {}, 'default_limit': (10**9, 1.0),
+                  'global_limit': (10**9, 1.0)}
+    with tempfile.TemporaryDirectory() as tmp:
+        state.filename = os.path.join(tmp, 'state.sqlite3')
+        async with FakeDiscord(**limits) as fake:
+            guild = fake.add_guild()
+            for user_id in range(1000, 1000 + MEMBERS):
+                guild.add_member(user_id)
+            catalog = await get_catalog(guild.id)
+            # a guild that has been set up, but not its course channels
+            for name in [f'Area {area}' for area in catalog.areas] \
+                    + sorted(catalog.course_amcs):
+                guild.add_role(fake.snowflake(), name)
+            channel = guild.add_channel(fake.snowflake(), 'roles')
+            selector = fake.message(int(channel['id']), {
+                'components': CategoryView(catalog).to_components()})
+            bot = await fake_bot(fake)
+            bot.add_view(CategoryView(), message_id=int(selector['id']))
+            load = Load(bot, fake, guild.id, selector,
+                        sorted(catalog.course_amcs), list(catalog.areas))
+            lag = asyncio.create_task(load.measure_lag())
+            start = time.perf_counter()
+            try:
+                if args.replay:
+                    flows = await load.replay(
+                        list(parse_logs(args.replay)), args.speed)
+                else:
+                    flows = await load.synthesize(args.flows, args.concurrency)
+                elapsed = time.perf_counter() - start
+                await quiesce(fake)
+            finally:
+                lag.cancel()
+                await bot.http.close()
+                await state.close()
+    report(load, flows, elapsed)
+    limited = Counter(f'{call.method} {call.route}' for call in fake.calls
+                      if call.status == 429)
+    rejected = Counter(f'{call.method} {call.route}' for call in fake.calls
+                       if call.status == 400)
+    print(f'  {len(fake.calls)} REST calls, {sum(limited.values())} 429s, '
+          f'{sum(rejected.values())} 400s')
+    for route, count in (limited + rejected).most_common():
+        print(f'    {count:>6}  {route}')
+
+parser = argparse.ArgumentParser(description=(
+    'Load test the bot with synthesized or replayed interactions.'))
+parser.add_argument('--flows', type=int, default=1000, help=(
+    'Synthesize this many flows.'))
+parser.add_argument('--concurrency', type=int, default=50, help=(
+    'Run this many synthesized flows at once.'))
+parser.add_argument('--replay', nargs='+', metavar='LOG', help=(
+    'Replay the commands logged in these files instead.'))
+parser.add_argument('--speed', type=float, default=1.0, help=(
+    'Replay this many times faster than logged.'))
+parser.add_argument('--unlimited', action='store_true', help=(
+    "Lift the fake Discord's rate limits."))
+
+if __name__ == '__main__':
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,212 @@
+"""Benchmark memory and CPU use of default versus lean mode.
+
+Replays synthetic gateway traffic for one large guild into the bot's
+connection state, in a fresh process per mode, and reports RSS growth and
+CPU time per event. Events the mode's intents don't subscribe to are
+dropped, as the gateway would.
+
+Two kinds of traffic are replayed. Messages, typing and reactions are most
+of a busy server's traffic, and lean mode doesn't subscribe to them at all,
+so it receives none. Thread, channel and role updates come with the guilds
+intent, so both modes receive them; lean mode skips parsing the thread
+events, which none of the cogs use, and the CPU per event of both modes is
+compared on these.
+
+Usage: python bench/lean_memory.py [events]
+"""
+# stdlib
+import os
+import sys
+import time
+import asyncio
+import resource
+import subprocess
+from typing import Any, Iterator
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ROLES = 400
+CHANNELS = 450
+MEMBERS = 20000
+BOT_ID = 1
+GUILD_ID = 2
+
+# threads open at once in the guild traffic
+THREADS = 100
+
+# which intent each replayed event needs
+EVENT_INTENTS = {
+    'MESSAGE_CREATE': 'guild_messages',
+    'TYPING_START': 'guild_typing',
+    'MESSAGE_REACTION_ADD': 'guild_reactions',
+    'THREAD_CREATE': 'guilds',
+    'THREAD_UPDATE': 'guilds',
+    'THREAD_DELETE': 'guilds',
+    'CHANNEL_UPDATE': 'guilds',
+    'GUILD_ROLE_UPDATE': 'guilds',
+}
+
+def rss_kb() -> int:
+    """Current resident set size in KiB."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') // 1024
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def user(i: int) -> dict[str, Any]:
+    return {'id': str(i), 'username': f'user{i}', 'discriminator': '0',
+            'avatar': None, 'global_name': None}
+
+def member(i: int) -> dict[str, Any]:
+    return {'user': user(i), 'roles': [str(1000 + i % ROLES)],
+            'joined_at': '2022-09-01T00:00:00+00:00', 'deaf': False,
+            'mute': False, 'flags': 0}
+
+def guild_create(members: bool) -> dict[str, Any]:
+    return {
+        'id': str(GUILD_ID), 'name': 'Engineering', 'owner_id': '3',
+        'member_count': MEMBERS + 1, 'features': [], 'emojis': [],
+        'stickers': [], 'large': True,
+        'roles': [{'id': str(GUILD_ID), 'name': '@everyone',
+                   'permissions': '0', 'position': 0, 'color': 0,
+                   'hoist': False, 'managed': False, 'mentionable': False}]
+                 + [{'id': str(1000 + i), 'name': f'ECE{i:03}H1',
+                     'permissions': '0', 'position': i + 1, 'color': 0,
+                     'hoist': False, 'managed': False, 'mentionable': False}
+                    for i in range(ROLES)],
+        'channels': [{'id': str(5000 + i), 'type': 0, 'name': f'ece{i:03}h1',
+                      'position': i, 'permission_overwrites': []}
+                     for i in range(CHANNELS)],
+        # the gateway only sends other members with the members intent
+        'members': [member(BOT_ID)]
+                   + ([member(10000 + i) for i in range(MEMBERS)]
+                      if members else []),
+    }
+
+def traffic(count: int) -> Iterator[tuple[str, dict[str, Any]]]:
+    """Typical traffic in a busy course server."""
+    for i in range(count):
+        author = 10000 + i % MEMBERS
+        channel_id = str(5000 + i % CHANNELS)
+        kind = i % 10
+        if kind < 6:
+            yield 'MESSAGE_CREATE', {
+                'id': str(10**8 + i), 'channel_id': channel_id,
+                'guild_id': str(GUILD_ID), 'author': user(author),
+                'member': member(author), 'content': 'x' * 80,
+                'timestamp': '2022-09-01T00:00:00+00:00',
+                'edited_timestamp': None, 'tts': False,
+                'mention_everyone': False, 'mentions': [],
+                'mention_roles': [], 'attachments': [], 'embeds': [],
+                'pinned': False, 'type': 0,
+            }
+        elif kind < 9:
+            yield 'TYPING_START', {
+                'channel_id': channel_id, 'guild_id': str(GUILD_ID),
+                'user_id': str(author), 'timestamp': 1662000000,
+                'member': member(author),
+            }
+        else:
+            yield 'MESSAGE_REACTION_ADD', {
+                'user_id': str(author), 'channel_id': channel_id,
+                'message_id': str(10**8 + i - 1), 'guild_id': str(GUILD_ID),
+                'emoji': {'id': None, 'name': '\N{THUMBS UP SIGN}'},
+                'member': member(author), 'type': 0, 'burst': False,
+            }
+
+def thread(i: int) -> dict[str, Any]:
+    return {
+        'id': str(20000 + i % THREADS), 'guild_id': str(GUILD_ID),
+        'parent_id': str(5000 + i % CHANNELS), 'owner_id': str(10000 + i),
+        'name': f'question {i}', 'type': 11, 'last_message_id': None,
+        'rate_limit_per_user': 0, 'message_count': 0, 'member_count': 1,
+        'flags': 0, 'thread_metadata': {
+            'archived': False, 'auto_archive_duration': 1440,
+            'archive_timestamp': '2022-09-01T00:00:00+00:00',
+            'locked': False},
+    }
+
+def guild_traffic(count: int) -> Iterator[tuple[str, dict[str, Any]]]:
+    """Threads being opened, renamed and closed,
+    and channels and roles being edited.
+    """
+    for i in range(count):
+        kind = i % 5
+        if kind == 0:
+            yield 'THREAD_CREATE', dict(thread(i // 5), newly_created=True)
+        elif kind == 1:
+            yield 'THREAD_UPDATE', dict(thread(i // 5), name=f'answered {i}')
+        elif kind == 2:
+            yield 'CHANNEL_UPDATE', {
+                'id': str(5000 + i % CHANNELS), 'type': 0,
+                'guild_id': str(GUILD_ID), 'name': f'ece{i % CHANNELS:03}h1',
+                'position': i % CHANNELS, 'permission_overwrites': [],
+                'topic': f'Topic {i}'}
+        elif kind == 3:
+            yield 'GUILD_ROLE_UPDATE', {
+                'guild_id': str(GUILD_ID), 'role': {
+                    'id': str(1000 + i % ROLES), 'name': f'ECE{i % ROLES:03}H1',
+                    'permissions': '0', 'position': i % ROLES + 1,
+                    'color': i, 'hoist': False, 'managed': False,
+                    'mentionable': False}}
+        else:
+            yield 'THREAD_DELETE', {
+                'id': str(20000 + i // 5 % THREADS), 'guild_id': str(GUILD_ID),
+                'parent_id': str(5000 + i // 5 % CHANNELS), 'type': 11}
+
+def deliver(parsers: dict[str, Any],
+            events: list[tuple[str, dict[str, Any]]]) -> float:
+    """Parse events as the gateway would, returning the CPU time taken."""
+    cpu = time.process_time()
+    for event, data in events:
+        # the gateway ignores events without a parser
+        func = parsers.get(event)
+        if func is not None:
+            func(data)
+    return time.process_time() - cpu
+
+async def replay(lean: bool, count: int) -> None:
+    import discord
+    from ECEBot.client import ECEBot
+
+    bot = ECEBot(lean=lean)
+    await bot._async_setup_hook()
+    state = bot._connection
+    state.user = discord.ClientUser(state=state, data=user(BOT_ID))
+    intents = state._intents
+    guild = guild_create(intents.members)
+    events = [(event, data) for event, data in traffic(count)
+              if getattr(intents, EVENT_INTENTS[event])]
+    base = rss_kb()
+
+    state.parsers['GUILD_CREATE'](guild)
+    guild_kb = rss_kb() - base
+
+    deliver(state.parsers, events)
+    await asyncio.sleep(0) # let dispatched events run
+    total_kb = rss_kb() - base
+
+    mode = 'lean' if lean else 'default'
+    print(f'{mode:8} guild {guild_kb:7} KiB, '
+          f'after {count} message events {total_kb:7} KiB, '
+          f'{len(events):6} delivered')
+
+    events = [(event, data) for event, data in guild_traffic(count)
+              if getattr(intents, EVENT_INTENTS[event])]
+    cpu = deliver(state.parsers, events)
+    await asyncio.sleep(0)
+    print(f'{mode:8} {len(events):6} thread/channel/role events delivered, '
+          f'{cpu / len(events) * 1e6:7.2f}us CPU/event')
+
+def main() -> None:
+    if len(sys.argv) > 2 and sys.argv[1] == '--child':
+        asyncio.run(replay(sys.argv[2] == 'lean', int(sys.argv[3])))
+        return
+    count = sys.argv[1] if len(sys.argv) > 1 else '50000'
+    for mode in ('default', 'lean'):
+        subprocess.run([sys.executable, __file__, '--child', mode, count],
+                       check=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""Benchmark the REST API calls made to set up a guild.
+
+Runs /setup roles and then /setup channels for every course in courses.toml
+against a fresh guild on a local fake Discord (see bench/fake_discord.py),
+with the real cogs loaded, reporting the calls made to each route, the
+429s received, and the wall time each command's job took.
+
+Run from a directory with a config.py and courses.toml, like the bot.
+Usage: python bench/setup_api_calls.py [route limit per second]
+
+Baseline, with the default limits and the courses.toml shipped at the time
+of writing (8 areas, 90 area courses), one job at a time:
+    /setup roles      98 role creates,            0 429s,  9.2s
+    /setup channels  188 category/channel creates, 0 429s, 18.2s
+discord.py waits out buckets from the rate limit headers, so the time is
+dominated by the 10/s limit on creating roles and channels.
+"""
+# stdlib
+import os
+import sys
+import time
+import asyncio
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 1st-party
+from fake_discord import FakeDiscord, ROUTE_LIMITS, fake_bot, invoke # noqa: E402
+from ECEBot.jobs import queue # noqa: E402
+from ECEBot.state import state # noqa: E402
+
+async def run_job(bot, fake: FakeDiscord, guild_id: int,
+                  *command: str) -> None:
+    fake.reset_calls()
+    start = time.perf_counter()
+    response = await invoke(bot, fake, guild_id, *command)
+    print(response['data'].get('content')
+          or response['data']['embeds'][0]['description'])
+    while queue.running or any(queue.queued.values()):
+        await asyncio.sleep(0.05)
+    elapsed = time.perf_counter() - start
+    counts = fake.counts()
+    limited = sum(call.status == 429 for call in fake.calls)
+    print(f'/{" ".join(command)}: {len(fake.calls)} calls, '
+          f'{limited} 429s, {elapsed:.1f}s')
+    for route, count in counts.most_common():
+        print(f'  {count:>6}  {route}')
+
+async def main(limit: int = 0) -> None:
+    route_limits = ROUTE_LIMITS if not limit else {
+        route: (limit, per) for route, (_, per) in ROUTE_LIMITS.items()}
+    with tempfile.TemporaryDirectory() as tmp:
+        state.filename = os.path.join(tmp, 'state.sqlite3')
+        async with FakeDiscord(route_limits=route_limits) as fake:
+            guild = fake.add_guild()
+            bot = await fake_bot(fake)
+            try:
+                await run_job(bot, fake, guild.id, 'setup', 'roles')
+                await run_job(bot, fake, guild.id, 'setup', 'channels')
+            finally:
+                await bot.http.close()
+                await state.close()
+
+if __name__ == '__main__':
+    asyncio.run(main(*map(int, sys.argv[1:])))
@@ -0,0 +1,130 @@
+"""Benchmark putting roles and channels in order when setting up a guild.
+
+Prepares a guild on a local fake Discord (see bench/fake_discord.py) as if
+set up by hand: the course roles of courses.toml, shuffled, and the
+channels of one category's courses, shuffled, but no area roles. Then runs
+/setup roles and /setup channels with the real cogs loaded, reporting the
+calls made to each route and the wall time each command's job took, and
+checks that the roles and every category's channels ended up in order:
+area roles, then course roles by code; channels by course code.
+
+Run from a directory with a config.py and courses.toml, like the bot.
+Usage: python bench/setup_order.py [random seed]
+
+With the courses.toml shipped at the time of writing and seed 0, 78 of
+the 90 course roles and 9 of the 16 channels start out of place. Setup puts
+them in order with one PATCH /guilds/{guild_id}/roles for all 98 roles,
+after one GET of their current positions, and one
+PATCH /guilds/{guild_id}/channels for the shuffled category, where moving
+them one at a time, as admins would by dragging, takes a request for each
+one out of place. A fresh setup creates roles and channels in order, so
+it makes no PATCH at all.
+"""
+# stdlib
+import os
+import sys
+import time
+import random
+import asyncio
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 1st-party
+from fake_discord import FakeDiscord, fake_bot, invoke # noqa: E402
+from ECEBot.controller.course_creation import COURSE_CHANNEL_SUFFIXES, \
+    Catalog, get_catalog, role_order # noqa: E402
+from ECEBot.jobs import queue # noqa: E402
+from ECEBot.state import state # noqa: E402
+
+def out_of_place(names: list[str], wanted: list[str]) -> int:
+    """How many items moving one at a time would take to put in order:
+    all but the longest run already in order.
+    """
+    index = {name: i for i, name in enumerate(wanted)}
+    # longest increasing subsequence, by patience sorting
+    piles: list[int] = []
+    for name in names:
+        i = index[name]
+        lo, hi = 0, len(piles)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if piles[mid] < i:
+                lo = mid + 1
+            else:
+                hi = mid
+        piles[lo:lo + 1] = [i]
+    return len(names) - len(piles)
+
+async def run_job(bot, fake: FakeDiscord, guild_id: int,
+                  *command: str) -> None:
+    fake.reset_calls()
+    start = time.perf_counter()
+    await invoke(bot, fake, guild_id, *command)
+    while queue.running or any(queue.queued.values()):
+        await asyncio.sleep(0.05)
+    elapsed = time.perf_counter() - start
+    print(f'/{" ".join(command)}: {len(fake.calls)} calls, {elapsed:.1f}s')
+    for route, count in fake.counts().most_common():
+        print(f'  {count:>6}  {route}')
+
+def check(fake: FakeDiscord, guild_id: int, catalog: Catalog) -> None:
+    guild = fake.guilds[guild_id]
+    wanted = role_order(catalog)
+    roles = [role['name'] for role in sorted(
+        guild.roles.values(), key=lambda role: role['position'],
+        reverse=True) if role['name'] in wanted]
+    print('roles in order:', roles == [name for name in wanted
+                                       if name in roles])
+    unsorted = 0
+    for category in guild.channels.values():
+        if category['type'] != 4:
+            continue
+        names = [channel['name'] for channel in sorted(
+            guild.channels.values(), key=lambda channel: channel['position'])
+            if channel['parent_id'] == category['id']]
+        unsorted += names != sorted(names)
+    print(f'categories out of order: {unsorted}')
+
+async def main(seed: int = 0) -> None:
+    rng = random.Random(seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        state.filename = os.path.join(tmp, 'state.sqlite3')
+        async with FakeDiscord() as fake:
+            guild = fake.add_guild()
+            catalog = await get_catalog(guild.id)
+            courses = sorted(catalog.area_courses())
+            rng.shuffle(courses)
+            for course in courses:
+                guild.add_role(fake.snowflake(), course)
+            wanted = role_order(catalog)
+            print(f'{out_of_place(list(reversed(courses)), wanted)} of '
+                  f'{len(courses)} course roles out of place')
+            # one category's channels, made by hand in no particular order
+            area = next(area for area in catalog.courses
+                        if isinstance(area, int))
+            first = sorted(catalog.course_slots[area])[0]
+            category_id = fake.snowflake()
+            guild.add_channel(category_id, catalog.category_name(area, first),
+                              type=4)
+            names = [course.lower() + suffix
+                     for course, slot in catalog.course_slots[area].items()
+                     if slot == 0 and catalog.course_amcs[course] == area
+                     for suffix in COURSE_CHANNEL_SUFFIXES]
+            rng.shuffle(names)
+            for name in names:
+                guild.add_channel(fake.snowflake(), name,
+                                  parent_id=category_id)
+            print(f'{out_of_place(names, sorted(names))} of {len(names)} '
+                  'channels out of place')
+            bot = await fake_bot(fake)
+            try:
+                await run_job(bot, fake, guild.id, 'setup', 'roles')
+                await run_job(bot, fake, guild.id, 'setup', 'channels')
+                check(fake, guild.id, catalog)
+            finally:
+                await bot.http.close()
+                await state.close()
+
+if __name__ == '__main__':
+    asyncio.run(main(*map(int, sys.argv[1:])))
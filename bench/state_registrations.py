@@ -0,0 +1,84 @@
+"""Benchmark concurrent selector message registrations.
+
+Compares the old whole-file JSON read-modify-write against the SQLite
+state store, reporting wall time, the longest the event loop was blocked
+for, and how many registrations survived.
+
+Usage: python bench/state_registrations.py [count]
+"""
+# stdlib
+import os
+import sys
+import json
+import time
+import asyncio
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ECEBot.state import StateStore # noqa: E402
+
+async def max_lag(stop: asyncio.Event) -> float:
+    """Measure the longest stall of the event loop until stopped."""
+    worst = 0.0
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0)
+        worst = max(worst, time.perf_counter() - start)
+    return worst
+
+def read_json(filename: str) -> dict[str, int]:
+    try:
+        with open(filename, 'r', encoding='utf8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+def write_json(filename: str, data: dict[str, int]) -> None:
+    with open(filename, 'w', encoding='utf8') as f:
+        json.dump(data, f)
+
+async def register_json(filename: str, channel_id: int,
+                        message_id: int) -> None:
+    # what MessageModal.on_submit used to do, with the file I/O moved off
+    # the event loop, so that other registrations run between the read
+    # and the write, as they would in other worker processes
+    data = await asyncio.to_thread(read_json, filename)
+    data[str(channel_id)] = message_id
+    await asyncio.to_thread(write_json, filename, data)
+
+async def bench(name: str, count: int, register, count_rows) -> None:
+    stop = asyncio.Event()
+    lag = asyncio.create_task(max_lag(stop))
+    start = time.perf_counter()
+    await asyncio.gather(*(register(i, i * 10) for i in range(count)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    rows = await count_rows()
+    print(f'{name:8} {count} registrations in {elapsed * 1000:8.1f}ms '
+          f'({count / elapsed:8.0f}/s), max loop stall '
+          f'{await lag * 1000:6.2f}ms, {rows} stored')
+
+async def main(count: int) -> None:
+    # separate directories, so that the store doesn't migrate the JSON file
+    with tempfile.TemporaryDirectory() as tmp:
+        filename = os.path.join(tmp, 'messages.json')
+
+        async def json_rows() -> int:
+            return len(read_json(filename))
+
+        await bench('json', count,
+                    lambda c, m: register_json(filename, c, m), json_rows)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = StateStore(os.path.join(tmp, 'state.sqlite3'))
+
+        async def sqlite_rows() -> int:
+            return len(await store.selector_messages())
+
+        await bench('sqlite', count,
+                    lambda c, m: store.register_selector(1, c, m), sqlite_rows)
+        await store.close()
+
+if __name__ == '__main__':
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000))
@@ -0,0 +1,118 @@
+"""Benchmark how /teardown roles copes with a catastrophically backtracking
+regex, as against searching with it on the event loop.
+
+Makes a guild on a local fake Discord (see bench/fake_discord.py) with the
+course roles of courses.toml and one role, xxx...x!, whose name makes the
+pattern ^(x+)*$ backtrack for seconds, then times searching the role names
+with that pattern on the event loop, and running /teardown roles with it
+and with ordinary patterns, with the real cogs loaded. A ticker measures the
+longest the event loop went without running it, which is how long every
+other interaction in every guild would have waited.
+
+Run from a directory with a config.py and courses.toml, like the bot.
+Usage: python bench/teardown_regex.py [x's in the role name]
+
+With 25 x's, searching on the event loop blocks it for about 2.3s, four
+times as long for every 2 more x's. /teardown roles gives up after
+REGEX_TIMEOUT, 2s, and the event loop is never blocked for more than about
+10ms. The next search starts a new worker, which takes about 0.6s. After
+that, an ordinary pattern takes about 10ms over searching in-process.
+"""
+# stdlib
+import os
+import re
+import sys
+import time
+import asyncio
+import tempfile
+from typing import Any
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 1st-party
+from fake_discord import FakeDiscord, command, dispatch, fake_bot, \
+    interaction # noqa: E402
+from ECEBot.controller.course_creation import get_catalog # noqa: E402
+from ECEBot.jobs import queue # noqa: E402
+from ECEBot.sandbox import sandbox # noqa: E402
+from ECEBot.state import state # noqa: E402
+
+EVIL = r'^(x+)*$'
+XS = 25
+# seconds between ticks of the ticker
+TICK = 0.005
+
+class Ticker:
+    """Measure the longest gap between runs of a task on the event loop."""
+
+    def __init__(self) -> None:
+        self.longest = 0.0
+        self.task = asyncio.create_task(self.run())
+
+    async def run(self) -> None:
+        last = time.perf_counter()
+        while True:
+            await asyncio.sleep(TICK)
+            now = time.perf_counter()
+            self.longest = max(self.longest, now - last - TICK)
+            last = now
+
+    def stop(self) -> float:
+        self.task.cancel()
+        return self.longest
+
+async def teardown(bot, fake: FakeDiscord, guild_id: int,
+                   pattern: str) -> tuple[Any, float, float]:
+    """Run /teardown roles, returning its reply, how long it took,
+    and the longest the event loop was blocked meanwhile.
+    """
+    payload = interaction(fake, guild_id, fake.guilds[guild_id].owner_id, 2,
+                          command('teardown', 'roles', pattern=pattern))
+    reply = fake.expect_followup(payload['token'])
+    ticker = Ticker()
+    start = time.perf_counter()
+    await dispatch(bot, fake, payload)
+    message = await reply
+    elapsed = time.perf_counter() - start
+    text = message['content'] or message['embeds'][0]['description']
+    return text, elapsed, ticker.stop()
+
+async def main(xs: int = XS) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        state.filename = os.path.join(tmp, 'state.sqlite3')
+        async with FakeDiscord() as fake:
+            guild = fake.add_guild()
+            guild.add_channel(fake.snowflake(), 'general')
+            catalog = await get_catalog(guild.id)
+            for course in sorted(catalog.area_courses()):
+                guild.add_role(fake.snowflake(), course)
+            guild.add_role(fake.snowflake(), 'x' * xs + '!')
+            names = [role['name'] for role in guild.roles.values()]
+            bot = await fake_bot(fake)
+            try:
+                ticker = Ticker()
+                await asyncio.sleep(0)
+                start = time.perf_counter()
+                [name for name in names if re.search(EVIL, name)]
+                elapsed = time.perf_counter() - start
+                await asyncio.sleep(TICK * 2)
+                print(f'on the event loop: {elapsed:.2f}s, '
+                      f'loop blocked for {ticker.stop() * 1000:.0f}ms')
+                for pattern in (EVIL, '^ZZZ', '^x+!$'):
+                    text, elapsed, blocked = await teardown(
+                        bot, fake, guild.id, pattern)
+                    print(f'/teardown roles {pattern}: {elapsed:.2f}s, '
+                          f'loop blocked for {blocked * 1000:.0f}ms: {text}')
+                start = time.perf_counter()
+                [name for name in names if re.search('^ZZZ', name)]
+                print(f'^ZZZ in-process: '
+                      f'{(time.perf_counter() - start) * 1000:.2f}ms')
+                while queue.running or any(queue.queued.values()):
+                    await asyncio.sleep(0.05)
+            finally:
+                sandbox.close(kill=True)
+                await bot.http.close()
+                await state.close()
+
+if __name__ == '__main__':
+    asyncio.run(main(*map(int, sys.argv[1:])))
@@ -0,0 +1,71 @@
+"""Benchmark parsing of large generated course catalogs.
+
+Compares the vendored TOML parser, with its fast paths, against the
+standard library's tomllib (which the vendored parser is a copy of, minus
+the fast paths) when running on Python 3.11+, and checks that both
+produce the same result.
+
+Usage: python bench/toml_parsing.py [courses per category]
+"""
+# stdlib
+import os
+import sys
+import time
+import random
+from typing import Any, Callable
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import _tomllib # noqa: E402
+
+CATEGORIES = 40
+RUNS = 5
+
+def catalog(per_category: int) -> str:
+    """A courses.toml-style catalog with comments and both string styles."""
+    rand = random.Random(0)
+    lines = ['# generated catalog']
+    for i in range(CATEGORIES):
+        key = f'area-{i}' if i < 8 else f'minor-{i}'
+        lines.append(f'[{key}]')
+        lines.append(f'name = "Generated category {i}" # display name')
+        lines.append('courses = [')
+        for j in range(per_category):
+            code = (f'{rand.choice(["ECE", "APS", "MAT", "CSC"])}'
+                    f'{rand.choice("12345ABCD")}{j % 100:02}H1')
+            if j % 10 == 0:
+                lines.append(f'    # block {j // 10}')
+            quote = "'" if j % 3 == 0 else '"'
+            lines.append(f'    {quote}{code}{quote},')
+        lines.append(']')
+        lines.append('')
+    return '\n'.join(lines)
+
+def best_of(func: Callable[[str], Any], src: str) -> float:
+    times = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        func(src)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+def main() -> None:
+    per_category = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    src = catalog(per_category)
+    print(f'{CATEGORIES} categories x {per_category} courses, '
+          f'{len(src) / 1024:.0f} KiB')
+    vendored = best_of(_tomllib.loads, src)
+    print(f'vendored (fast paths) {vendored * 1000:8.2f}ms')
+    try:
+        import tomllib
+    except ImportError:
+        print('stdlib tomllib not available on this Python')
+        return
+    stdlib = best_of(tomllib.loads, src)
+    print(f'stdlib tomllib        {stdlib * 1000:8.2f}ms '
+          f'({stdlib / vendored:.1f}x slower)')
+    assert _tomllib.loads(src) == tomllib.loads(src), 'results differ'
+    print('results identical')
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Literal, Optional, Union
 
 # If running in a specific guild, set this to its ID.
 # Otherwise, use None.
@@ -21,3 +21,40 @@ INVITE_URL: Optional[str]
 COMMAND_FRESHNESS: float
 # If True, only roles will be created on demand, not channels
 CHANNELS_ON_DEMAND: bool
+# When creating course channels would take a guild past this many channels,
+# delete the channels of the least recently used idle courses first, keeping
+# their roles; they are created again when next needed. Discord's limit is 500.
+# Set to None to never evict channels. Channels are never evicted in lean
+# mode either: it doesn't receive messages, so busy channels would look idle.
+CHANNEL_WATERMARK: Optional[int]
+# Only evict the channels of courses unused for at least this many days.
+# Messages count as use, and so does a member getting or removing a course role.
+CHANNEL_IDLE_DAYS: float
+# If True, check in the background after startup that registered selector
+# messages still exist, unsetting the ones that don't. Selector messages
+# sent before their components had fixed IDs need this to work again.
+VERIFY_SELECTOR_MESSAGES: bool
+# If True, request only the gateway intents the bot uses, don't cache
+# messages or members, and don't parse events the bot doesn't handle.
+LEAN_MODE: bool
+# The number of gateway shards to run, or 'auto' to use the number
+# Discord recommends for the bot's guild count.
+SHARD_COUNT: Union[int, Literal['auto']]
+# The application's public key, from the Developer Portal, used to verify
+# interactions when serving them over HTTP. Set to None if not doing so.
+PUBLIC_KEY: Optional[str]
+# If True, request the privileged members intent (which must be enabled
+# in the Developer Portal) to count members in each course for /enrollment.
+# Has no effect in lean mode, which doesn't cache members.
+ENROLLMENT_COUNTS: bool
+# How many queued admin jobs, like /setup channels, may run at once
+# in each guild. Usually 1, so that jobs don't compete for rate limits.
+JOB_CONCURRENCY: int
+# How many queued admin jobs may run at once across all guilds,
+# e.g. when /fanout setup queues jobs in many guilds at once.
+JOB_TOTAL_CONCURRENCY: int
+# Log the stack of whatever blocks the event loop for longer than this
+# many seconds. Set to None to only measure lag, for /stats lag.
+LAG_THRESHOLD: Optional[float]
+# If True, run on uvloop's faster event loop (pip install uvloop).
+UVLOOP: bool